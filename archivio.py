@@ -0,0 +1,258 @@
+# Archivio SQLite dei dipendenti: anagrafica, preferenze, assenze e turni in tabelle separate,
+# indicizzate per dipendente e per giorno. Ogni operazione scrive solo le righe che cambia
+# (un dipendente, una preferenza, un'assenza, le celle di un periodo) e lo storico dei turni
+# si carica per intervalli di date solo quando serve. Sostituisce dipendenti.pkl, che viene
+# importato una sola volta.
+
+import datetime
+import os
+import pickle
+import sqlite3
+
+from orari import CODICI, Dipendente, MatriceTurni
+
+PERCORSO_PREDEFINITO = "dipendenti.db"
+PICKLE_PREDEFINITO = "dipendenti.pkl"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    chiave TEXT PRIMARY KEY,
+    valore TEXT
+);
+CREATE TABLE IF NOT EXISTS dipendenti (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL UNIQUE,
+    posizione INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS preferenze (
+    dipendente_id INTEGER NOT NULL REFERENCES dipendenti(id) ON DELETE CASCADE,
+    turno TEXT NOT NULL,
+    ammesso INTEGER NOT NULL,
+    ordine INTEGER,
+    priorita INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (dipendente_id, turno)
+);
+CREATE TABLE IF NOT EXISTS assenze (
+    id INTEGER PRIMARY KEY,
+    dipendente_id INTEGER NOT NULL REFERENCES dipendenti(id) ON DELETE CASCADE,
+    tipo TEXT NOT NULL CHECK (tipo IN ('ferie', 'recupero', 'riposo')),
+    inizio TEXT NOT NULL,
+    fine TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_assenze_dipendente ON assenze (dipendente_id, inizio);
+DROP INDEX IF EXISTS idx_assenze_giorno;
+CREATE TABLE IF NOT EXISTS turni (
+    dipendente_id INTEGER NOT NULL REFERENCES dipendenti(id) ON DELETE CASCADE,
+    giorno TEXT NOT NULL,
+    turno TEXT NOT NULL,
+    PRIMARY KEY (dipendente_id, giorno)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_turni_giorno ON turni (giorno);
+"""
+
+class ArchivioTurni:
+    def __init__(self, percorso=PERCORSO_PREDEFINITO):
+        self.percorso = percorso
+        self.conn = sqlite3.connect(percorso)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def chiudi(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.chiudi()
+
+    def _id(self, nome):
+        riga = self.conn.execute("SELECT id FROM dipendenti WHERE nome = ?", (nome,)).fetchone()
+        if riga is None:
+            raise KeyError(f"Dipendente non in archivio: {nome}")
+        return riga[0]
+
+    # --- dipendenti e preferenze ---
+
+    def carica_dipendenti(self):
+        # Anagrafica, preferenze e assenze; i turni storici si caricano a parte (carica_storico)
+        dipendenti = {}
+        for id_, nome in self.conn.execute("SELECT id, nome FROM dipendenti ORDER BY posizione, id"):
+            dip = Dipendente(nome)
+            dip.turni_possibili = []
+            dip.priorita_turni = {}
+            dipendenti[id_] = dip
+        possibili = {}
+        for id_, turno, ammesso, ordine, priorita in self.conn.execute(
+                "SELECT dipendente_id, turno, ammesso, ordine, priorita FROM preferenze"):
+            dip = dipendenti[id_]
+            dip.priorita_turni[turno] = priorita
+            if ammesso:
+                possibili.setdefault(id_, []).append((ordine, turno))
+        for id_, turni in possibili.items():
+            dipendenti[id_].turni_possibili = [t for _, t in sorted(turni)]
+        for id_, tipo, inizio, fine in self.conn.execute(
+                "SELECT dipendente_id, tipo, inizio, fine FROM assenze ORDER BY dipendente_id, id"):
+            dip = dipendenti[id_]
+            inizio = datetime.date.fromisoformat(inizio)
+            if tipo == 'ferie':
+                dip.assegna_ferie(inizio, datetime.date.fromisoformat(fine))
+            elif tipo == 'recupero':
+                dip.assegna_recupero(inizio)
+            else:
+                dip.assegna_riposo_aggiuntivo(inizio)
+        return list(dipendenti.values())
+
+    def salva_dipendente(self, dip, posizione=None):
+        # Inserisce o aggiorna un dipendente con preferenze e assenze; non tocca i turni
+        with self.conn:
+            self._scrivi_dipendente(dip, posizione)
+
+    def salva_dipendenti(self, dipendenti):
+        # Come salva_dipendente, per più dipendenti in un'unica transazione (importazioni)
+        with self.conn:
+            for dip in dipendenti:
+                self._scrivi_dipendente(dip)
+
+    def _scrivi_dipendente(self, dip, posizione=None):
+        if posizione is None:
+            riga = self.conn.execute("SELECT posizione FROM dipendenti WHERE nome = ?", (dip.nome,)).fetchone()
+            if riga is None:
+                riga = self.conn.execute("SELECT COALESCE(MAX(posizione) + 1, 0) FROM dipendenti").fetchone()
+            posizione = riga[0]
+        self.conn.execute(
+            "INSERT INTO dipendenti (nome, posizione) VALUES (?, ?) "
+            "ON CONFLICT (nome) DO UPDATE SET posizione = excluded.posizione", (dip.nome, posizione))
+        id_ = self._id(dip.nome)
+        self._scrivi_preferenze(id_, dip)
+        self.conn.execute("DELETE FROM assenze WHERE dipendente_id = ?", (id_,))
+        self.conn.executemany(
+            "INSERT INTO assenze (dipendente_id, tipo, inizio, fine) VALUES (?, ?, ?, ?)",
+            [(id_, tipo, inizio.isoformat(), fine.isoformat()) for tipo, inizio, fine in _assenze(dip)])
+
+    def salva_preferenze(self, dip):
+        with self.conn:
+            self._scrivi_preferenze(self._id(dip.nome), dip)
+
+    def _scrivi_preferenze(self, id_, dip):
+        ordine = {t: i for i, t in enumerate(dip.turni_possibili)}
+        righe = [(id_, t, t in ordine, ordine.get(t), dip.priorita_turni.get(t, 1))
+                 for t in dict.fromkeys(list(dip.turni_possibili) + list(dip.priorita_turni))]
+        self.conn.execute("DELETE FROM preferenze WHERE dipendente_id = ?", (id_,))
+        self.conn.executemany(
+            "INSERT INTO preferenze (dipendente_id, turno, ammesso, ordine, priorita) VALUES (?, ?, ?, ?, ?)", righe)
+
+    def rimuovi_dipendente(self, nome):
+        with self.conn:
+            self.conn.execute("DELETE FROM dipendenti WHERE nome = ?", (nome,))
+
+    def riordina(self, nomi):
+        with self.conn:
+            self.conn.executemany("UPDATE dipendenti SET posizione = ? WHERE nome = ?",
+                                  [(i, nome) for i, nome in enumerate(nomi)])
+
+    # --- assenze ---
+
+    def aggiungi_assenza(self, nome, tipo, inizio, fine=None):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO assenze (dipendente_id, tipo, inizio, fine) VALUES (?, ?, ?, ?)",
+                (self._id(nome), tipo, inizio.isoformat(), (fine or inizio).isoformat()))
+
+    # --- turni ---
+
+    def salva_turni(self, calendario, dipendenti=None):
+        # Riscrive solo le celle del periodo del calendario (vista, dizionario o MatriceTurni)
+        matrice = calendario if isinstance(calendario, MatriceTurni) else \
+            MatriceTurni.da_calendario(calendario, dipendenti or [])
+        ids = dict(self.conn.execute("SELECT nome, id FROM dipendenti"))
+        nomi = [n for n in matrice.nomi if n in ids]
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM turni WHERE dipendente_id = ? AND giorno BETWEEN ? AND ?",
+                [(ids[n], matrice.inizio.isoformat(), matrice.fine.isoformat()) for n in nomi])
+            self.conn.executemany(
+                "INSERT INTO turni (dipendente_id, giorno, turno) VALUES (?, ?, ?)",
+                [(ids[n], giorno.isoformat(), turno) for n in nomi for giorno, turno in matrice.turni_di(n)])
+
+    def aggiorna_turni(self, modifiche):
+        # Scrive singole celle: modifiche = [(giorno, nome, turno)], turno vuoto = riposo
+        ids = dict(self.conn.execute("SELECT nome, id FROM dipendenti"))
+        with self.conn:
+            for giorno, nome, turno in modifiche:
+                if turno:
+                    self.conn.execute(
+                        "INSERT INTO turni (dipendente_id, giorno, turno) VALUES (?, ?, ?) "
+                        "ON CONFLICT (dipendente_id, giorno) DO UPDATE SET turno = excluded.turno",
+                        (ids[nome], giorno.isoformat(), turno))
+                else:
+                    self.conn.execute("DELETE FROM turni WHERE dipendente_id = ? AND giorno = ?",
+                                      (ids[nome], giorno.isoformat()))
+
+    def carica_turni(self, inizio, fine, nomi=None):
+        # Matrice dei turni salvati nel periodo, letta tramite l'indice per giorno
+        if nomi is None:
+            nomi = [n for (n,) in self.conn.execute("SELECT nome FROM dipendenti ORDER BY posizione, id")]
+        matrice = MatriceTurni(inizio, fine, nomi)
+        righe = self.conn.execute(
+            "SELECT d.nome, t.giorno, t.turno FROM turni t JOIN dipendenti d ON d.id = t.dipendente_id "
+            "WHERE t.giorno BETWEEN ? AND ?", (inizio.isoformat(), fine.isoformat()))
+        for nome, giorno, turno in righe:
+            pos = matrice.posizioni.get(nome)
+            if pos is not None and turno in CODICI:
+                matrice.celle[(datetime.date.fromisoformat(giorno) - inizio).days, pos] = CODICI[turno]
+        return matrice
+
+    def carica_storico(self, dipendenti, inizio, fine):
+        # Aggiunge a Dipendente.turni lo storico del periodo indicato
+        self.carica_turni(inizio, fine, [d.nome for d in dipendenti]).applica_a(dipendenti)
+
+    def periodo_turni(self):
+        # Primo e ultimo giorno con turni salvati, o None
+        riga = self.conn.execute("SELECT MIN(giorno), MAX(giorno) FROM turni").fetchone()
+        if riga[0] is None:
+            return None
+        return datetime.date.fromisoformat(riga[0]), datetime.date.fromisoformat(riga[1])
+
+    # --- importazione da dipendenti.pkl ---
+
+    def importa_pickle(self, percorso=PICKLE_PREDEFINITO):
+        # Importa una sola volta il vecchio file pickle; restituisce il numero di dipendenti importati
+        if not os.path.exists(percorso):
+            return 0
+        if self.conn.execute("SELECT 1 FROM meta WHERE chiave = 'pickle_importato'").fetchone():
+            return 0
+        with open(percorso, "rb") as f:
+            dipendenti = _CaricatorePickle(f).load()
+        for posizione, dip in enumerate(dipendenti):
+            self.salva_dipendente(dip, posizione)
+        ids = dict(self.conn.execute("SELECT nome, id FROM dipendenti"))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO turni (dipendente_id, giorno, turno) VALUES (?, ?, ?)",
+                [(ids[d.nome], giorno.isoformat(), turno) for d in dipendenti for giorno, turno in d.turni])
+            self.conn.execute("INSERT INTO meta (chiave, valore) VALUES ('pickle_importato', ?)",
+                              (os.path.abspath(percorso),))
+        return len(dipendenti)
+
+def _assenze(dip):
+    for inizio, fine in dip.ferie:
+        yield 'ferie', inizio, fine
+    for giorno in dip.recuperi:
+        yield 'recupero', giorno, giorno
+    for giorno in dip.riposi_aggiuntivi:
+        yield 'riposo', giorno, giorno
+
+# Il pickle scritto da "python orari.py" riferisce la classe come __main__.Dipendente:
+# la si rimappa su orari.Dipendente e si accettano solo le classi attese
+class _CaricatorePickle(pickle.Unpickler):
+    CONSENTITE = {('datetime', 'date'), ('builtins', 'set'), ('builtins', 'frozenset')}
+
+    def find_class(self, modulo, nome):
+        if nome == 'Dipendente' and modulo in ('__main__', 'orari'):
+            return Dipendente
+        if (modulo, nome) in self.CONSENTITE:
+            return super().find_class(modulo, nome)
+        raise pickle.UnpicklingError(f"Classe non ammessa nel file dei dipendenti: {modulo}.{nome}")
@@ -0,0 +1,196 @@
+# Benchmark riproducibili su organici sintetici: generazione, statistiche ed esportazione per
+# organici da 10 a 2000 dipendenti su un mese o un anno. Per ogni misura si registrano il tempo
+# (il migliore su più ripetizioni) e il picco di memoria (tracemalloc, in una passata a parte
+# per non falsare i tempi). I risultati finiscono in un file JSON da confrontare tra versioni.
+#   python benchmark.py                                      suite completa
+#   python benchmark.py --dimensioni 500 --orizzonti anno --fasi pdf
+#   python benchmark.py --dimensioni 10 50 --ripetizioni 5 -o risultati.json
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from orari import TURNI, CODICI, Dipendente, MatriceTurni, genera_turni_periodo
+
+DIMENSIONI = (10, 100, 500, 2000)
+ORIZZONTI = {'mese': 31, 'anno': 365}
+INIZIO = datetime.date(2025, 1, 1)
+
+# Densità delle assenze: giorni di ferie all'anno (in 1-3 blocchi) e recuperi al mese
+FERIE_ANNUE = 26
+RECUPERI_MENSILI = 1
+# Quota di dipendenti che può fare tutti i turni; gli altri ne hanno un sottoinsieme
+QUOTA_POLIVALENTI = 0.3
+
+def organico_sintetico(num_dipendenti, inizio, fine, seme=0):
+    # Dipendenti con ferie a blocchi, recuperi sparsi, turni possibili ristretti e priorità
+    # diverse; lo stesso seme produce sempre lo stesso organico
+    rng = random.Random(seme)
+    num_giorni = (fine - inizio).days + 1
+    sigle = list(TURNI)
+    dipendenti = []
+    for i in range(num_dipendenti):
+        dip = Dipendente(f"Dipendente {i + 1:04d}")
+        giorni_ferie = round(FERIE_ANNUE * num_giorni / 365)
+        blocchi = rng.randint(1, 3)
+        for _ in range(blocchi if giorni_ferie else 0):
+            durata = max(1, giorni_ferie // blocchi)
+            primo = inizio + datetime.timedelta(days=rng.randrange(num_giorni))
+            dip.assegna_ferie(primo, min(fine, primo + datetime.timedelta(days=durata - 1)))
+        for _ in range(round(RECUPERI_MENSILI * num_giorni / 30)):
+            dip.assegna_recupero(inizio + datetime.timedelta(days=rng.randrange(num_giorni)))
+        if rng.random() >= QUOTA_POLIVALENTI:
+            # Sempre almeno M o P, che sono i turni di ripiego del generatore
+            possibili = set(rng.sample(sigle, rng.randint(2, len(sigle) - 1))) | {rng.choice(['M', 'P'])}
+            dip.turni_possibili = [t for t in sigle if t in possibili]
+        dip.priorita_turni = {t: rng.randint(1, 3) for t in sigle}
+        dipendenti.append(dip)
+    return dipendenti
+
+def matrice_casuale(dipendenti, inizio, fine, seme=0):
+    # Matrice riempita a caso con i turni possibili di ciascuno, per misurare statistiche ed
+    # esportazione senza dipendere dal generatore
+    generatore = np.random.default_rng(seme)
+    num_giorni = (fine - inizio).days + 1
+    matrice = MatriceTurni(inizio, fine, [d.nome for d in dipendenti])
+    for e, d in enumerate(dipendenti):
+        codici = [0] + [CODICI[t] for t in d.turni_possibili]
+        matrice.celle[:, e] = generatore.choice(codici, size=num_giorni)
+    return matrice
+
+def _misura(funzione, ripetizioni, prepara=None):
+    # Miglior tempo su "ripetizioni" esecuzioni, più il picco di memoria di un'esecuzione tracciata
+    tempi = []
+    for _ in range(ripetizioni):
+        argomenti = prepara() if prepara else ()
+        t0 = time.perf_counter()
+        funzione(*argomenti)
+        tempi.append(time.perf_counter() - t0)
+    argomenti = prepara() if prepara else ()
+    tracemalloc.start()
+    try:
+        funzione(*argomenti)
+        _, picco = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'secondi': min(tempi), 'secondi_medi': sum(tempi) / len(tempi), 'picco_memoria': picco}
+
+def _file_temporaneo(suffisso):
+    fd, percorso = tempfile.mkstemp(suffix=suffisso)
+    os.close(fd)
+    return percorso
+
+def _fase_greedy(dipendenti, inizio, fine, seme):
+    def prepara():
+        for d in dipendenti:
+            d.azzera_turni()
+        return (random.Random(seme),)
+    return lambda rng: genera_turni_periodo(inizio, fine, dipendenti, rng=rng), prepara
+
+def _fase_ricottura(dipendenti, inizio, fine, seme):
+    from solutore import genera_turni_ricottura
+    # Numero di iterazioni fisso, così il lavoro è lo stesso su ogni macchina
+    iterazioni = 200 * len(dipendenti) * ((fine - inizio).days + 1) // 31
+    return (lambda: genera_turni_ricottura(inizio, fine, dipendenti, rng=random.Random(seme), tempo_limite=None,
+                                           iterazioni=iterazioni, aggiorna_dipendenti=False)), None
+
+def _fase_statistiche(dipendenti, matrice):
+    from statistiche import calcola_statistiche
+    return lambda: calcola_statistiche(matrice, stato=None), None
+
+def _fase_ore_totali(dipendenti, matrice):
+    # Ore per dipendente dal vecchio percorso a oggetti (Dipendente.ore_totali). Si parte da
+    # uno storico vuoto: le fasi di generazione precedenti lasciano i loro turni nei dipendenti
+    for d in dipendenti:
+        d.azzera_turni()
+    matrice.applica_a(dipendenti)
+    return lambda: [d.ore_totali() for d in dipendenti], None
+
+def _fase_esportazione(formato):
+    def fase(dipendenti, matrice):
+        from esportazione import esporta
+        percorso = _file_temporaneo("." + formato)
+        calendario = matrice.calendario()
+        return lambda: esporta(calendario, dipendenti, percorso, formato), percorso
+    return fase
+
+# Fasi che generano un calendario e fasi che lavorano su una matrice già pronta
+FASI_GENERAZIONE = {'greedy': _fase_greedy, 'ricottura': _fase_ricottura}
+FASI_MATRICE = {'statistiche': _fase_statistiche, 'ore_totali': _fase_ore_totali,
+                'pdf': _fase_esportazione('pdf'), 'csv': _fase_esportazione('csv')}
+FASI_PREDEFINITE = ('greedy', 'statistiche', 'ore_totali', 'pdf', 'csv')
+
+def esegui_suite(dimensioni=DIMENSIONI, orizzonti=tuple(ORIZZONTI), fasi=FASI_PREDEFINITE, ripetizioni=3, seme=0,
+                 stampa=print):
+    risultati = []
+    for num_dipendenti in dimensioni:
+        for orizzonte in orizzonti:
+            fine = INIZIO + datetime.timedelta(days=ORIZZONTI[orizzonte] - 1)
+            dipendenti = organico_sintetico(num_dipendenti, INIZIO, fine, seme)
+            matrice = matrice_casuale(dipendenti, INIZIO, fine, seme)
+            for fase in fasi:
+                if fase in FASI_GENERAZIONE:
+                    funzione, prepara = FASI_GENERAZIONE[fase](dipendenti, INIZIO, fine, seme)
+                    percorso = None
+                else:
+                    funzione, percorso = FASI_MATRICE[fase](dipendenti, matrice)
+                    prepara = None
+                try:
+                    misura = _misura(funzione, ripetizioni, prepara)
+                    if percorso:
+                        misura['byte'] = os.path.getsize(percorso)
+                finally:
+                    if percorso and os.path.exists(percorso):
+                        os.remove(percorso)
+                riga = {'fase': fase, 'dipendenti': num_dipendenti, 'orizzonte': orizzonte,
+                        'giorni': ORIZZONTI[orizzonte], **misura}
+                risultati.append(riga)
+                if stampa:
+                    stampa(f"{fase:<12} {num_dipendenti:>5} dip. x {ORIZZONTI[orizzonte]:>3} gg: "
+                           f"{misura['secondi']:8.3f} s, picco {misura['picco_memoria'] / 2**20:8.1f} MB")
+    return risultati
+
+def _versione_codice():
+    try:
+        uscita = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return uscita.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark di generazione, statistiche ed esportazione dei turni.")
+    parser.add_argument("--dimensioni", type=int, nargs="+", default=list(DIMENSIONI), help="numero di dipendenti")
+    parser.add_argument("--orizzonti", nargs="+", choices=list(ORIZZONTI), default=list(ORIZZONTI))
+    parser.add_argument("--fasi", nargs="+", choices=list(FASI_GENERAZIONE) + list(FASI_MATRICE),
+                        default=list(FASI_PREDEFINITE))
+    parser.add_argument("--ripetizioni", type=int, default=3)
+    parser.add_argument("--seme", type=int, default=0)
+    parser.add_argument("-o", "--output", default="benchmark.json", help="file JSON dei risultati")
+    args = parser.parse_args(argv)
+    risultati = esegui_suite(args.dimensioni, args.orizzonti, args.fasi, max(1, args.ripetizioni), args.seme)
+    dati = {
+        'data': datetime.datetime.now().isoformat(timespec="seconds"),
+        'versione': _versione_codice(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'piattaforma': platform.platform(),
+        'seme': args.seme,
+        'ripetizioni': args.ripetizioni,
+        'risultati': risultati,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(dati, f, indent=2)
+    print(f"Risultati salvati in {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# Riga di comando e API senza interfaccia grafica per la generazione dei turni.
+# Senza argomenti avvia l'interfaccia grafica; con il comando "genera" lavora senza display,
+# ad esempio da cron:
+#   python orari.py genera --dal 2025-06-01 --al 2025-08-31 --seme 42 -o turni.pdf
+#   python orari.py importa ferie_2025.xlsx
+# Tk, fpdf e i motori di generazione vengono importati solo quando servono.
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+
+from archivio import PERCORSO_PREDEFINITO
+from orari import MatriceTurni, ReportGenerazione, StatoGenerazione
+
+ESITO_OK = 0
+ESITO_ERRORE = 1
+
+def carica_dipendenti(archivio):
+    from archivio import ArchivioTurni
+    if not os.path.exists(archivio):
+        raise FileNotFoundError(f"Archivio non trovato: {archivio}")
+    with ArchivioTurni(archivio) as db:
+        db.importa_pickle()
+        return db.carica_dipendenti()
+
+def genera(dal, al, dipendenti=None, archivio=None, seme=None, motore="greedy", tentativi=1, stato=None,
+           **opzioni):
+    # Genera i turni dal/al (estremi inclusi) e restituisce il Candidato scelto (calendario, stato,
+    # seme, punteggio). Senza seme ne viene estratto uno, così ogni risultato è riproducibile, a
+    # parte quelli della ricottura limitata solo dal tempo (serve iterazioni).
+    # I dipendenti, se non passati, si leggono dall'archivio SQLite; Dipendente.turni non viene toccato.
+    import solutore
+    if dipendenti is None:
+        dipendenti = carica_dipendenti(archivio or PERCORSO_PREDEFINITO)
+    if not dipendenti:
+        raise ValueError("Nessun dipendente da pianificare.")
+    if seme is None:
+        seme = random.SystemRandom().getrandbits(32)
+    if tentativi > 1:
+        return solutore.genera_migliore(dal, al, dipendenti, tentativi=tentativi, seme=seme, motore=motore,
+                                        stato=stato, **opzioni)
+    return solutore.genera_con_seme(dal, al, dipendenti, seme, motore=motore, stato=stato, **opzioni)
+
+def carica_equita(percorso, archivio, dal):
+    # Contatori di equità da un file JSON o, se non esiste ancora, dai turni salvati nell'archivio
+    from equita import ContatoriEquita
+    if os.path.exists(percorso):
+        equita = ContatoriEquita.carica(percorso)
+    else:
+        from archivio import ArchivioTurni
+        with ArchivioTurni(archivio) as db:
+            equita = ContatoriEquita.da_archivio(db, dal - datetime.timedelta(days=1))
+    if equita.fino_al is not None and equita.fino_al >= dal:
+        raise ValueError(f"I contatori di equità arrivano già al {equita.fino_al}: il periodo deve iniziare dopo.")
+    return equita
+
+def _data(testo):
+    try:
+        return datetime.date.fromisoformat(testo)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data non valida (atteso YYYY-MM-DD): {testo}")
+
+def crea_parser():
+    parser = argparse.ArgumentParser(prog="orari", description="Generazione automatica dei turni.")
+    comandi = parser.add_subparsers(dest="comando")
+    gen = comandi.add_parser("genera", help="genera i turni di un periodo senza interfaccia grafica")
+    gen.add_argument("--dal", type=_data, required=True, help="primo giorno (YYYY-MM-DD)")
+    gen.add_argument("--al", type=_data, required=True, help="ultimo giorno incluso (YYYY-MM-DD)")
+    gen.add_argument("--archivio", default=PERCORSO_PREDEFINITO, help="archivio SQLite dei dipendenti")
+    gen.add_argument("--seme", type=int, help="seme per rendere riproducibile la generazione "
+                     "(con la ricottura serve anche --iterazioni)")
+    gen.add_argument("--motore", default="greedy", help="motore di generazione (greedy, ricottura)")
+    gen.add_argument("--tentativi", type=int, default=1, help="generazioni con semi diversi, si tiene la migliore")
+    gen.add_argument("--tempo-limite", type=float, help="secondi a disposizione del motore a ricottura")
+    gen.add_argument("--iterazioni", type=int, help="iterazioni del motore a ricottura (risultato riproducibile)")
+    gen.add_argument("--stato", help="file JSON con lo stato da cui riprendere")
+    gen.add_argument("--salva-stato", help="file JSON in cui salvare lo stato a fine periodo")
+    gen.add_argument("-o", "--output", help="file di uscita (.pdf, .csv o .json)")
+    gen.add_argument("--formato", choices=("pdf", "csv", "json"), help="formato di uscita (default: dall'estensione)")
+    gen.add_argument("--salva-archivio", action="store_true", help="salva i turni generati nell'archivio")
+    gen.add_argument("--report", help="file JSON con tempi e contatori della generazione")
+    gen.add_argument("--equita", help="file JSON con i contatori di equità (creato dall'archivio se non esiste, "
+                                      "aggiornato a fine generazione)")
+    gen.add_argument("--violazioni", help="file JSON con le violazioni delle regole trovate nei turni generati")
+    gen.add_argument("--sedi", help="file JSON con le sedi (modelli di copertura e personale) da pianificare insieme")
+    imp = comandi.add_parser("importa", help="importa assenze e preferenze da un file CSV o XLSX")
+    imp.add_argument("file", help="file .csv o .xlsx (colonne nome, tipo, inizio, fine, turno, priorita, ammesso)")
+    imp.add_argument("--archivio", default=PERCORSO_PREDEFINITO, help="archivio SQLite dei dipendenti")
+    imp.add_argument("--crea-dipendenti", action="store_true", help="aggiunge i dipendenti non presenti nell'archivio")
+    return parser
+
+def importa_file(args):
+    from archivio import ArchivioTurni
+    from importazione import importa
+    dipendenti = carica_dipendenti(args.archivio)
+    with ArchivioTurni(args.archivio) as db:
+        risultato = importa(args.file, dipendenti, db, crea_dipendenti=args.crea_dipendenti)
+    print(risultato.riepilogo())
+    return ESITO_OK
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        from interfaccia import avvia
+        avvia()
+        return ESITO_OK
+    args = crea_parser().parse_args(argv)
+    if args.comando == "importa":
+        try:
+            return importa_file(args)
+        except Exception as e:
+            print(f"Errore: {e}", file=sys.stderr)
+            return ESITO_ERRORE
+    if args.comando != "genera":
+        crea_parser().print_help()
+        return ESITO_ERRORE
+    try:
+        if args.al < args.dal:
+            raise ValueError("La data di fine precede la data di inizio.")
+        opzioni = {}
+        if args.tempo_limite is not None:
+            opzioni['tempo_limite'] = args.tempo_limite
+        if args.iterazioni is not None:
+            opzioni['iterazioni'] = args.iterazioni
+        if args.report:
+            # Il report si riempie solo nel processo corrente
+            opzioni['report'] = ReportGenerazione()
+            if args.tentativi > 1 or args.sedi:
+                opzioni['processi'] = 1
+        stato = StatoGenerazione.carica(args.stato) if args.stato else None
+        dipendenti = carica_dipendenti(args.archivio)
+        if args.equita:
+            opzioni['equita'] = carica_equita(args.equita, args.archivio, args.dal)
+        if args.sedi:
+            from siti import carica_sedi, genera_sedi
+            if args.tentativi > 1:
+                raise ValueError("--tentativi non è supportato insieme a --sedi.")
+            risultato = genera_sedi(args.dal, args.al, carica_sedi(args.sedi), dipendenti, motore=args.motore,
+                                    seme=args.seme, stato=stato, aggiorna_dipendenti=False, **opzioni)
+        else:
+            risultato = genera(args.dal, args.al, dipendenti, seme=args.seme, motore=args.motore,
+                               tentativi=args.tentativi, stato=stato, **opzioni)
+        # Con le sedi solo il personale pianificato
+        matrice = risultato.matrice if args.sedi else MatriceTurni.da_calendario(risultato.calendario, dipendenti)
+        if args.output:
+            from esportazione import esporta, esporta_pdf_sezioni
+            formato = args.formato or args.output.rsplit(".", 1)[-1].lower()
+            extra = {'seme': risultato.seme} if formato == "json" else {}
+            if args.sedi and formato == "pdf":
+                # Una sezione per sede nello stesso documento
+                esporta_pdf_sezioni(risultato.sezioni(dipendenti), args.output)
+            else:
+                esporta(risultato.calendario, dipendenti, args.output, formato, **extra)
+        from validazione import Validatore, conta_per_tipo
+        if args.sedi:
+            # Copertura sede per sede: sul calendario complessivo i turni di sedi diverse si confondono
+            violazioni = risultato.violazioni(dipendenti, stato)
+        else:
+            violazioni = Validatore(matrice, dipendenti, stato=stato).valida()
+        if args.violazioni:
+            with open(args.violazioni, "w", encoding="utf-8") as f:
+                json.dump([v.a_dict() for v in violazioni], f, indent=2, ensure_ascii=False)
+        if args.equita:
+            # genera_sedi aggiorna da sé i contatori; con genera il risultato scelto va registrato
+            if not args.sedi:
+                opzioni['equita'].registra_matrice(matrice)
+            opzioni['equita'].salva(args.equita)
+        if args.salva_stato:
+            risultato.stato.salva(args.salva_stato)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(opzioni['report'].a_dict(), f, indent=2)
+        if args.salva_archivio:
+            from archivio import ArchivioTurni
+            with ArchivioTurni(args.archivio) as db:
+                db.salva_turni(risultato.calendario, dipendenti)
+    except Exception as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return ESITO_ERRORE
+    from equita import indice_equita
+    equita = ", ".join(f"{k}={v:.3f}" for k, v in indice_equita(matrice, dipendenti).items())
+    violazioni = f"{len(violazioni)}" + "".join(f", {tipo}={n}" for tipo, n in conta_per_tipo(violazioni).items())
+    if args.sedi:
+        scoperti = ", ".join(f"{sede}={n}" for sede, n in risultato.scoperti.items())
+        print(f"Turni dal {args.dal} al {args.al} per {len(risultato.matrice.nomi)} dipendenti: "
+              f"seme {risultato.seme}, turni scoperti per sede: {scoperti}")
+        print(f"Indice di equità: {equita}")
+        print(f"Violazioni: {violazioni}")
+        return ESITO_OK
+    metriche = ", ".join(f"{k}={v:.1f}" for k, v in risultato.metriche.items())
+    print(f"Turni dal {args.dal} al {args.al} per {len(dipendenti)} dipendenti: seme {risultato.seme}, "
+          f"punteggio {risultato.punteggio:.1f} ({metriche})")
+    print(f"Indice di equità: {equita}")
+    print(f"Violazioni: {violazioni}")
+    return ESITO_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
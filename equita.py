@@ -0,0 +1,262 @@
+# Equità dei carichi nel tempo: contatori per dipendente di ore, turni notturni, turni nel
+# weekend e nei festivi, aggiornati a ogni giorno generato invece di essere ricalcolati da
+# tutto lo storico. Il generatore li usa per ordinare i candidati (a parità di carico resta
+# l'ordine casuale), così che chi ha fatto meno notti, weekend o festivi passi avanti.
+# indice_equita misura quanto è equa la distribuzione in un periodo (indice di Jain).
+
+import datetime
+import json
+
+import numpy as np
+
+from orari import SIGLE, DURATE_ORE, IndiceDisponibilita
+from statistiche import DURATA_MINUTI, NOTTURNI_MINUTI
+
+CAMPI = ('ore', 'notti', 'weekend', 'festivi', 'giorni')
+# Turno notturno: più di metà della durata in fascia notturna (22:00 - 06:00), es. N; S e P, che
+# sconfinano di un'ora, restano turni serali. Per codice (NOTTURNO) e per sigla (TURNI_NOTTURNI),
+# usati da tutti i conteggi delle notti.
+NOTTURNO = NOTTURNI_MINUTI * 2 > DURATA_MINUTI
+NOTTURNO.flags.writeable = False
+TURNI_NOTTURNI = frozenset(s for c, s in enumerate(SIGLE) if NOTTURNO[c])
+
+def pasqua(anno):
+    # Domenica di Pasqua (calendario gregoriano, algoritmo anonimo di Meeus/Jones/Butcher)
+    a, b, c = anno % 19, anno // 100, anno % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mese, giorno = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(anno, mese, giorno + 1)
+
+_festivi = {}
+
+def festivi_italiani(anno):
+    # Festività nazionali italiane, Pasqua e Pasquetta comprese
+    if anno not in _festivi:
+        fissi = [(1, 1), (1, 6), (4, 25), (5, 1), (6, 2), (8, 15), (11, 1), (12, 8), (12, 25), (12, 26)]
+        giorno_pasqua = pasqua(anno)
+        _festivi[anno] = frozenset([datetime.date(anno, m, g) for m, g in fissi]
+                                   + [giorno_pasqua, giorno_pasqua + datetime.timedelta(days=1)])
+    return _festivi[anno]
+
+def e_festivo(giorno):
+    return giorno in festivi_italiani(giorno.year)
+
+class ContatoriEquita:
+    def __init__(self):
+        # nome -> [ore, notti, weekend, festivi, giorni], giorni = giorni conteggiati per quel dipendente
+        self.contatori = {}
+        # Ultimo giorno già conteggiato
+        self.fino_al = None
+        self._ordinati = {}
+
+    def _riga(self, nome):
+        riga = self.contatori.get(nome)
+        if riga is None:
+            riga = self.contatori[nome] = [0.0, 0, 0, 0, 0]
+        return riga
+
+    def valori(self, nome):
+        return dict(zip(CAMPI, self.contatori.get(nome, [0.0, 0, 0, 0, 0])))
+
+    # --- aggiornamento incrementale ---
+
+    def registra(self, nome, giorno, turno, segno=1):
+        # Aggiunge (segno=1) o toglie (segno=-1) un turno lavorato; non tocca il conteggio dei giorni
+        if not turno:
+            return
+        riga = self._riga(nome)
+        riga[0] += segno * DURATE_ORE[turno]
+        riga[1] += segno * (turno in TURNI_NOTTURNI)
+        riga[2] += segno * (giorno.weekday() >= 5)
+        riga[3] += segno * e_festivo(giorno)
+        self._ordinati.clear()
+
+    def sostituisci(self, nome, giorno, prima, dopo):
+        # Turno cambiato a mano in un giorno già conteggiato
+        self.registra(nome, giorno, prima, -1)
+        self.registra(nome, giorno, dopo)
+
+    def registra_giorno(self, giorno, nomi, turni_giorno):
+        # Un giorno generato: nomi = dipendenti pianificati, turni_giorno = {nome: turno}
+        weekend = giorno.weekday() >= 5
+        festivo = e_festivo(giorno)
+        for nome in nomi:
+            riga = self._riga(nome)
+            riga[4] += 1
+            turno = turni_giorno.get(nome)
+            if turno:
+                riga[0] += DURATE_ORE[turno]
+                riga[1] += turno in TURNI_NOTTURNI
+                riga[2] += weekend
+                riga[3] += festivo
+        self.fino_al = giorno
+        self._ordinati.clear()
+
+    def registra_matrice(self, matrice, fino_al=None):
+        # Un periodo intero in una passata vettoriale sulla matrice dei turni; con fino_al solo i
+        # giorni fino a quello indicato (incluso), es. l'ultimo generato prima di un annullamento
+        celle = matrice.celle
+        giorni = matrice.giorni()
+        if fino_al is not None and fino_al < matrice.fine:
+            giorni_registrati = max(0, (fino_al - matrice.inizio).days + 1)
+            celle, giorni = celle[:giorni_registrati], giorni[:giorni_registrati]
+        if not len(celle):
+            return
+        weekend = np.array([g.weekday() >= 5 for g in giorni])
+        festivi = np.array([e_festivo(g) for g in giorni])
+        lavorati = celle != 0
+        ore = DURATA_MINUTI[celle].sum(axis=0) / 60
+        notti = NOTTURNO[celle].sum(axis=0)
+        nel_weekend = lavorati[weekend].sum(axis=0)
+        nei_festivi = lavorati[festivi].sum(axis=0)
+        for e, nome in enumerate(matrice.nomi):
+            riga = self._riga(nome)
+            riga[0] += float(ore[e])
+            riga[1] += int(notti[e])
+            riga[2] += int(nel_weekend[e])
+            riga[3] += int(nei_festivi[e])
+            riga[4] += len(giorni)
+        if self.fino_al is None or giorni[-1] > self.fino_al:
+            self.fino_al = giorni[-1]
+        self._ordinati.clear()
+
+    @classmethod
+    def da_matrice(cls, matrice):
+        contatori = cls()
+        contatori.registra_matrice(matrice)
+        return contatori
+
+    @classmethod
+    def da_archivio(cls, db, fino_al):
+        # Dai turni salvati in un ArchivioTurni fino al giorno indicato (incluso), che diventa fino_al
+        # anche se l'archivio si ferma prima
+        periodo = db.periodo_turni()
+        if periodo is None or periodo[0] > fino_al:
+            contatori = cls()
+        else:
+            contatori = cls.da_matrice(db.carica_turni(periodo[0], min(periodo[1], fino_al)))
+        contatori.fino_al = fino_al
+        return contatori
+
+    @classmethod
+    def da_dipendenti(cls, dipendenti):
+        # Dallo storico in Dipendente.turni (giorni conteggiati dal primo turno registrato)
+        contatori = cls()
+        for dip in dipendenti:
+            turni = dip.turni
+            for giorno, turno in turni:
+                contatori.registra(dip.nome, giorno, turno)
+            if turni:
+                primo = min(g for g, _ in turni)
+                ultimo = max(g for g, _ in turni)
+                contatori._riga(dip.nome)[4] += (ultimo - primo).days + 1
+                if contatori.fino_al is None or ultimo > contatori.fino_al:
+                    contatori.fino_al = ultimo
+        return contatori
+
+    # --- ordinamento dei candidati ---
+
+    def categoria(self, turno, giorno):
+        # Contatore da bilanciare per un turno in un giorno: festivi, weekend, notti oppure ore
+        if e_festivo(giorno):
+            return 3
+        if giorno.weekday() >= 5:
+            return 2
+        if turno in TURNI_NOTTURNI:
+            return 1
+        return 0
+
+    def ordine_posti(self, turni):
+        # Posizioni dei turni del fabbisogno nell'ordine in cui assegnarli: notturni per primi
+        return sorted(range(len(turni)), key=lambda i: turni[i] not in TURNI_NOTTURNI)
+
+    def ordina(self, dipendenti, turno, giorno):
+        # Candidati in ordine di carico crescente (per giorno conteggiato), poi per ore; l'ordinamento
+        # è stabile, quindi a parità resta l'ordine ricevuto. Il risultato è riusato finché i
+        # contatori non cambiano.
+        categoria = self.categoria(turno, giorno)
+        chiave = (id(dipendenti), len(dipendenti), categoria)
+        ordinati = self._ordinati.get(chiave)
+        if ordinati is None:
+            contatori = self.contatori
+
+            def carico(dip):
+                riga = contatori.get(dip.nome)
+                if riga is None or not riga[4]:
+                    return (0.0, 0.0)
+                return (riga[categoria] / riga[4], riga[0] / riga[4])
+
+            ordinati = self._ordinati[chiave] = sorted(dipendenti, key=carico)
+        return ordinati
+
+    # --- persistenza ---
+
+    def copia(self):
+        return ContatoriEquita.da_dict(self.a_dict())
+
+    def a_dict(self):
+        return {
+            'fino_al': self.fino_al.isoformat() if self.fino_al else None,
+            'contatori': {nome: dict(zip(CAMPI, riga)) for nome, riga in self.contatori.items()},
+        }
+
+    @classmethod
+    def da_dict(cls, dati):
+        contatori = cls()
+        if dati.get('fino_al'):
+            contatori.fino_al = datetime.date.fromisoformat(dati['fino_al'])
+        for nome, valori in dati.get('contatori', {}).items():
+            contatori.contatori[nome] = [valori.get(campo, 0) for campo in CAMPI]
+        return contatori
+
+    def salva(self, percorso):
+        with open(percorso, "w", encoding="utf-8") as f:
+            json.dump(self.a_dict(), f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def carica(cls, percorso):
+        with open(percorso, encoding="utf-8") as f:
+            return cls.da_dict(json.load(f))
+
+def indice_jain(valori):
+    # (somma x)^2 / (n * somma x^2): 1 se tutti uguali, 1/n se tutto il carico è su uno solo
+    valori = np.asarray(valori, dtype=float)
+    quadrati = float((valori * valori).sum())
+    if not len(valori) or quadrati == 0.0:
+        return 1.0
+    return float(valori.sum()) ** 2 / (len(valori) * quadrati)
+
+def indice_equita(matrice, dipendenti=None):
+    # Indice di Jain per ore, notti, weekend e festivi del periodo. Con i dipendenti, i carichi
+    # sono divisi per i giorni disponibili (senza ferie, recuperi e riposi aggiuntivi), così chi
+    # è stato in ferie non abbassa l'indice.
+    celle = matrice.celle
+    giorni = matrice.giorni()
+    lavorati = celle != 0
+    weekend = np.array([g.weekday() >= 5 for g in giorni], dtype=bool)
+    festivi = np.array([e_festivo(g) for g in giorni], dtype=bool)
+    carichi = {
+        'ore': DURATA_MINUTI[celle].sum(axis=0) / 60,
+        'notti': NOTTURNO[celle].sum(axis=0),
+        'weekend': lavorati[weekend].sum(axis=0),
+        'festivi': lavorati[festivi].sum(axis=0),
+    }
+    if dipendenti is not None:
+        indice = IndiceDisponibilita(matrice.inizio, matrice.fine, dipendenti)
+        assenti = np.array([[indice.assenti(g) >> indice.posizioni[nome] & 1 if nome in indice.posizioni else 0
+                             for nome in matrice.nomi] for g in giorni], dtype=bool).reshape(len(giorni), -1)
+        disponibili = (~assenti).sum(axis=0).astype(float)
+        presenti = disponibili > 0
+        # Per le notti contano solo i dipendenti che possono fare turni notturni
+        per_nome = {d.nome: d for d in dipendenti}
+        notturni = np.array([nome in per_nome and not TURNI_NOTTURNI.isdisjoint(per_nome[nome].turni_possibili)
+                             for nome in matrice.nomi], dtype=bool)
+        filtri = {k: presenti & notturni if k == 'notti' else presenti for k in carichi}
+        carichi = {k: v[filtri[k]] / disponibili[filtri[k]] for k, v in carichi.items()}
+    return {k: indice_jain(v) for k, v in carichi.items()}
@@ -0,0 +1,255 @@
+# Esportazione dei turni: PDF (layout semplice e stile Orarirec), CSV e JSON.
+# fpdf viene importato solo da questo modulo, così il nucleo di generazione resta leggero.
+
+import calendar
+import csv
+import json
+
+import numpy as np
+from fpdf import FPDF
+
+from orari import SIGLE, IndiceDisponibilita, MatriceTurni
+from statistiche import DURATA_MINUTI, ore_per_dipendente
+
+FORMATI = ('pdf', 'csv', 'json')
+
+# Funzione per esportare in PDF con colori
+class PDF(FPDF):
+    def header(self):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "Turni Mensili", ln=True, align="C")
+
+    def create_table(self, calendario, dipendenti):
+        self.set_font("Arial", size=10)
+        self.add_page()
+        matrice = MatriceTurni.da_calendario(calendario, dipendenti)
+        indice = IndiceDisponibilita(matrice.inizio, matrice.fine, dipendenti)
+        giorni = matrice.giorni()
+        header = ["Giorno"] + [d.nome for d in dipendenti]
+        self.set_fill_color(200, 220, 255)
+        self.cell(25, 10, "Giorno", 1, 0, "C", True)
+        for nome in header[1:]:
+            self.cell(25, 10, nome, 1, 0, "C", True)
+        self.ln()
+
+        for g, giorno in enumerate(giorni):
+            self.cell(25, 10, giorno.strftime("%d/%m"), 1)
+            riga = matrice.celle[g]
+            for d in dipendenti:
+                turno = SIGLE[riga[matrice.posizioni[d.nome]]]
+                colore = None
+                if indice.in_ferie(giorno, d.nome):
+                    colore = (144, 238, 144)
+                    turno = "FERIE"
+                elif indice.in_recupero(giorno, d.nome):
+                    colore = (255, 255, 153)
+                    turno = "RECUP"
+                if colore:
+                    self.set_fill_color(*colore)
+                    self.cell(25, 10, turno, 1, 0, "C", True)
+                    self.set_fill_color(255, 255, 255)
+                else:
+                    self.cell(25, 10, turno, 1)
+            self.ln()
+
+# Stato di ogni cella esportata: turno normale, ferie o recupero, con testo e colore di sfondo
+STATO_TURNO = 0
+STATO_FERIE = 1
+STATO_RECUPERO = 2
+COLORI_STATO = {STATO_FERIE: (144, 238, 144), STATO_RECUPERO: (255, 255, 153)}
+ETICHETTE_STATO = {STATO_FERIE: "FER", STATO_RECUPERO: "REC"}
+
+def stati_celle(matrice, dipendenti):
+    # Una sola passata per tutto il periodo: restituisce (codici, stati), matrici giorni x dipendenti
+    # nell'ordine di "dipendenti". Le ferie sono intervalli e si scrivono a fette; i recuperi non
+    # coprono le ferie. I dipendenti assenti dalla matrice hanno solo celle vuote.
+    num_giorni = matrice.num_giorni
+    codici = np.zeros((num_giorni, len(dipendenti)), dtype=np.int8)
+    stati = np.zeros((num_giorni, len(dipendenti)), dtype=np.int8)
+    for e, d in enumerate(dipendenti):
+        pos = matrice.posizioni.get(d.nome)
+        if pos is not None:
+            codici[:, e] = matrice.celle[:, pos]
+        for inizio, fine in d.ferie:
+            a = max(0, (inizio - matrice.inizio).days)
+            b = min(num_giorni - 1, (fine - matrice.inizio).days)
+            if a <= b:
+                stati[a:b + 1, e] = STATO_FERIE
+        for giorno in d.recuperi:
+            g = (giorno - matrice.inizio).days
+            if 0 <= g < num_giorni and stati[g, e] != STATO_FERIE:
+                stati[g, e] = STATO_RECUPERO
+    return codici, stati
+
+def blocchi_mensili(giorni):
+    # Intervalli [a, b) di indici di giorno che cadono nello stesso mese
+    blocchi = []
+    a = 0
+    for g in range(1, len(giorni) + 1):
+        if g == len(giorni) or (giorni[g].year, giorni[g].month) != (giorni[a].year, giorni[a].month):
+            blocchi.append((a, g))
+            a = g
+    return blocchi
+
+# Esportazione PDF a pagine: le righe (dipendenti) sono divise in blocchi che stanno in una pagina
+# e le colonne (giorni) in blocchi mensili, così ogni pagina disegna al massimo
+# RIGHE_PAGINA x 31 celle qualunque sia la dimensione dell'organico o del periodo.
+# Più sezioni (mesi, sedi) finiscono nello stesso documento con aggiungi_sezione.
+# Nota: fpdf 1.7 tiene in memoria il contenuto (compresso) delle pagine fino a output(),
+# quindi la memoria cresce con il numero di pagine, ma il lavoro per pagina resta costante.
+class EsportatorePDF(FPDF):
+    TITOLO = "Turni"
+    LARGHEZZA_NOME = 32
+    LARGHEZZA_ORE = 12
+    LARGHEZZA_MAX_GIORNO = 10
+    ALTEZZA_TITOLO = 8
+    ALTEZZA_RIGA = 6
+
+    def __init__(self):
+        super().__init__(orientation="L", unit="mm", format="A4")
+        self.set_auto_page_break(False)
+        self.set_margins(10, 10, 10)
+        self._intestazione = self.TITOLO
+
+    def header(self):
+        self.set_font("Arial", "B", 10)
+        self.cell(0, self.ALTEZZA_TITOLO, self._intestazione, ln=True, align="C")
+
+    def righe_per_pagina(self):
+        # Spazio sotto il titolo e le due righe di intestazione (giorno della settimana e numero)
+        utile = self.h - self.t_margin - self.b_margin - self.ALTEZZA_TITOLO - 2 * self.ALTEZZA_RIGA
+        return max(1, int(utile // self.ALTEZZA_RIGA))
+
+    def aggiungi_sezione(self, calendario, dipendenti, titolo=None, progresso=None, annulla=None):
+        # progresso(frazione) dopo ogni pagina; con annulla impostato si smette prima della pagina
+        # successiva e si restituisce False (la sezione resta incompleta)
+        matrice = MatriceTurni.da_calendario(calendario, dipendenti)
+        giorni = matrice.giorni()
+        codici, stati = stati_celle(matrice, dipendenti)
+        # Testo e colore per ogni cella precalcolati una volta: indice = codice turno, oppure
+        # len(SIGLE) + stato per ferie e recupero
+        testi = list(SIGLE) + [ETICHETTE_STATO[STATO_FERIE], ETICHETTE_STATO[STATO_RECUPERO]]
+        colori = [None] * len(SIGLE) + [COLORI_STATO[STATO_FERIE], COLORI_STATO[STATO_RECUPERO]]
+        celle = np.where(stati == STATO_TURNO, codici, len(SIGLE) - 1 + stati).astype(np.int16)
+        durate = DURATA_MINUTI[codici]
+        nomi_giorni = [calendar.day_abbr[g.weekday()][:3] for g in giorni]
+        titolo = titolo or self.TITOLO
+
+        righe = self.righe_per_pagina()
+        blocchi = blocchi_mensili(giorni)
+        pagine = len(blocchi) * -(-len(dipendenti) // righe)
+        fatte = 0
+        for a, b in blocchi:
+            ore = (durate[a:b].sum(axis=0) / 60).tolist()
+            intestazione = f"{titolo} - {giorni[a].strftime('%m/%Y')}"
+            for r in range(0, len(dipendenti), righe):
+                if annulla is not None and annulla.is_set():
+                    return False
+                s = slice(r, min(r + righe, len(dipendenti)))
+                self._intestazione = intestazione
+                self._pagina(giorni[a:b], nomi_giorni[a:b], dipendenti[s], celle[a:b, s].T.tolist(),
+                             ore[s], testi, colori)
+                fatte += 1
+                if progresso:
+                    progresso(fatte / pagine)
+        return True
+
+    def _pagina(self, giorni, nomi_giorni, dipendenti, righe, ore, testi, colori):
+        self.add_page()
+        larghezza = min(self.LARGHEZZA_MAX_GIORNO,
+                        (self.w - self.l_margin - self.r_margin - self.LARGHEZZA_NOME - self.LARGHEZZA_ORE)
+                        / max(1, len(giorni)))
+        h = self.ALTEZZA_RIGA
+        self.set_font("Arial", size=7)
+        self.cell(self.LARGHEZZA_NOME, h, "", 1, 0, "C")
+        for nome in nomi_giorni:
+            self.cell(larghezza, h, nome, 1, 0, "C")
+        self.cell(self.LARGHEZZA_ORE, h, "Ore", 1, 0, "C")
+        self.ln()
+        self.cell(self.LARGHEZZA_NOME, h, "", 1, 0, "C")
+        for giorno in giorni:
+            self.cell(larghezza, h, str(giorno.day), 1, 0, "C")
+        self.cell(self.LARGHEZZA_ORE, h, "", 1, 0, "C")
+        self.ln()
+
+        # Il colore di riempimento si cambia solo quando serve
+        attuale = None
+        for d, riga, ore_dip in zip(dipendenti, righe, ore):
+            self.cell(self.LARGHEZZA_NOME, h, d.nome, 1, 0, "L")
+            for c in riga:
+                colore = colori[c]
+                if colore is None:
+                    self.cell(larghezza, h, testi[c], 1, 0, "C")
+                else:
+                    if colore != attuale:
+                        self.set_fill_color(*colore)
+                        attuale = colore
+                    self.cell(larghezza, h, testi[c], 1, 0, "C", True)
+            self.cell(self.LARGHEZZA_ORE, h, f"{ore_dip:g}", 1, 0, "C")
+            self.ln()
+
+# Funzione per esportare in PDF con layout stile orarirec
+class PDFStileOrarirec(EsportatorePDF):
+    TITOLO = "Turni Mensili - Stile Orarirec"
+
+    def create_table(self, calendario, dipendenti, **opzioni):
+        return self.aggiungi_sezione(calendario, dipendenti, **opzioni)
+
+def _celle_esportate(matrice, dipendenti):
+    # Per ogni dipendente la sequenza dei valori da esportare: turno, FER (ferie) o REC (recupero)
+    codici, stati = stati_celle(matrice, dipendenti)
+    for e, d in enumerate(dipendenti):
+        valori = [ETICHETTE_STATO.get(s) or SIGLE[c] for c, s in zip(codici[:, e].tolist(), stati[:, e].tolist())]
+        yield d, valori
+
+def esporta_pdf(calendario, dipendenti, percorso, progresso=None, annulla=None):
+    # Restituisce False, senza scrivere il file, se l'esportazione viene annullata
+    pdf = PDFStileOrarirec()
+    if not pdf.create_table(calendario, dipendenti, progresso=progresso, annulla=annulla):
+        return False
+    pdf.output(percorso)
+    return True
+
+def esporta_pdf_sezioni(sezioni, percorso):
+    # sezioni: sequenza di (titolo, calendario, dipendenti), ad esempio un mese per sede;
+    # tutte finiscono nello stesso documento, ognuna a partire da una pagina nuova
+    pdf = EsportatorePDF()
+    for titolo_sezione, calendario, dipendenti in sezioni:
+        pdf.aggiungi_sezione(calendario, dipendenti, titolo_sezione)
+    pdf.output(percorso)
+
+def esporta_csv(calendario, dipendenti, percorso):
+    # Una riga per dipendente, una colonna per giorno (ISO) più le ore totali del periodo
+    matrice = MatriceTurni.da_calendario(calendario, dipendenti)
+    ore = ore_per_dipendente(matrice)
+    with open(percorso, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Dipendente"] + [g.isoformat() for g in matrice.giorni()] + ["Ore"])
+        for d, valori in _celle_esportate(matrice, dipendenti):
+            writer.writerow([d.nome] + valori + [f"{ore.get(d.nome, 0):.2f}"])
+
+def esporta_json(calendario, dipendenti, percorso, seme=None):
+    matrice = MatriceTurni.da_calendario(calendario, dipendenti)
+    ore = ore_per_dipendente(matrice)
+    dati = {
+        'inizio': matrice.inizio.isoformat(),
+        'fine': matrice.fine.isoformat(),
+        'seme': seme,
+        'turni': {d.nome: {g.isoformat(): t for g, t in matrice.turni_di(d.nome)}
+                  for d in dipendenti if d.nome in matrice.posizioni},
+        'ore': {d.nome: ore.get(d.nome, 0) for d in dipendenti},
+        'fabbisogno': {g.isoformat(): t for g, t in sorted(matrice.fabbisogno.items())} if matrice.fabbisogno else None,
+    }
+    with open(percorso, "w", encoding="utf-8") as f:
+        json.dump(dati, f, indent=2, ensure_ascii=False)
+
+def esporta(calendario, dipendenti, percorso, formato=None, **opzioni):
+    formato = formato or percorso.rsplit(".", 1)[-1].lower()
+    if formato == 'pdf':
+        esporta_pdf(calendario, dipendenti, percorso)
+    elif formato == 'csv':
+        esporta_csv(calendario, dipendenti, percorso)
+    elif formato == 'json':
+        esporta_json(calendario, dipendenti, percorso, **opzioni)
+    else:
+        raise ValueError(f"Formato non supportato: {formato}. Disponibili: {', '.join(FORMATI)}")
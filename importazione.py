@@ -0,0 +1,248 @@
+# Importazione in blocco di assenze e preferenze da fogli di calcolo (CSV o XLSX).
+# Una riga per assenza o per turno ammesso, con le colonne:
+#   nome, tipo, inizio, fine, turno, priorita, ammesso
+# - tipo ferie, recupero o riposo: inizio obbligatoria, fine facoltativa (un recupero o un riposo
+#   su più giorni vale per ciascun giorno). Date come 2025-06-01 oppure 01/06/2025.
+# - tipo turno: turno obbligatorio, priorita da 1 a 5 (default 1), ammesso sì/no (default sì).
+#   Le righe "turno" di un dipendente sostituiscono i suoi turni possibili (nell'ordine del file)
+#   e le sue priorità.
+# Un file XLSX può avere più fogli (es. uno per le ferie e uno per le preferenze), letti come
+# un'unica tabella. La validazione controlla tutte le righe in una passata e segnala tutti gli
+# errori insieme; le ferie importate si fondono con quelle già presenti unendo gli intervalli
+# sovrapposti o contigui, così l'indice delle disponibilità ha meno intervalli da segnare.
+# Per i file XLSX pandas richiede openpyxl.
+
+import os
+
+import pandas as pd
+
+from orari import TURNI, Dipendente
+
+TIPI_ASSENZA = ('ferie', 'recupero', 'riposo')
+TIPO_TURNO = 'turno'
+COLONNE = ('nome', 'tipo', 'inizio', 'fine', 'turno', 'priorita', 'ammesso')
+COLONNE_OBBLIGATORIE = ('nome', 'tipo')
+# Intestazioni alternative accettate
+ALIAS_COLONNE = {'dipendente': 'nome', 'priorità': 'priorita', 'dal': 'inizio', 'al': 'fine'}
+PRIORITA_MINIMA = 1
+PRIORITA_MASSIMA = 5
+VALORI_SI = {'', '1', '1.0', 'si', 'sì', 's', 'x', 'true', 'vero', 'yes'}
+VALORI_NO = {'0', '0.0', 'no', 'n', 'false', 'falso'}
+
+class ErroriImportazione(ValueError):
+    def __init__(self, errori):
+        # errori: [(riga, colonna, messaggio)], riga come la vede chi apre il file (es. "12" o "Ferie:12")
+        self.errori = errori
+        righe = "\n".join(f"riga {riga}, {colonna}: {messaggio}" for riga, colonna, messaggio in errori)
+        super().__init__(f"{len(errori)} errori nel file:\n{righe}")
+
+# Esito di importa: dipendenti modificati e nuovi, quantità importate e giorni con nuove assenze
+class RisultatoImportazione:
+    def __init__(self, modificati, nuovi, ferie, recuperi, riposi, preferenze, giorni):
+        self.modificati = modificati
+        self.nuovi = nuovi
+        self.ferie = ferie
+        self.recuperi = recuperi
+        self.riposi = riposi
+        self.preferenze = preferenze
+        self.giorni = giorni
+
+    def riepilogo(self):
+        return (f"Dipendenti aggiornati: {len(self.modificati)} (nuovi: {len(self.nuovi)})\n"
+                f"Periodi di ferie: {self.ferie}, recuperi: {self.recuperi}, riposi: {self.riposi}\n"
+                f"Turni nelle preferenze: {self.preferenze}")
+
+def _testo(serie):
+    return serie.fillna('').astype(str).str.strip()
+
+def _date(serie):
+    # Date ISO (anche con l'ora, come le celle data di Excel) oppure gg/mm/aaaa
+    testo = _testo(serie)
+    date = pd.to_datetime(testo, format='ISO8601', errors='coerce')
+    return date.fillna(pd.to_datetime(testo, format='%d/%m/%Y', errors='coerce'))
+
+def leggi_tabella(percorso):
+    # Tutte le righe del file in un DataFrame con le COLONNE più "riga" (posizione nel file)
+    estensione = os.path.splitext(percorso)[1].lower()
+    if estensione == '.csv':
+        # Separatore ricavato dal file: virgola, oppure punto e virgola come nei CSV di Excel in italiano
+        fogli = {None: pd.read_csv(percorso, sep=None, engine='python', dtype=str, keep_default_na=False,
+                                   encoding='utf-8-sig')}
+    elif estensione in ('.xlsx', '.xlsm'):
+        try:
+            fogli = pd.read_excel(percorso, sheet_name=None, dtype=object)
+        except ImportError as e:
+            raise ValueError(f"Per leggere i file {estensione} serve il pacchetto openpyxl ({e}).")
+    else:
+        raise ValueError(f"Formato non supportato: {estensione or percorso} (atteso .csv o .xlsx).")
+    tabelle = []
+    errori = []
+    for foglio, tabella in fogli.items():
+        tabella = tabella.rename(columns=lambda c: ALIAS_COLONNE.get(str(c).strip().lower(), str(c).strip().lower()))
+        # Righe del tutto vuote (frequenti in fondo ai fogli Excel) e fogli vuoti si ignorano
+        vuote = tabella.isna() | tabella.astype(str).apply(lambda colonna: colonna.str.strip().eq(''))
+        tabella = tabella[~vuote.all(axis=1)]
+        if tabella.empty:
+            continue
+        prefisso = f"{foglio}:" if foglio is not None and len(fogli) > 1 else ""
+        mancanti = [c for c in COLONNE_OBBLIGATORIE if c not in tabella.columns]
+        if mancanti:
+            errori.append((f"{prefisso}1", ", ".join(mancanti), "colonna mancante nell'intestazione"))
+            continue
+        tabella = tabella.reindex(columns=list(COLONNE))
+        tabella['riga'] = prefisso + (tabella.index + 2).astype(str)
+        tabelle.append(tabella)
+    if errori:
+        raise ErroriImportazione(errori)
+    if not tabelle:
+        return pd.DataFrame(columns=list(COLONNE) + ['riga'])
+    return pd.concat(tabelle, ignore_index=True)
+
+def valida(tabella, nomi=None):
+    # Controlla tutte le righe con operazioni per colonna e solleva ErroriImportazione con tutti
+    # gli errori trovati; nomi, se indicato, è l'insieme dei dipendenti esistenti.
+    # Restituisce (assenze, preferenze): assenze con nome, tipo, inizio, fine (date), preferenze
+    # con nome, turno, priorita, ammesso nell'ordine del file.
+    errori = []
+
+    def segnala(maschera, colonna, messaggio, valori=None):
+        valori = tabella['riga'] if valori is None else valori
+        errori.extend((i, riga, colonna, messaggio.format(valore))
+                      for i, riga, valore in zip(tabella.index[maschera], tabella['riga'][maschera], valori[maschera]))
+
+    nome = _testo(tabella['nome'])
+    tipo = _testo(tabella['tipo']).str.lower()
+    segnala(nome.eq(''), 'nome', "nome mancante")
+    if nomi is not None:
+        segnala(nome.ne('') & ~nome.isin(nomi), 'nome', "dipendente sconosciuto: {}", nome)
+    segnala(tipo.eq(''), 'tipo', "tipo mancante")
+    segnala(tipo.ne('') & ~tipo.isin(TIPI_ASSENZA + (TIPO_TURNO,)), 'tipo',
+            "tipo non valido: {} (ammessi: " + ", ".join(TIPI_ASSENZA + (TIPO_TURNO,)) + ")", tipo)
+
+    assenza = tipo.isin(TIPI_ASSENZA)
+    testo_inizio = _testo(tabella['inizio'])
+    testo_fine = _testo(tabella['fine'])
+    inizio = _date(tabella['inizio'])
+    fine = _date(tabella['fine'])
+    segnala(assenza & testo_inizio.eq(''), 'inizio', "data di inizio mancante")
+    segnala(assenza & testo_inizio.ne('') & inizio.isna(), 'inizio', "data non valida: {}", testo_inizio)
+    segnala(assenza & testo_fine.ne('') & fine.isna(), 'fine', "data non valida: {}", testo_fine)
+    fine = fine.fillna(inizio)
+    segnala(assenza & (fine < inizio), 'fine', "la fine precede l'inizio")
+
+    preferenza = tipo.eq(TIPO_TURNO)
+    turno = _testo(tabella['turno'])
+    segnala(preferenza & turno.eq(''), 'turno', "turno mancante")
+    segnala(preferenza & turno.ne('') & ~turno.isin(list(TURNI)), 'turno', "turno sconosciuto: {}", turno)
+    segnala(preferenza & turno.ne('') & pd.concat([nome, tipo, turno], axis=1).duplicated(),
+            'turno', "turno ripetuto per lo stesso dipendente: {}", turno)
+    testo_priorita = _testo(tabella['priorita'])
+    priorita = pd.to_numeric(testo_priorita.str.replace(',', '.'), errors='coerce')
+    priorita = priorita.where(testo_priorita.ne(''), PRIORITA_MINIMA)
+    priorita_valida = priorita.notna() & priorita.eq(priorita.round()) & priorita.between(PRIORITA_MINIMA, PRIORITA_MASSIMA)
+    segnala(preferenza & ~priorita_valida, 'priorita',
+            f"priorità non valida: {{}} (intero da {PRIORITA_MINIMA} a {PRIORITA_MASSIMA})", testo_priorita)
+    ammesso = _testo(tabella['ammesso']).str.lower()
+    segnala(preferenza & ~ammesso.isin(VALORI_SI | VALORI_NO), 'ammesso', "valore non valido: {} (sì/no)", ammesso)
+
+    if errori:
+        errori.sort(key=lambda errore: errore[0])
+        raise ErroriImportazione([errore[1:] for errore in errori])
+    assenze = pd.DataFrame({'nome': nome[assenza], 'tipo': tipo[assenza],
+                            'inizio': inizio[assenza], 'fine': fine[assenza]})
+    preferenze = pd.DataFrame({'nome': nome[preferenza], 'turno': turno[preferenza],
+                               'priorita': priorita[preferenza].astype(int),
+                               'ammesso': ammesso[preferenza].isin(VALORI_SI)})
+    return assenze, preferenze
+
+def unisci_intervalli(intervalli):
+    # Fonde per ogni dipendente gli intervalli (nome, inizio, fine) sovrapposti o contigui
+    if intervalli.empty:
+        return intervalli[['nome', 'inizio', 'fine']].reset_index(drop=True)
+    ordinati = intervalli.sort_values(['nome', 'inizio'], kind='stable').reset_index(drop=True)
+    # Fine più lontana raggiunta dagli intervalli precedenti dello stesso dipendente
+    fine_massima = ordinati.groupby('nome')['fine'].cummax()
+    precedente = fine_massima.groupby(ordinati['nome']).shift()
+    nuovo_blocco = precedente.isna() | (ordinati['inizio'] > precedente + pd.Timedelta(days=1))
+    return (ordinati.groupby(nuovo_blocco.cumsum())
+            .agg(nome=('nome', 'first'), inizio=('inizio', 'min'), fine=('fine', 'max'))
+            .reset_index(drop=True))
+
+def _giorni_singoli(assenze):
+    # Un recupero o un riposo su più giorni diventa una riga per giorno
+    durata = (assenze['fine'] - assenze['inizio']).dt.days + 1
+    giorni = assenze.loc[assenze.index.repeat(durata)]
+    scarto = giorni.groupby(level=0).cumcount()
+    return pd.DataFrame({'nome': giorni['nome'].values,
+                         'giorno': (giorni['inizio'] + pd.to_timedelta(scarto, unit='D')).values})
+
+def applica(dipendenti, assenze, preferenze, crea_dipendenti=False):
+    # Riporta assenze e preferenze validate sui Dipendente; con crea_dipendenti i nomi nuovi
+    # vengono aggiunti in fondo alla lista dipendenti
+    per_nome = {d.nome: d for d in dipendenti}
+    nuovi = []
+    for nome in pd.unique(pd.concat([assenze['nome'], preferenze['nome']])):
+        if nome not in per_nome:
+            if not crea_dipendenti:
+                raise KeyError(f"Dipendente sconosciuto: {nome}")
+            per_nome[nome] = Dipendente(nome)
+            dipendenti.append(per_nome[nome])
+            nuovi.append(per_nome[nome])
+    modificati = set()
+
+    # Le operazioni restano vettoriali fino alla fine: ai Dipendente arrivano liste Python già pronte
+    ferie = assenze[assenze['tipo'] == 'ferie']
+    if not ferie.empty:
+        nomi_ferie = pd.unique(ferie['nome'])
+        esistenti = pd.DataFrame([(nome, inizio, fine) for nome in nomi_ferie for inizio, fine in per_nome[nome].ferie],
+                                 columns=['nome', 'inizio', 'fine'])
+        esistenti['inizio'] = pd.to_datetime(esistenti['inizio'])
+        esistenti['fine'] = pd.to_datetime(esistenti['fine'])
+        unite = unisci_intervalli(pd.concat([esistenti, ferie[['nome', 'inizio', 'fine']]], ignore_index=True))
+        intervalli = {nome: [] for nome in nomi_ferie}
+        for nome, inizio, fine in zip(unite['nome'].tolist(), unite['inizio'].dt.date.tolist(),
+                                      unite['fine'].dt.date.tolist()):
+            intervalli[nome].append((inizio, fine))
+        for nome, lista in intervalli.items():
+            per_nome[nome].ferie = lista
+        modificati.update(nomi_ferie)
+
+    singoli = {}
+    for tipo, campo in (('recupero', 'recuperi'), ('riposo', 'riposi_aggiuntivi')):
+        giorni = _giorni_singoli(assenze[assenze['tipo'] == tipo])
+        singoli[tipo] = len(giorni)
+        nuovi_giorni = {}
+        for nome, giorno in zip(giorni['nome'].tolist(), giorni['giorno'].dt.date.tolist()):
+            nuovi_giorni.setdefault(nome, set()).add(giorno)
+        for nome, insieme in nuovi_giorni.items():
+            dip = per_nome[nome]
+            setattr(dip, campo, sorted(set(getattr(dip, campo)) | insieme))
+        modificati.update(nuovi_giorni)
+
+    turni_preferenze = {}
+    for nome, turno, priorita, ammesso in zip(preferenze['nome'].tolist(), preferenze['turno'].tolist(),
+                                              preferenze['priorita'].tolist(), preferenze['ammesso'].tolist()):
+        possibili, priorita_turni = turni_preferenze.setdefault(nome, ([], {}))
+        if ammesso:
+            possibili.append(turno)
+        priorita_turni[turno] = priorita
+    for nome, (possibili, priorita_turni) in turni_preferenze.items():
+        per_nome[nome].turni_possibili = possibili
+        per_nome[nome].priorita_turni = priorita_turni
+    modificati.update(turni_preferenze)
+
+    # Giorni toccati dalle nuove assenze (per aggiornare un'anteprima già generata)
+    giorni = set(_giorni_singoli(assenze)['giorno'].dt.date.tolist())
+    return RisultatoImportazione([d for d in dipendenti if d.nome in modificati], nuovi, len(ferie),
+                                 singoli['recupero'], singoli['riposo'], len(preferenze), giorni)
+
+def importa(percorso, dipendenti, archivio=None, crea_dipendenti=False):
+    # Legge, valida e applica un file di assenze e preferenze; se viene passato un ArchivioTurni
+    # i dipendenti modificati vi sono salvati in un'unica transazione. Se il file contiene errori
+    # non viene modificato nulla (ErroriImportazione con l'elenco completo).
+    tabella = leggi_tabella(percorso)
+    assenze, preferenze = valida(tabella, None if crea_dipendenti else {d.nome for d in dipendenti})
+    risultato = applica(dipendenti, assenze, preferenze, crea_dipendenti)
+    if archivio is not None:
+        archivio.salva_dipendenti(risultato.modificati)
+    return risultato
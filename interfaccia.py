@@ -0,0 +1,802 @@
+# Interfaccia grafica Tk per la gestione di dipendenti, preferenze, assenze e turni.
+# Separata dal nucleo (orari.py) così che generazione ed esportazione possano girare senza display.
+
+import datetime
+import calendar
+import queue
+import threading
+import tkinter as tk
+from tkinter import messagebox, simpledialog, filedialog, ttk
+
+from orari import TURNI, SIGLE, Dipendente, MatriceTurni, genera_turni_periodo
+import solutore
+from archivio import ArchivioTurni
+from equita import ContatoriEquita, indice_equita
+from esportazione import COLORI_STATO, esporta_pdf, stati_celle
+from importazione import ErroriImportazione, importa
+from riparazione import ripara_turni
+from versioni import StoricoVersioni
+from validazione import Validatore, conta_per_tipo
+from statistiche import DURATA_MINUTI
+
+def _genera(inizio, fine, dipendenti, stato, motore, tempo_limite, tentativi, progresso, annulla, equita=None):
+    # Eseguita nel thread di lavoro: non tocca Tk né Dipendente.turni; equita è una copia dei
+    # contatori riservata a questo thread.
+    # Restituisce (calendario, stato, seme, punteggio); seme e punteggio solo con più tentativi.
+    if tentativi > 1:
+        # Più generazioni con semi diversi in parallelo: si tiene la migliore e se ne mostra il seme
+        migliore = solutore.genera_migliore(inizio, fine, dipendenti, tentativi=tentativi, motore=motore, stato=stato,
+                                            tempo_limite=tempo_limite, progresso=progresso, annulla=annulla,
+                                            equita=equita)
+        return migliore.calendario, migliore.stato, migliore.seme, migliore.punteggio
+    if motore == "greedy":
+        calendario, nuovo_stato = genera_turni_periodo(inizio, fine, dipendenti, stato, aggiorna_dipendenti=False,
+                                                       progresso=progresso, annulla=annulla, equita=equita)
+    else:
+        calendario, nuovo_stato = solutore.risolvi(inizio, fine, dipendenti, motore=motore, stato=stato,
+                                                   tempo_limite=tempo_limite, aggiorna_dipendenti=False,
+                                                   progresso=progresso, annulla=annulla, equita=equita)
+    return calendario, nuovo_stato, None, None
+
+# Lavoro lungo (generazione, esportazione) eseguito in un thread separato con una finestra di
+# avanzamento modale e un pulsante Annulla. Il thread non tocca mai Tk: l'avanzamento è un numero
+# letto periodicamente con root.after e il risultato (o l'errore) arriva tramite una coda.
+class LavoroInBackground:
+    INTERVALLO_MS = 100
+
+    def __init__(self, root, titolo, funzione, al_termine, al_errore):
+        # funzione(progresso, annulla) gira nel thread di lavoro; al_termine(risultato, annullato) e
+        # al_errore(eccezione) vengono chiamate nel thread di Tk
+        self.root = root
+        self.al_termine = al_termine
+        self.al_errore = al_errore
+        self.annulla = threading.Event()
+        self.avanzamento = 0.0
+        self.coda = queue.Queue()
+
+        self.finestra = tk.Toplevel(root)
+        self.finestra.title(titolo)
+        self.finestra.transient(root)
+        self.finestra.protocol("WM_DELETE_WINDOW", self.richiedi_annullamento)
+        tk.Label(self.finestra, text=titolo).pack(padx=10, pady=5)
+        self.barra = ttk.Progressbar(self.finestra, length=300, maximum=1.0)
+        self.barra.pack(padx=10)
+        self.pulsante = tk.Button(self.finestra, text="Annulla", command=self.richiedi_annullamento)
+        self.pulsante.pack(pady=5)
+        # Finestra modale: dipendenti e assenze non cambiano mentre il thread li legge. Il grab
+        # fallisce su una finestra non ancora mostrata (X11), quindi si attende che sia visibile
+        self.finestra.wait_visibility()
+        self.finestra.grab_set()
+
+        self.thread = threading.Thread(target=self._esegui, args=(funzione,), daemon=True)
+        self.thread.start()
+        self.root.after(self.INTERVALLO_MS, self._controlla)
+
+    def _progresso(self, frazione):
+        self.avanzamento = frazione
+
+    def _esegui(self, funzione):
+        try:
+            self.coda.put(('fatto', funzione(self._progresso, self.annulla)))
+        except Exception as e:
+            self.coda.put(('errore', e))
+
+    def richiedi_annullamento(self):
+        self.annulla.set()
+        self.pulsante.config(state="disabled", text="Annullamento...")
+
+    def _controlla(self):
+        try:
+            esito, valore = self.coda.get_nowait()
+        except queue.Empty:
+            self.barra['value'] = self.avanzamento
+            self.root.after(self.INTERVALLO_MS, self._controlla)
+            return
+        self.finestra.grab_release()
+        self.finestra.destroy()
+        if esito == 'errore':
+            self.al_errore(valore)
+        else:
+            self.al_termine(valore, self.annulla.is_set())
+
+def _colore_tk(rgb):
+    return "#%02x%02x%02x" % rgb
+
+# Griglia dei turni su Canvas con scorrimento virtuale: a ogni ridisegno si creano solo gli
+# elementi delle righe e colonne visibili, qualunque sia la dimensione del periodo o dell'organico.
+# Il menu dei turni si apre sulla cella cliccata e le modifiche vanno direttamente sulla matrice;
+# le celle cambiate restano in self.modificate, così il salvataggio tocca solo quelle.
+class GrigliaTurni(tk.Frame):
+    LARGHEZZA_NOME = 140
+    LARGHEZZA_CELLA = 44
+    LARGHEZZA_ORE = 56
+    ALTEZZA_RIGA = 22
+    RIGHE_INTESTAZIONE = 2
+    COLORE_BORDO = "#c8c8c8"
+    COLORE_INTESTAZIONE = "#f0f0f0"
+    COLORE_WEEKEND = "#dde4f0"
+    COLORE_MODIFICATA = "#1f4fbf"
+    COLORE_VIOLAZIONE = "#d62728"
+
+    def __init__(self, master, matrice, dipendenti, al_cambio=None):
+        super().__init__(master)
+        self.matrice = matrice
+        self.dipendenti = dipendenti
+        self.giorni = matrice.giorni()
+        # al_cambio(giorno, nome) viene chiamata dopo ogni cella modificata
+        self.al_cambio = al_cambio
+        self.modificate = set()
+        # Celle (giorno, nome) e giorni con violazioni da evidenziare, impostati con segnala()
+        self.segnalate = set()
+        self.giorni_segnalati = set()
+        codici, self.stati = stati_celle(matrice, dipendenti)
+        self.ore = (DURATA_MINUTI[codici].sum(axis=0) / 60).tolist()
+        self.colori_stato = {s: _colore_tk(rgb) for s, rgb in COLORI_STATO.items()}
+        self.nomi_giorni = [calendar.day_abbr[g.weekday()][:3] for g in self.giorni]
+        self.prima_riga = 0
+        self.prima_colonna = 0
+
+        self.canvas = tk.Canvas(self, background="white", highlightthickness=0,
+                                width=self.LARGHEZZA_NOME + 31 * self.LARGHEZZA_CELLA + self.LARGHEZZA_ORE,
+                                height=(self.RIGHE_INTESTAZIONE + min(len(dipendenti), 25)) * self.ALTEZZA_RIGA)
+        self.barra_y = tk.Scrollbar(self, orient="vertical", command=self.scorri_righe)
+        self.barra_x = tk.Scrollbar(self, orient="horizontal", command=self.scorri_colonne)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.barra_y.grid(row=0, column=1, sticky="ns")
+        self.barra_x.grid(row=1, column=0, sticky="ew")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.menu = tk.Menu(self, tearoff=0)
+
+        self.canvas.bind("<Configure>", lambda e: self.disegna())
+        self.canvas.bind("<Button-1>", self._clic)
+        self.canvas.bind("<MouseWheel>", lambda e: self.scorri_righe("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Shift-MouseWheel>", lambda e: self.scorri_colonne("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.scorri_righe("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.scorri_righe("scroll", 1, "units"))
+        self.canvas.bind("<Shift-Button-4>", lambda e: self.scorri_colonne("scroll", -1, "units"))
+        self.canvas.bind("<Shift-Button-5>", lambda e: self.scorri_colonne("scroll", 1, "units"))
+
+    def _visibili(self):
+        larghezza = self.canvas.winfo_width() - self.LARGHEZZA_NOME - self.LARGHEZZA_ORE
+        altezza = self.canvas.winfo_height() - self.RIGHE_INTESTAZIONE * self.ALTEZZA_RIGA
+        return max(1, altezza // self.ALTEZZA_RIGA), max(1, larghezza // self.LARGHEZZA_CELLA)
+
+    @staticmethod
+    def _nuova_posizione(args, attuale, totale, visibili):
+        # Interpreta i comandi della Scrollbar ("moveto" frazione / "scroll" n units|pages)
+        if args[0] == "moveto":
+            nuova = int(round(float(args[1]) * totale))
+        else:
+            nuova = attuale + int(args[1]) * (visibili if args[2] == "pages" else 1)
+        return max(0, min(nuova, totale - visibili))
+
+    def scorri_righe(self, *args):
+        righe, _ = self._visibili()
+        self.prima_riga = self._nuova_posizione(args, self.prima_riga, len(self.dipendenti), righe)
+        self.disegna()
+
+    def scorri_colonne(self, *args):
+        _, colonne = self._visibili()
+        self.prima_colonna = self._nuova_posizione(args, self.prima_colonna, len(self.giorni), colonne)
+        self.disegna()
+
+    def disegna(self):
+        c = self.canvas
+        c.delete("all")
+        righe, colonne = self._visibili()
+        self.prima_riga = max(0, min(self.prima_riga, len(self.dipendenti) - righe))
+        self.prima_colonna = max(0, min(self.prima_colonna, len(self.giorni) - colonne))
+        r0, c0 = self.prima_riga, self.prima_colonna
+        r1, c1 = min(len(self.dipendenti), r0 + righe), min(len(self.giorni), c0 + colonne)
+        h, lc = self.ALTEZZA_RIGA, self.LARGHEZZA_CELLA
+        x0, y0 = self.LARGHEZZA_NOME, self.RIGHE_INTESTAZIONE * h
+        x_ore = x0 + (c1 - c0) * lc
+
+        # Intestazione: giorno della settimana e data, colonna delle ore
+        c.create_rectangle(0, 0, x0, y0, fill=self.COLORE_INTESTAZIONE, outline=self.COLORE_BORDO)
+        c.create_text(6, y0 / 2, text="Dipendente", anchor="w")
+        for j, g in enumerate(range(c0, c1)):
+            x = x0 + j * lc
+            giorno = self.giorni[g]
+            sfondo = self.COLORE_WEEKEND if giorno.weekday() >= 5 else self.COLORE_INTESTAZIONE
+            c.create_rectangle(x, 0, x + lc, y0, fill=sfondo, outline=self.COLORE_BORDO)
+            c.create_text(x + lc / 2, h / 2, text=self.nomi_giorni[g])
+            c.create_text(x + lc / 2, h * 1.5, text=giorno.strftime("%d/%m"),
+                          fill=self.COLORE_VIOLAZIONE if giorno in self.giorni_segnalati else "black")
+        c.create_rectangle(x_ore, 0, x_ore + self.LARGHEZZA_ORE, y0, fill=self.COLORE_INTESTAZIONE,
+                           outline=self.COLORE_BORDO)
+        c.create_text(x_ore + self.LARGHEZZA_ORE / 2, y0 / 2, text="Ore")
+
+        # Righe visibili: i codici si leggono a blocchi dalla matrice
+        for i, r in enumerate(range(r0, r1)):
+            y = y0 + i * h
+            d = self.dipendenti[r]
+            c.create_rectangle(0, y, x0, y + h, fill=self.COLORE_INTESTAZIONE, outline=self.COLORE_BORDO)
+            c.create_text(6, y + h / 2, text=d.nome, anchor="w")
+            pos = self.matrice.posizioni.get(d.nome)
+            codici = self.matrice.celle[c0:c1, pos].tolist() if pos is not None else [0] * (c1 - c0)
+            stati = self.stati[c0:c1, r].tolist()
+            for j, (codice, stato) in enumerate(zip(codici, stati)):
+                x = x0 + j * lc
+                c.create_rectangle(x, y, x + lc, y + h, fill=self.colori_stato.get(stato, "white"),
+                                   outline=self.COLORE_BORDO)
+                if (self.giorni[c0 + j], d.nome) in self.segnalate:
+                    c.create_rectangle(x + 1, y + 1, x + lc - 1, y + h - 1, outline=self.COLORE_VIOLAZIONE, width=2)
+                if codice:
+                    modificata = (self.giorni[c0 + j], d.nome) in self.modificate
+                    c.create_text(x + lc / 2, y + h / 2, text=SIGLE[codice],
+                                  fill=self.COLORE_MODIFICATA if modificata else "black")
+            c.create_rectangle(x_ore, y, x_ore + self.LARGHEZZA_ORE, y + h, outline=self.COLORE_BORDO)
+            c.create_text(x_ore + self.LARGHEZZA_ORE / 2, y + h / 2, text=f"{self.ore[r]:.1f}")
+
+        self.barra_y.set(r0 / max(1, len(self.dipendenti)), r1 / max(1, len(self.dipendenti)))
+        self.barra_x.set(c0 / max(1, len(self.giorni)), c1 / max(1, len(self.giorni)))
+
+    def segnala(self, violazioni):
+        # Evidenzia le celle dei dipendenti e le date dei giorni (copertura) con violazioni
+        self.segnalate = {(v.giorno, v.nome) for v in violazioni if v.nome}
+        self.giorni_segnalati = {v.giorno for v in violazioni if not v.nome}
+        self.disegna()
+
+    def cella_in(self, x, y):
+        # (riga, colonna) della cella alle coordinate del canvas, oppure None
+        if x < self.LARGHEZZA_NOME or y < self.RIGHE_INTESTAZIONE * self.ALTEZZA_RIGA:
+            return None
+        r = self.prima_riga + int((y - self.RIGHE_INTESTAZIONE * self.ALTEZZA_RIGA) // self.ALTEZZA_RIGA)
+        g = self.prima_colonna + int((x - self.LARGHEZZA_NOME) // self.LARGHEZZA_CELLA)
+        righe, colonne = self._visibili()
+        if r >= min(len(self.dipendenti), self.prima_riga + righe) or \
+                g >= min(len(self.giorni), self.prima_colonna + colonne):
+            return None
+        return r, g
+
+    def _clic(self, event):
+        cella = self.cella_in(event.x, event.y)
+        if cella is None:
+            return
+        r, g = cella
+        # Un solo menu riusato per tutte le celle, riempito con i turni possibili del dipendente
+        self.menu.delete(0, "end")
+        for turno in [""] + list(self.dipendenti[r].turni_possibili):
+            self.menu.add_command(label=turno or "Riposo", command=lambda t=turno: self.imposta(r, g, t))
+        self.menu.tk_popup(event.x_root, event.y_root)
+
+    def imposta(self, r, g, turno):
+        d = self.dipendenti[r]
+        giorno = self.giorni[g]
+        if d.nome in self.matrice.posizioni and self.matrice.turno(giorno, d.nome) == turno:
+            return
+        self.matrice.imposta(giorno, d.nome, turno)
+        self.modificate.add((giorno, d.nome))
+        self.ore[r] = DURATA_MINUTI[self.matrice.celle[:, self.matrice.posizioni[d.nome]]].sum() / 60
+        self.disegna()
+        if self.al_cambio:
+            self.al_cambio(giorno, d.nome)
+
+class TurniApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Gestione Turni Struttura Ricettiva")
+        self.dipendenti = self.carica_dipendenti()
+        self.calendario = {}
+        self.anteprima_calendario = None
+        # L'anteprima va nell'archivio solo quando l'utente la salva; da lì in poi solo le celle cambiate
+        self.anteprima_salvata = False
+        # Stato delle regole di riposo al termine dell'ultimo periodo generato
+        self.stato_generazione = None
+        # Stato all'inizio del periodo in anteprima e celle corrette a mano (da non toccare nelle riparazioni)
+        self.stato_iniziale = None
+        self.celle_fissate = set()
+        # Contatori di equità (ore, notti, weekend, festivi): self.equita comprende l'anteprima,
+        # equita_prima si ferma al giorno prima del suo inizio e serve a rigenerare lo stesso periodo.
+        # Si ricostruiscono dall'archivio solo se il periodo non prosegue nessuno dei due.
+        self.equita = None
+        self.equita_prima = None
+        # Versioni del periodo in anteprima (generazioni e correzioni), per confrontarle e ripristinarle
+        self.versioni = None
+        self.versione_corrente = None
+
+        self.label = tk.Label(root, text="Gestione Dipendenti:")
+        self.label.pack()
+
+        self.lista_box = tk.Listbox(root, selectmode=tk.SINGLE, width=50)
+        self.lista_box.pack()
+        self.lista_box.bind('<<ListboxSelect>>', self.mostra_preferenze_turni)
+
+        self.entry = tk.Entry(root)
+        self.entry.pack()
+
+        self.aggiungi_button = tk.Button(root, text="Aggiungi Dipendente", command=self.aggiungi_dipendente)
+        self.aggiungi_button.pack()
+
+        self.rimuovi_button = tk.Button(root, text="Rimuovi Dipendente", command=self.rimuovi_dipendente)
+        self.rimuovi_button.pack()
+
+        self.preferenze_frame = tk.Frame(root)
+        self.preferenze_frame.pack()
+        self.preferenze_label = tk.Label(self.preferenze_frame, text="Preferenze turni (seleziona un dipendente)")
+        self.preferenze_label.pack()
+        self.turni_vars = {}
+        self.priorita_vars = {}
+
+        self.aggiorna_preferenze_turni()
+
+        self.ferie_button = tk.Button(root, text="Assegna Ferie", command=self.assegna_ferie)
+        self.ferie_button.pack()
+
+        self.recupero_button = tk.Button(root, text="Assegna Recupero", command=self.assegna_recupero)
+        self.recupero_button.pack()
+
+        self.importa_button = tk.Button(root, text="Importa Assenze e Preferenze", command=self.importa_da_file)
+        self.importa_button.pack()
+
+        self.modifica_tabella_button = tk.Button(root, text="Modifica Tabella Manualmente", command=self.modifica_tabella)
+        self.modifica_tabella_button.pack()
+
+        self.motore_frame = tk.Frame(root)
+        self.motore_frame.pack()
+        tk.Label(self.motore_frame, text="Motore:").pack(side='left')
+        self.motore_var = tk.StringVar(value="greedy")
+        tk.OptionMenu(self.motore_frame, self.motore_var, "greedy", "ricottura").pack(side='left')
+        tk.Label(self.motore_frame, text="Tempo max (s):").pack(side='left')
+        self.tempo_limite_var = tk.IntVar(value=10)
+        tk.Spinbox(self.motore_frame, from_=1, to=600, width=4, textvariable=self.tempo_limite_var).pack(side='left')
+        tk.Label(self.motore_frame, text="Tentativi:").pack(side='left')
+        self.tentativi_var = tk.IntVar(value=1)
+        tk.Spinbox(self.motore_frame, from_=1, to=64, width=3, textvariable=self.tentativi_var).pack(side='left')
+
+        self.genera_button = tk.Button(root, text="Genera Turni (Anteprima)", command=self.genera_turni_anteprima)
+        self.genera_button.pack()
+
+        self.versioni_button = tk.Button(root, text="Confronta Versioni", command=self.confronta_versioni)
+        self.versioni_button.pack()
+
+        self.aggiorna_lista()
+
+    def carica_dipendenti(self):
+        # Archivio SQLite; il vecchio dipendenti.pkl viene importato una sola volta.
+        # Lo storico dei turni non viene caricato all'avvio.
+        self.archivio = ArchivioTurni()
+        self.archivio.importa_pickle()
+        return self.archivio.carica_dipendenti()
+
+    def aggiorna_lista(self):
+        self.lista_box.delete(0, tk.END)
+        for dip in self.dipendenti:
+            self.lista_box.insert(tk.END, dip.nome)
+
+    def aggiungi_dipendente(self):
+        nome = self.entry.get().strip()
+        if nome and nome not in [d.nome for d in self.dipendenti]:
+            dip = Dipendente(nome)
+            self.dipendenti.append(dip)
+            self.archivio.salva_dipendente(dip)
+            self.entry.delete(0, tk.END)
+            self.aggiorna_lista()
+        else:
+            messagebox.showerror("Errore", "Nome invalido o già presente.")
+
+    def rimuovi_dipendente(self):
+        selezione = self.lista_box.curselection()
+        if selezione:
+            index = selezione[0]
+            dip = self.dipendenti.pop(index)
+            self.archivio.rimuovi_dipendente(dip.nome)
+            self.aggiorna_lista()
+        else:
+            messagebox.showerror("Errore", "Seleziona un dipendente da rimuovere.")
+
+    def assegna_ferie(self):
+        nome = simpledialog.askstring("Assegna Ferie", "Nome del dipendente:")
+        inizio_str = simpledialog.askstring("Inizio Ferie", "Data inizio (YYYY-MM-DD):")
+        fine_str = simpledialog.askstring("Fine Ferie", "Data fine (YYYY-MM-DD):")
+        try:
+            inizio = datetime.datetime.strptime(inizio_str, "%Y-%m-%d").date()
+            fine = datetime.datetime.strptime(fine_str, "%Y-%m-%d").date()
+            dip = next((d for d in self.dipendenti if d.nome == nome), None)
+            if dip:
+                dip.assegna_ferie(inizio, fine)
+                self.archivio.aggiungi_assenza(dip.nome, 'ferie', inizio, fine)
+                messagebox.showinfo("Successo", "Ferie assegnate.")
+                self.ripara_anteprima([inizio + datetime.timedelta(days=i) for i in range((fine - inizio).days + 1)])
+            else:
+                messagebox.showerror("Errore", "Dipendente non trovato.")
+        except Exception as e:
+            messagebox.showerror("Errore", f"Errore nell'assegnazione: {e}")
+
+    def assegna_recupero(self):
+        nome = simpledialog.askstring("Assegna Recupero", "Nome del dipendente:")
+        giorno_str = simpledialog.askstring("Recupero", "Data del recupero (YYYY-MM-DD):")
+        try:
+            giorno = datetime.datetime.strptime(giorno_str, "%Y-%m-%d").date()
+            dip = next((d for d in self.dipendenti if d.nome == nome), None)
+            if dip:
+                dip.assegna_recupero(giorno)
+                self.archivio.aggiungi_assenza(dip.nome, 'recupero', giorno)
+                messagebox.showinfo("Successo", "Recupero assegnato.")
+                self.ripara_anteprima([giorno])
+            else:
+                messagebox.showerror("Errore", "Dipendente non trovato.")
+        except Exception as e:
+            messagebox.showerror("Errore", f"Errore nell'assegnazione: {e}")
+
+    def importa_da_file(self):
+        percorso = filedialog.askopenfilename(filetypes=[("Fogli di calcolo", "*.csv *.xlsx"), ("Tutti i file", "*.*")])
+        if not percorso:
+            return
+        try:
+            risultato = importa(percorso, self.dipendenti, self.archivio)
+        except ErroriImportazione as e:
+            # Tutti gli errori insieme; nella finestra solo i primi
+            righe = [f"riga {r}, {c}: {m}" for r, c, m in e.errori[:20]]
+            if len(e.errori) > 20:
+                righe.append(f"... e altri {len(e.errori) - 20}")
+            messagebox.showerror("Errore", f"Nessun dato importato, {len(e.errori)} errori nel file:\n" + "\n".join(righe))
+            return
+        except Exception as e:
+            messagebox.showerror("Errore", f"Errore nell'importazione: {e}")
+            return
+        self.aggiorna_preferenze_turni()
+        messagebox.showinfo("Successo", risultato.riepilogo())
+        self.ripara_anteprima(sorted(risultato.giorni))
+
+    def ripara_anteprima(self, giorni):
+        # Dopo una nuova assenza ririsolve solo i giorni toccati (e i vicini) dell'anteprima,
+        # lasciando invariate le celle corrette a mano
+        if not self.anteprima_calendario:
+            return
+        giorni = [g for g in giorni if g in self.anteprima_calendario]
+        if not giorni:
+            return
+        if not messagebox.askyesno("Anteprima", "Aggiornare l'anteprima dei turni per la nuova assenza?"):
+            return
+        calendario, dipendenti, bloccate = self.anteprima_calendario, list(self.dipendenti), set(self.celle_fissate)
+
+        def lavoro(progresso, annulla):
+            return ripara_turni(calendario, dipendenti, giorni, bloccate=bloccate, stato=self.stato_iniziale,
+                                progresso=progresso, annulla=annulla)
+
+        def fatto(risultato, annullato):
+            # Anche se annullata, la riparazione restituisce la migliore soluzione trovata
+            self.anteprima_calendario, modifiche = risultato
+            self.aggiorna_archivio_anteprima([(g, n, dopo) for g, n, _, dopo in modifiche])
+            for giorno, nome, prima, dopo in modifiche:
+                self.equita.sostituisci(nome, giorno, prima, dopo)
+            per_nome = {d.nome: d for d in self.dipendenti}
+            for giorno, nome, _, dopo in modifiche:
+                if dopo:
+                    per_nome[nome].aggiungi_turno(giorno, dopo)
+                else:
+                    per_nome[nome].rimuovi_turno(giorno)
+            if modifiche:
+                self.registra_versione("Riparazione",
+                                       MatriceTurni.da_calendario(self.anteprima_calendario, self.dipendenti))
+            dettaglio = "\n".join(f"{g.strftime('%d/%m')} {n}: {p or '-'} -> {d or '-'}" for g, n, p, d in modifiche[:20])
+            messagebox.showinfo("Anteprima", f"Celle modificate: {len(modifiche)}\n{dettaglio}")
+
+        LavoroInBackground(self.root, "Aggiornamento anteprima in corso...", lavoro, fatto,
+                           lambda e: messagebox.showerror("Errore", f"Errore durante l'aggiornamento: {e}"))
+
+    def modifica_turno(self):
+        nome = simpledialog.askstring("Modifica Turno", "Nome del dipendente:")
+        giorno_str = simpledialog.askstring("Modifica Turno", "Giorno (YYYY-MM-DD):")
+        nuovo_turno = simpledialog.askstring("Modifica Turno", f"Nuovo turno ({'/'.join(TURNI.keys())}):")
+        try:
+            giorno = datetime.datetime.strptime(giorno_str, "%Y-%m-%d").date()
+            dip = next((d for d in self.dipendenti if d.nome == nome), None)
+            if dip and nuovo_turno in TURNI:
+                dip.modifica_turno(giorno, nuovo_turno)
+                if giorno in self.calendario:
+                    self.calendario[giorno][nome] = nuovo_turno
+                messagebox.showinfo("Successo", "Turno modificato correttamente.")
+            else:
+                messagebox.showerror("Errore", "Dati non validi.")
+        except Exception as e:
+            messagebox.showerror("Errore", f"Errore nella modifica: {e}")
+
+    def chiedi_periodo(self):
+        # Propone il mese successivo a oggi, oppure la continuazione dell'ultimo periodo generato
+        if self.stato_generazione and self.stato_generazione.ultimo_giorno:
+            inizio = self.stato_generazione.ultimo_giorno + datetime.timedelta(days=1)
+        else:
+            oggi = datetime.date.today()
+            inizio = datetime.date(oggi.year + oggi.month // 12, oggi.month % 12 + 1, 1)
+        fine = datetime.date(inizio.year, inizio.month, calendar.monthrange(inizio.year, inizio.month)[1])
+        inizio_str = simpledialog.askstring("Periodo", "Data inizio (YYYY-MM-DD):", initialvalue=inizio.isoformat())
+        if not inizio_str:
+            return None
+        fine_str = simpledialog.askstring("Periodo", "Data fine (YYYY-MM-DD):", initialvalue=fine.isoformat())
+        if not fine_str:
+            return None
+        try:
+            inizio = datetime.datetime.strptime(inizio_str, "%Y-%m-%d").date()
+            fine = datetime.datetime.strptime(fine_str, "%Y-%m-%d").date()
+        except ValueError as e:
+            messagebox.showerror("Errore", f"Data non valida: {e}")
+            return None
+        if fine < inizio:
+            messagebox.showerror("Errore", "La data di fine precede la data di inizio.")
+            return None
+        return inizio, fine
+
+    def genera_periodo(self, inizio, fine, al_termine):
+        # Genera in background e chiama al_termine(calendario) nel thread di Tk. Se il periodo
+        # prosegue l'ultimo generato, le regole di riposo ripartono dal suo stato.
+        stato = self.stato_generazione
+        if not stato or stato.ultimo_giorno != inizio - datetime.timedelta(days=1):
+            stato = None
+        self.stato_iniziale = stato
+        self.celle_fissate = set()
+        vigilia = inizio - datetime.timedelta(days=1)
+        if self.equita is not None and self.equita.fino_al == vigilia:
+            self.equita_prima = self.equita.copia()
+        elif self.equita_prima is None or self.equita_prima.fino_al != vigilia:
+            self.equita_prima = ContatoriEquita.da_archivio(self.archivio, vigilia)
+        # Si riparte dai contatori prima del periodo: una nuova generazione sostituisce l'anteprima
+        self.equita = self.equita_prima.copia()
+        equita = self.equita.copia()
+        # Le variabili Tk si leggono qui: il thread di lavoro non tocca l'interfaccia
+        motore, tempo_limite, tentativi = self.motore_var.get(), self.tempo_limite_var.get(), self.tentativi_var.get()
+        dipendenti = list(self.dipendenti)
+
+        def lavoro(progresso, annulla):
+            return _genera(inizio, fine, dipendenti, stato, motore, tempo_limite, tentativi, progresso, annulla,
+                           equita)
+
+        def fatto(risultato, annullato):
+            calendario, self.stato_generazione, seme, punteggio = risultato
+            matrice = MatriceTurni.da_calendario(calendario, self.dipendenti)
+            matrice.applica_a(self.dipendenti)
+            # Dopo un annullamento del greedy i giorni oltre l'ultimo generato sono vuoti e non contano
+            if self.stato_generazione.ultimo_giorno is not None:
+                self.equita.registra_matrice(matrice, fino_al=self.stato_generazione.ultimo_giorno)
+            self.registra_versione("Generazione", matrice)
+            if annullato:
+                ultimo = self.stato_generazione.ultimo_giorno
+                dettaglio = f" fino al {ultimo.strftime('%d/%m/%Y')}" if ultimo and ultimo < fine else ""
+                messagebox.showwarning("Attenzione", f"Generazione annullata: si usa il miglior risultato trovato{dettaglio}.")
+            elif seme is not None:
+                messagebox.showinfo("Info", f"Scelto il seme {seme} (punteggio {punteggio:.1f}).")
+            al_termine(calendario)
+
+        LavoroInBackground(self.root, "Generazione turni in corso...", lavoro, fatto,
+                           lambda e: messagebox.showerror("Errore", f"Errore durante la generazione dei turni: {e}"))
+
+    def salva_pdf(self, calendario):
+        save_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
+        if not save_path:
+            messagebox.showwarning("Attenzione", "Salvataggio annullato. Il file PDF non è stato creato.")
+            return
+        dipendenti = list(self.dipendenti)
+
+        def fatto(completato, annullato):
+            if completato:
+                messagebox.showinfo("Successo", f"Turni salvati in {save_path}")
+            else:
+                messagebox.showwarning("Attenzione", "Esportazione annullata. Il file PDF non è stato creato.")
+
+        LavoroInBackground(self.root, "Esportazione PDF in corso...",
+                           lambda progresso, annulla: esporta_pdf(calendario, dipendenti, save_path, progresso, annulla),
+                           fatto, lambda e: messagebox.showerror("Errore", f"Errore durante l'esportazione: {e}"))
+
+    def genera_turni_gui(self):
+        if not self.dipendenti:
+            messagebox.showerror("Errore", "Aggiungi almeno un dipendente.")
+            return
+        periodo = self.chiedi_periodo()
+        if not periodo:
+            return
+        # Azzera i turni di tutti i dipendenti prima di generare
+        for dip in self.dipendenti:
+            dip.azzera_turni()
+
+        def generato(calendario):
+            self.calendario = calendario
+            self.archivio.salva_turni(self.calendario, self.dipendenti)
+            self.salva_pdf(self.calendario)
+
+        self.genera_periodo(*periodo, generato)
+
+    def mostra_preferenze_turni(self, event=None):
+        for widget in self.preferenze_frame.winfo_children():
+            if widget != self.preferenze_label:
+                widget.destroy()
+        selezione = self.lista_box.curselection()
+        if not selezione:
+            return
+        index = selezione[0]
+        dip = self.dipendenti[index]
+        self.turni_vars = {}
+        self.priorita_vars = {}
+        for turno in TURNI.keys():
+            var = tk.BooleanVar(value=turno in dip.turni_possibili)
+            prio = tk.IntVar(value=dip.priorita_turni.get(turno, 1))
+            self.turni_vars[turno] = var
+            self.priorita_vars[turno] = prio
+            frame = tk.Frame(self.preferenze_frame)
+            frame.pack(anchor='w')
+            tk.Checkbutton(frame, text=turno, variable=var).pack(side='left')
+            tk.Label(frame, text='Priorità:').pack(side='left')
+            tk.Spinbox(frame, from_=1, to=5, width=2, textvariable=prio).pack(side='left')
+        tk.Button(self.preferenze_frame, text="Salva Preferenze", command=self.salva_preferenze_turni).pack()
+
+    def salva_preferenze_turni(self):
+        selezione = self.lista_box.curselection()
+        if not selezione:
+            return
+        index = selezione[0]
+        dip = self.dipendenti[index]
+        dip.turni_possibili = [t for t, v in self.turni_vars.items() if v.get()]
+        dip.priorita_turni = {t: self.priorita_vars[t].get() for t in dip.turni_possibili}
+        self.archivio.salva_preferenze(dip)
+        messagebox.showinfo("Successo", "Preferenze turni salvate!")
+
+    def aggiorna_preferenze_turni(self):
+        self.mostra_preferenze_turni()
+
+    def modifica_tabella(self):
+        # Da implementare: apertura finestra con tabella modificabile
+        messagebox.showinfo("Info", "Funzionalità di modifica tabella manuale in sviluppo.")
+
+    def genera_turni_anteprima(self):
+        if not self.dipendenti:
+            messagebox.showerror("Errore", "Aggiungi almeno un dipendente.")
+            return
+        periodo = self.chiedi_periodo()
+        if not periodo:
+            return
+        for dip in self.dipendenti:
+            dip.azzera_turni()
+
+        def generato(calendario):
+            self.anteprima_calendario = calendario
+            self.anteprima_salvata = False
+            self.mostra_anteprima_tabella()
+
+        self.genera_periodo(*periodo, generato)
+
+    def mostra_anteprima_tabella(self):
+        if not self.anteprima_calendario:
+            messagebox.showerror("Errore", "Nessuna anteprima disponibile.")
+            return
+        anteprima = tk.Toplevel(self.root)
+        anteprima.title("Anteprima e Modifica Tabella Turni")
+        # Le modifiche vanno su una copia della matrice, riportata nell'anteprima solo al salvataggio
+        matrice = MatriceTurni.da_calendario(self.anteprima_calendario, self.dipendenti).copia()
+        # Righe fisse per tutta la vita della finestra: chi viene aggiunto nel frattempo non entra
+        # nella griglia. Chi è stato aggiunto dopo la generazione non ha ancora una colonna nella
+        # matrice: la riceve alla prima modifica e il validatore si riallinea da sé.
+        dipendenti = list(self.dipendenti)
+        # Validazione completa all'apertura, poi solo la finestra dei giorni toccati da ogni modifica
+        stato = self.stato_iniziale
+        if stato is None or stato.ultimo_giorno != matrice.inizio - datetime.timedelta(days=1):
+            stato = None
+        validatore = Validatore(matrice, dipendenti, stato=stato)
+        violazioni = validatore.valida()
+        etichetta_violazioni = tk.Label(anteprima, fg=GrigliaTurni.COLORE_VIOLAZIONE)
+
+        def aggiorna_violazioni():
+            conteggi = conta_per_tipo(violazioni)
+            etichetta_violazioni.config(text=f"Violazioni: {len(violazioni)}" + (
+                " (" + ", ".join(f"{tipo} {n}" for tipo, n in conteggi.items()) + ")" if conteggi else ""))
+            griglia.segnala(violazioni)
+
+        def al_cambio(giorno, nome):
+            nonlocal violazioni
+            violazioni = validatore.rivalida(violazioni, giorno)
+            aggiorna_violazioni()
+
+        griglia = GrigliaTurni(anteprima, matrice, dipendenti, al_cambio=al_cambio)
+        griglia.pack(fill="both", expand=True)
+        indici = indice_equita(matrice, dipendenti)
+        tk.Label(anteprima, text="Indice di equità: " + ", ".join(f"{k} {v:.2f}" for k, v in indici.items())).pack()
+        etichetta_violazioni.pack()
+        aggiorna_violazioni()
+
+        def salva_modifiche():
+            if violazioni and griglia.modificate and not messagebox.askyesno(
+                    "Violazioni", "\n".join(v.descrizione() for v in violazioni[:15])
+                    + f"\n\n{len(violazioni)} violazioni in totale. Salvare comunque?", parent=anteprima):
+                return
+            # Solo le celle cambiate vanno tra quelle fissate, nei contatori di equità e nei turni dei
+            # dipendenti; nell'archivio l'anteprima entra tutta al primo salvataggio
+            per_nome = {d.nome: d for d in self.dipendenti}
+            for g, n in griglia.modificate:
+                dopo = matrice.turno(g, n)
+                self.equita.sostituisci(n, g, self.anteprima_calendario.get(g, {}).get(n), dopo)
+                if dopo:
+                    per_nome[n].aggiungi_turno(g, dopo)
+                else:
+                    per_nome[n].rimuovi_turno(g)
+            self.anteprima_calendario = matrice.calendario()
+            self.celle_fissate |= griglia.modificate
+            if self.anteprima_salvata:
+                self.archivio.aggiorna_turni([(g, n, matrice.turno(g, n)) for g, n in griglia.modificate])
+            else:
+                self.archivio.salva_turni(matrice, self.dipendenti)
+                self.anteprima_salvata = True
+            self.registra_versione("Modifica", matrice)
+            anteprima.destroy()
+            self.chiedi_salva_pdf()
+
+        def annulla():
+            anteprima.destroy()
+
+        pulsanti = tk.Frame(anteprima)
+        pulsanti.pack()
+        tk.Button(pulsanti, text="Salva e Genera PDF", command=salva_modifiche).pack(side="left")
+        tk.Button(pulsanti, text="Annulla", command=annulla).pack(side="left")
+
+    def aggiorna_archivio_anteprima(self, modifiche):
+        # Celle dell'anteprima cambiate da riparazioni o ripristini: finché l'anteprima non è salvata
+        # l'archivio non ne contiene nessuna e non c'è niente da aggiornare
+        if self.anteprima_salvata:
+            self.archivio.aggiorna_turni(modifiche)
+
+    def registra_versione(self, prefisso, matrice):
+        # Nuova versione del periodo; un periodo o un organico diverso riparte da un nuovo storico
+        if self.versioni is not None:
+            nome = f"{prefisso} {len(self.versioni.nomi()) + 1}"
+            try:
+                self.versioni.salva(nome, matrice, genitore=self.versione_corrente)
+                self.versione_corrente = nome
+                return
+            except ValueError:
+                pass
+        self.versione_corrente = f"{prefisso} 1"
+        self.versioni = StoricoVersioni(matrice, self.versione_corrente)
+
+    def confronta_versioni(self):
+        if self.versioni is None or len(self.versioni.nomi()) < 2:
+            messagebox.showinfo("Versioni", "Servono almeno due versioni dello stesso periodo.")
+            return
+        elenco = ", ".join(self.versioni.nomi())
+        da = simpledialog.askstring("Confronta Versioni", f"Versioni: {elenco}\nConfronta da:",
+                                    initialvalue=self.versioni.nomi()[-2])
+        if not da:
+            return
+        a = simpledialog.askstring("Confronta Versioni", f"Versioni: {elenco}\nConfronta con:",
+                                   initialvalue=self.versione_corrente)
+        if not a:
+            return
+        if da not in self.versioni or a not in self.versioni:
+            messagebox.showerror("Errore", "Versione inesistente.")
+            return
+        testo = f"{da} -> {a}\n{self.versioni.differenze(da, a).riepilogo()}"
+        if a == self.versione_corrente:
+            messagebox.showinfo("Versioni", testo)
+        elif messagebox.askyesno("Versioni", f"{testo}\n\nRipristinare {a} come anteprima?"):
+            self.ripristina_versione(a)
+
+    def ripristina_versione(self, nome):
+        # Archivio, storico dei dipendenti e contatori di equità cambiano solo nelle celle diverse
+        diff = self.versioni.differenze(self.versione_corrente, nome)
+        matrice = self.versioni[nome].matrice()
+        self.anteprima_calendario = matrice.calendario()
+        self.aggiorna_archivio_anteprima([(g, n, dopo) for g, n, _, dopo in diff.celle])
+        per_nome = {d.nome: d for d in self.dipendenti}
+        for giorno, nome_dip, prima, dopo in diff.celle:
+            self.equita.sostituisci(nome_dip, giorno, prima, dopo)
+            if nome_dip in per_nome:
+                if dopo:
+                    per_nome[nome_dip].aggiungi_turno(giorno, dopo)
+                else:
+                    per_nome[nome_dip].rimuovi_turno(giorno)
+        if self.stato_generazione is not None:
+            self.stato_generazione = solutore.stato_da_calendario(self.anteprima_calendario, self.dipendenti,
+                                                                  self.stato_iniziale)
+        self.celle_fissate = set()
+        self.versione_corrente = nome
+        self.mostra_anteprima_tabella()
+
+    def chiedi_salva_pdf(self):
+        if messagebox.askyesno("Salva PDF", "Vuoi salvare il PDF dei turni?"):
+            self.salva_pdf(self.anteprima_calendario)
+        else:
+            messagebox.showinfo("Info", "Modifica la tabella e salva quando sei pronto.")
+
+def avvia():
+    root = tk.Tk()
+    app = TurniApp(root)
+    root.mainloop()
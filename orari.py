@@ -1,17 +1,21 @@
-# Programma per la generazione automatica dei turni in una struttura ricettiva 24/7 con interfaccia grafica e gestione ferie/recuperi
+# Programma per la generazione automatica dei turni in una struttura ricettiva 24/7 con interfaccia grafica e gestione ferie/recuperi.
+# Questo modulo contiene il nucleo di generazione e non importa tkinter, fpdf o pandas: l'interfaccia
+# grafica è in interfaccia.py, l'esportazione in esportazione.py e la riga di comando in cli.py.
 
 import random
 import datetime
-import pandas as pd
-from fpdf import FPDF
-import tkinter as tk
-from tkinter import messagebox, simpledialog, filedialog
+from collections.abc import Mapping, MutableMapping
+from enum import IntEnum
+from types import MappingProxyType
+import numpy as np
 import calendar
-import pickle
-import os
+import json
+import time
 
-# Costanti dei turni
-TURNI = {
+# Costanti dei turni. La definizione è fissa per tutta l'esecuzione: i codici delle matrici e
+# dell'archivio e le tabelle ricavate qui sotto e in statistiche/equita dipendono dall'ordine e
+# dagli orari dei turni, quindi TURNI e le tabelle sono in sola lettura.
+TURNI = MappingProxyType({
     'M2': ("07:00", "12:40"),
     'P2': ("12:30", "18:10"),
     'S': ("18:00", "23:00"),
@@ -22,24 +26,135 @@ TURNI = {
     'C_sabato': ("11:30", "18:30"),
     'bar': ("15:30", "22:00"),
     'bar_matin': ("16:00", "21:00")
-}
-
-# Classe Dipendente con supporto per ferie e recuperi
+})
+
+# Giorni lavorati di fila oltre i quali è obbligatorio un riposo
+MAX_GIORNI_CONSECUTIVI = 6
+# Riposo minimo tra la fine di un turno e l'inizio del turno del giorno dopo
+RIPOSO_MINIMO_ORE = 11
+MINUTI_GIORNO = 24 * 60
+
+def _minuti(orario):
+    ore, minuti = orario.split(":")
+    return int(ore) * 60 + int(minuti)
+
+def orari_in_minuti(turni=None):
+    # Inizio e fine di ogni turno in minuti dalla mezzanotte del giorno del turno; per i turni
+    # a cavallo della mezzanotte (es. N) la fine è riportata al giorno dopo (> 24 * 60)
+    risultato = {}
+    for sigla, (inizio, fine) in (turni or TURNI).items():
+        m_inizio, m_fine = _minuti(inizio), _minuti(fine)
+        if m_fine <= m_inizio:
+            m_fine += MINUTI_GIORNO
+        risultato[sigla] = (m_inizio, m_fine)
+    return risultato
+
+# Orari dei turni già convertiti, da usare nei cicli al posto di strptime
+ORARI_MINUTI = MappingProxyType(orari_in_minuti())
+DURATE_ORE = MappingProxyType({sigla: (fine - inizio) / 60 for sigla, (inizio, fine) in ORARI_MINUTI.items()})
+
+# Codici numerici dei turni usati nella matrice dei turni (0 = nessun turno)
+CodiceTurno = IntEnum('CodiceTurno', [('RIPOSO', 0)] + [(sigla, i) for i, sigla in enumerate(TURNI, 1)])
+SIGLE = ('',) + tuple(TURNI)
+CODICI = MappingProxyType({sigla: i for i, sigla in enumerate(SIGLE)})
+
+# Compatibilità tra il turno di un giorno e quello del giorno dopo, ricavata una volta dagli orari.
+# riposo[a, b] sono i minuti tra la fine del turno a e l'inizio del turno b il giorno successivo
+# (negativi se i turni si sovrappongono; per N la fine è già riportata al giorno dopo); con il
+# riposo (codice 0) da una delle due parti non c'è vincolo. I generatori usano vietati_dopo
+# (per sigla) o incompatibili (per codice), così ogni verifica è un accesso O(1) senza
+# riconvertire gli orari "HH:MM".
+class CompatibilitaTurni:
+    def __init__(self, turni, riposo_minimo_ore=RIPOSO_MINIMO_ORE):
+        self.sigle = [''] + list(turni)
+        self.riposo_minimo_ore = riposo_minimo_ore
+        orari = orari_in_minuti(turni)
+        n = len(self.sigle)
+        self.riposo = np.full((n, n), np.iinfo(np.int32).max, dtype=np.int32)
+        for a, prima in enumerate(self.sigle[1:], 1):
+            for b, dopo in enumerate(self.sigle[1:], 1):
+                self.riposo[a, b] = MINUTI_GIORNO + orari[dopo][0] - orari[prima][1]
+        self.sovrapposti = self.riposo < 0
+        self.compatibili = self.riposo >= riposo_minimo_ore * 60
+        self.incompatibili = (~self.compatibili).tolist()
+        # Turni vietati il giorno dopo ciascun turno; None (riposo) non vieta nulla
+        self.vietati_dopo = {(prima or None): frozenset(dopo for b, dopo in enumerate(self.sigle)
+                                                         if dopo and not self.compatibili[a, b])
+                             for a, prima in enumerate(self.sigle)}
+
+    def compatibile(self, prima, dopo):
+        return dopo not in self.vietati_dopo[prima or None]
+
+# Cache per definizione dei turni: la chiave è il contenuto dei turni, così una definizione
+# diversa passata esplicitamente ha la sua matrice
+_cache_compatibilita = {}
+
+def compatibilita_turni(turni=None, riposo_minimo_ore=RIPOSO_MINIMO_ORE):
+    turni = TURNI if turni is None else turni
+    chiave = (tuple((sigla, tuple(orario)) for sigla, orario in turni.items()), riposo_minimo_ore)
+    compatibilita = _cache_compatibilita.get(chiave)
+    if compatibilita is None:
+        compatibilita = _cache_compatibilita[chiave] = CompatibilitaTurni(turni, riposo_minimo_ore)
+    return compatibilita
+
+# Classe Dipendente con supporto per ferie e recuperi.
+# I turni sono tenuti in un dizionario giorno -> turno: aggiunta, modifica e ricerca di un giorno
+# costano O(1); l'attributo turni resta una lista di tuple (giorno, turno) come in origine.
 class Dipendente:
+    __slots__ = ('nome', '_turni', 'ferie', 'riposi_aggiuntivi', 'recuperi', 'turni_possibili', 'priorita_turni')
+
     def __init__(self, nome):
         self.nome = nome
-        self.turni = []
+        self._turni = {}
         self.ferie = []
         self.riposi_aggiuntivi = []
         self.recuperi = []
         self.turni_possibili = list(TURNI.keys())  # Tutti i turni disponibili di default
         self.priorita_turni = {k: 1 for k in TURNI.keys()}  # Priorità default 1 per ogni turno
 
+    @property
+    def turni(self):
+        return list(self._turni.items())
+
+    @turni.setter
+    def turni(self, turni):
+        self._turni = dict(turni)
+
+    # Il pickle usa un dizionario con gli stessi campi della vecchia classe, così i file salvati
+    # prima dell'introduzione di __slots__ restano leggibili (e viceversa)
+    def __getstate__(self):
+        return {
+            'nome': self.nome,
+            'turni': self.turni,
+            'ferie': self.ferie,
+            'riposi_aggiuntivi': self.riposi_aggiuntivi,
+            'recuperi': self.recuperi,
+            'turni_possibili': self.turni_possibili,
+            'priorita_turni': self.priorita_turni,
+        }
+
+    def __setstate__(self, stato):
+        if isinstance(stato, tuple):
+            stato = {**(stato[0] or {}), **(stato[1] or {})}
+        self.__init__(stato['nome'])
+        for campo, valore in stato.items():
+            if campo == 'turni':
+                self.turni = valore
+            elif campo in self.__slots__:
+                setattr(self, campo, valore)
+
     def aggiungi_turno(self, giorno, tipo_turno):
-        self.turni.append((giorno, tipo_turno))
+        self._turni[giorno] = tipo_turno
 
     def modifica_turno(self, giorno, nuovo_turno):
-        self.turni = [(g, t) if g != giorno else (g, nuovo_turno) for g, t in self.turni]
+        if giorno in self._turni:
+            self._turni[giorno] = nuovo_turno
+
+    def rimuovi_turno(self, giorno):
+        self._turni.pop(giorno, None)
+
+    def turno(self, giorno):
+        return self._turni.get(giorno)
 
     def assegna_ferie(self, inizio, fine):
         self.ferie.append((inizio, fine))
@@ -51,450 +166,543 @@ class Dipendente:
         self.recuperi.append(giorno)
 
     def giorni_lavorati_consecutivi(self, giorno):
-        date_lavorate = sorted([t[0] for t in self.turni])
         count = 0
-        for i in range(len(date_lavorate) - 1, -1, -1):
-            if date_lavorate[i] < giorno:
-                if (giorno - date_lavorate[i]).days == count + 1:
-                    count += 1
-                else:
-                    break
+        while giorno - datetime.timedelta(days=count + 1) in self._turni:
+            count += 1
         return count
 
     def ore_totali(self):
-        ore = 0
-        for _, turno in self.turni:
-            inizio, fine = TURNI[turno]
-            fmt = "%H:%M"
-            tdelta = datetime.datetime.strptime(fine, fmt) - datetime.datetime.strptime(inizio, fmt)
-            ore += tdelta.seconds / 3600
-        return ore
+        return sum(DURATE_ORE[turno] for turno in self._turni.values())
 
     def azzera_turni(self):
-        self.turni = []
+        self._turni = {}
+
+# Matrice canonica dei turni di un periodo: array int8 giorni x dipendenti con i codici di
+# CodiceTurno. Il calendario {giorno: {nome: turno}} e i turni del singolo dipendente sono
+# viste calcolate sulla matrice, senza copie; leggere o scrivere una cella costa O(1).
+class MatriceTurni:
+    def __init__(self, inizio, fine, nomi, celle=None):
+        self.inizio = inizio
+        self.fine = fine
+        self.nomi = list(nomi)
+        self.posizioni = {nome: i for i, nome in enumerate(self.nomi)}
+        num_giorni = (fine - inizio).days + 1
+        if celle is None:
+            celle = np.zeros((num_giorni, len(self.nomi)), dtype=np.int8)
+        self.celle = celle
+        # Turni da coprire per giorno, se noti (impostati dai generatori)
+        self.fabbisogno = None
+
+    @classmethod
+    def da_calendario(cls, calendario, dipendenti, inizio=None, fine=None):
+        matrice = getattr(calendario, 'matrice', None)
+        if matrice is not None and inizio is None and fine is None:
+            return matrice
+        giorni = sorted(calendario)
+        inizio = inizio or giorni[0]
+        fine = fine or giorni[-1]
+        nomi = [d.nome for d in dipendenti]
+        noti = set(nomi)
+        for turni_giorno in calendario.values():
+            for nome in turni_giorno:
+                if nome not in noti:
+                    nomi.append(nome)
+                    noti.add(nome)
+        matrice = cls(inizio, fine, nomi)
+        for giorno, turni_giorno in calendario.items():
+            g = (giorno - inizio).days
+            if 0 <= g < len(matrice.celle):
+                for nome, turno in turni_giorno.items():
+                    matrice.celle[g, matrice.posizioni[nome]] = CODICI[turno]
+        return matrice
+
+    @property
+    def num_giorni(self):
+        return self.celle.shape[0]
+
+    def giorni(self):
+        return [self.inizio + datetime.timedelta(days=g) for g in range(self.num_giorni)]
+
+    def indice_giorno(self, giorno):
+        g = (giorno - self.inizio).days
+        if not 0 <= g < self.num_giorni:
+            raise KeyError(giorno)
+        return g
+
+    def turno(self, giorno, nome):
+        return SIGLE[self.celle[self.indice_giorno(giorno), self.posizioni[nome]]]
+
+    def imposta(self, giorno, nome, turno):
+        if nome not in self.posizioni:
+            self.aggiungi_dipendente(nome)
+        self.celle[self.indice_giorno(giorno), self.posizioni[nome]] = CODICI[turno or '']
+
+    def aggiungi_dipendente(self, nome):
+        self.posizioni[nome] = len(self.nomi)
+        self.nomi.append(nome)
+        self.celle = np.hstack([self.celle, np.zeros((self.num_giorni, 1), dtype=np.int8)])
+
+    def turni_di(self, nome):
+        colonna = self.celle[:, self.posizioni[nome]]
+        return [(self.inizio + datetime.timedelta(days=int(g)), SIGLE[colonna[g]]) for g in np.flatnonzero(colonna)]
+
+    def calendario(self):
+        return VistaCalendario(self)
+
+    def copia(self):
+        copia = MatriceTurni(self.inizio, self.fine, self.nomi, self.celle.copy())
+        copia.fabbisogno = self.fabbisogno
+        return copia
+
+    def applica_a(self, dipendenti):
+        # Riporta i turni della matrice nello storico dei dipendenti (Dipendente.turni)
+        for dip in dipendenti:
+            if dip.nome in self.posizioni:
+                for giorno, turno in self.turni_di(dip.nome):
+                    dip.aggiungi_turno(giorno, turno)
+
+# Vista {giorno: {nome: turno}} sulla matrice: si usa come il vecchio dizionario calendario,
+# comprese assegnazione e cancellazione dei turni di un giorno
+class VistaCalendario(Mapping):
+    def __init__(self, matrice):
+        self.matrice = matrice
+
+    def __getitem__(self, giorno):
+        return VistaGiorno(self.matrice, self.matrice.indice_giorno(giorno))
+
+    def __iter__(self):
+        return iter(self.matrice.giorni())
+
+    def __len__(self):
+        return self.matrice.num_giorni
+
+    def __contains__(self, giorno):
+        return isinstance(giorno, datetime.date) and 0 <= (giorno - self.matrice.inizio).days < self.matrice.num_giorni
+
+class VistaGiorno(MutableMapping):
+    __slots__ = ('matrice', 'g')
+
+    def __init__(self, matrice, g):
+        self.matrice = matrice
+        self.g = g
+
+    def __getitem__(self, nome):
+        pos = self.matrice.posizioni[nome]
+        codice = self.matrice.celle[self.g, pos]
+        if not codice:
+            raise KeyError(nome)
+        return SIGLE[codice]
+
+    def __setitem__(self, nome, turno):
+        if nome not in self.matrice.posizioni:
+            self.matrice.aggiungi_dipendente(nome)
+        self.matrice.celle[self.g, self.matrice.posizioni[nome]] = CODICI[turno]
+
+    def __delitem__(self, nome):
+        pos = self.matrice.posizioni[nome]
+        if not self.matrice.celle[self.g, pos]:
+            raise KeyError(nome)
+        self.matrice.celle[self.g, pos] = 0
+
+    def __iter__(self):
+        nomi = self.matrice.nomi
+        return (nomi[e] for e in np.flatnonzero(self.matrice.celle[self.g]))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.matrice.celle[self.g]))
+
+    def __contains__(self, nome):
+        pos = self.matrice.posizioni.get(nome)
+        return pos is not None and bool(self.matrice.celle[self.g, pos])
+
+    def __repr__(self):
+        return repr(dict(self))
+
+# Indice precalcolato delle assenze (ferie, recuperi, riposi aggiuntivi) su un intervallo di date.
+# Per ogni giorno tiene una bitmask dei dipendenti non disponibili: la verifica per un singolo
+# candidato è un accesso a lista più uno shift, indipendente dal numero di assenze registrate.
+class IndiceDisponibilita:
+    def __init__(self, inizio, fine, dipendenti):
+        self.inizio = inizio
+        self.fine = fine
+        self.num_giorni = (fine - inizio).days + 1 if fine >= inizio else 0
+        self.posizioni = {d.nome: pos for pos, d in enumerate(dipendenti)}
+        self.ferie = [0] * self.num_giorni
+        self.recuperi = [0] * self.num_giorni
+        self.riposi = [0] * self.num_giorni
+        for pos, dip in enumerate(dipendenti):
+            bit = 1 << pos
+            for start, end in dip.ferie:
+                self._segna_intervallo(self.ferie, start, end, bit)
+            for giorno in dip.recuperi:
+                self._segna_intervallo(self.recuperi, giorno, giorno, bit)
+            for giorno in dip.riposi_aggiuntivi:
+                self._segna_intervallo(self.riposi, giorno, giorno, bit)
+
+    def _segna_intervallo(self, maschere, start, end, bit):
+        primo = max((start - self.inizio).days, 0)
+        ultimo = min((end - self.inizio).days, self.num_giorni - 1)
+        for i in range(primo, ultimo + 1):
+            maschere[i] |= bit
+
+    def _indice(self, giorno):
+        i = (giorno - self.inizio).days
+        return i if 0 <= i < self.num_giorni else None
+
+    def assenti(self, giorno):
+        # Bitmask (per posizione) dei dipendenti assenti nel giorno indicato
+        i = self._indice(giorno)
+        if i is None:
+            return 0
+        return self.ferie[i] | self.recuperi[i] | self.riposi[i]
+
+    def in_ferie(self, giorno, nome):
+        i = self._indice(giorno)
+        return i is not None and bool(self.ferie[i] >> self.posizioni[nome] & 1)
+
+    def in_recupero(self, giorno, nome):
+        i = self._indice(giorno)
+        return i is not None and bool(self.recuperi[i] >> self.posizioni[nome] & 1)
+
+    def disponibile(self, giorno, nome):
+        return not self.assenti(giorno) >> self.posizioni[nome] & 1
+
+    def motivo_assenza(self, giorno, nome):
+        # 'ferie', 'recupero', 'riposo_aggiuntivo' oppure None se il dipendente è disponibile
+        i = self._indice(giorno)
+        if i is None:
+            return None
+        bit = 1 << self.posizioni[nome]
+        if self.ferie[i] & bit:
+            return 'ferie'
+        if self.recuperi[i] & bit:
+            return 'recupero'
+        if self.riposi[i] & bit:
+            return 'riposo_aggiuntivo'
+        return None
+
+# Stato delle regole di riposo trasportato da un periodo al successivo.
+# Permette di generare un periodo lungo in più riprese (o di riprendere da uno snapshot salvato)
+# senza che ultimo riposo, riposo del giorno prima e giorni consecutivi si azzerino al cambio mese.
+class StatoGenerazione:
+    def __init__(self):
+        self.ultimo_giorno = None
+        self.ultimi_riposi = {}
+        self.riposo_ieri = {}
+        self.giorni_consecutivi = {}
+        # Turno del giorno prima (None se a riposo), per il riposo minimo tra due turni
+        self.turno_ieri = {}
+        # Ordine di scorrimento dei dipendenti al termine del periodo, così che una generazione
+        # ripresa dallo stato dia lo stesso risultato di una passata unica con lo stesso seme
+        self.ordine = []
+
+    def copia(self):
+        return StatoGenerazione.da_dict(self.a_dict())
+
+    def a_dict(self):
+        return {
+            'ultimo_giorno': self.ultimo_giorno.isoformat() if self.ultimo_giorno else None,
+            'ultimi_riposi': {n: g.isoformat() if g else None for n, g in self.ultimi_riposi.items()},
+            'riposo_ieri': dict(self.riposo_ieri),
+            'giorni_consecutivi': dict(self.giorni_consecutivi),
+            'turno_ieri': dict(self.turno_ieri),
+            'ordine': list(self.ordine),
+        }
+
+    @classmethod
+    def da_dict(cls, dati):
+        stato = cls()
+        if dati.get('ultimo_giorno'):
+            stato.ultimo_giorno = datetime.date.fromisoformat(dati['ultimo_giorno'])
+        stato.ultimi_riposi = {n: datetime.date.fromisoformat(g) if g else None
+                               for n, g in dati.get('ultimi_riposi', {}).items()}
+        stato.riposo_ieri = dict(dati.get('riposo_ieri', {}))
+        stato.giorni_consecutivi = dict(dati.get('giorni_consecutivi', {}))
+        stato.turno_ieri = dict(dati.get('turno_ieri', {}))
+        stato.ordine = list(dati.get('ordine', []))
+        return stato
+
+    def salva(self, percorso):
+        with open(percorso, "w", encoding="utf-8") as f:
+            json.dump(self.a_dict(), f, indent=2)
+
+    @classmethod
+    def carica(cls, percorso):
+        with open(percorso, encoding="utf-8") as f:
+            return cls.da_dict(json.load(f))
+
+# Resoconto facoltativo di una generazione: tempi per fase, candidati scartati per motivo,
+# turni assegnati in ripiego o forzati. Si passa come report= ai generatori; senza report i
+# generatori non fanno alcuna misura. al_giorno(giorno, report), se indicata, viene chiamata
+# alla fine di ogni giorno generato (ad esempio per mostrare l'avanzamento).
+class ReportGenerazione:
+    FASI = ('candidati', 'assegnazione', 'ripiego', 'forzatura')
+    MOTIVI = ('finestra_riposo', 'riposo_consecutivo', 'ferie', 'recupero', 'riposo_aggiuntivo', 'non_ammesso',
+              'riposo_minimo')
+
+    def __init__(self, al_giorno=None):
+        self.al_giorno = al_giorno
+        self.giorni = 0
+        self.tempi = dict.fromkeys(self.FASI, 0.0)
+        self.scartati = dict.fromkeys(self.MOTIVI, 0)
+        self.scansionati = 0
+        self.turni_richiesti = 0
+        self.assegnati = 0
+        self.ripieghi = 0
+        self.scoperti = 0
+        self.forzati = 0
+        # Ricerca locale (motore a ricottura), se usata
+        self.iterazioni = 0
+        self.mosse_accettate = 0
+        self.costo_iniziale = None
+        self.costo_finale = None
+
+    def a_dict(self):
+        return {
+            'giorni': self.giorni,
+            'tempi': dict(self.tempi),
+            'scansionati': self.scansionati,
+            'scartati': dict(self.scartati),
+            'turni_richiesti': self.turni_richiesti,
+            'assegnati': self.assegnati,
+            'ripieghi': self.ripieghi,
+            'scoperti': self.scoperti,
+            'forzati': self.forzati,
+            'iterazioni': self.iterazioni,
+            'mosse_accettate': self.mosse_accettate,
+            'costo_iniziale': self.costo_iniziale,
+            'costo_finale': self.costo_finale,
+        }
+
+    def riepilogo(self):
+        righe = [f"Giorni generati: {self.giorni}",
+                 "Tempi: " + ", ".join(f"{fase} {secondi * 1000:.1f} ms" for fase, secondi in self.tempi.items()),
+                 f"Turni richiesti {self.turni_richiesti}, assegnati {self.assegnati}, in ripiego {self.ripieghi}, "
+                 f"scoperti {self.scoperti}, forzati {self.forzati}",
+                 f"Candidati esaminati {self.scansionati}, scartati: "
+                 + ", ".join(f"{motivo} {n}" for motivo, n in self.scartati.items())]
+        if self.iterazioni:
+            righe.append(f"Ricottura: {self.iterazioni} iterazioni, {self.mosse_accettate} mosse accettate, "
+                         f"costo {self.costo_iniziale:.1f} -> {self.costo_finale:.1f}")
+        return "\n".join(righe)
 
 # Funzioni principali
 
 def genera_turni(mese, anno, dipendenti):
     num_giorni = calendar.monthrange(anno, mese)[1]
-    giorni_mese = [datetime.date(anno, mese, giorno) for giorno in range(1, num_giorni + 1)]
-    calendario = {}
+    calendario, _ = genera_turni_periodo(datetime.date(anno, mese, 1), datetime.date(anno, mese, num_giorni), dipendenti)
+    return calendario
 
+def scegli_turni_giornalieri(rng=None):
+    rng = rng or random
+    # Usa più spesso la forma con più personale
+    if rng.random() < 0.8:
+        return ['M2', 'P2', 'S', 'P']
+    return ['M', 'P', 'P']
+
+def calcola_fabbisogno(inizio, fine, rng=None):
+    # Fissa in anticipo i turni da coprire per ogni giorno del periodo
+    num_giorni = (fine - inizio).days + 1
+    return {inizio + datetime.timedelta(days=i): scegli_turni_giornalieri(rng) for i in range(num_giorni)}
+
+def genera_turni_periodo(inizio, fine, dipendenti, stato=None, rng=None, fabbisogno=None, aggiorna_dipendenti=True,
+                         report=None, progresso=None, annulla=None, equita=None, idonei=None):
+    # Genera i turni su un intervallo arbitrario di date (estremi inclusi) in un'unica passata.
+    # Se viene passato uno stato, il periodo deve iniziare il giorno successivo all'ultimo generato;
+    # lo stato passato non viene modificato e viene restituito quello aggiornato alla fine del periodo.
+    # rng è un'istanza di random.Random (default: lo stato globale del modulo random); fabbisogno,
+    # se indicato, fissa i turni da coprire per ogni giorno invece di sceglierli a caso.
+    # Con aggiorna_dipendenti=False i turni non vengono aggiunti a Dipendente.turni.
+    # report (ReportGenerazione) raccoglie tempi e contatori; senza report non si misura nulla.
+    # progresso(frazione) viene chiamata alla fine di ogni giorno; annulla (es. threading.Event)
+    # interrompe la generazione all'inizio del giorno successivo: si restituiscono i giorni già
+    # generati e lo stato si ferma all'ultimo di essi, così il periodo si può riprendere.
+    # equita (equita.ContatoriEquita) ordina i candidati di ogni turno per carico accumulato
+    # (notti, weekend, festivi, ore) e viene aggiornato giorno per giorno; senza, l'ordine è casuale.
+    # idonei, parallelo al fabbisogno ({giorno: [insieme di nomi o None per ogni turno]}), limita
+    # ogni posto a chi può coprirlo (es. il personale della sede che lo richiede); None = chiunque.
+    rng = rng or random
+    traccia = report is not None
+    if traccia:
+        scartati = report.scartati
+    if fine < inizio:
+        raise ValueError("La data di fine precede la data di inizio.")
+    stato = stato.copia() if stato else StatoGenerazione()
+    if stato.ultimo_giorno and inizio != stato.ultimo_giorno + datetime.timedelta(days=1):
+        raise ValueError(f"Lo stato si ferma al {stato.ultimo_giorno}: il periodo deve iniziare il giorno successivo.")
+
+    num_giorni = (fine - inizio).days + 1
+    giorni_periodo = [inizio + datetime.timedelta(days=i) for i in range(num_giorni)]
+    matrice = MatriceTurni(inizio, fine, [d.nome for d in dipendenti])
+    matrice.fabbisogno = {}
+    celle = matrice.celle
+    indice = IndiceDisponibilita(inizio, fine, dipendenti)
+    posizioni = indice.posizioni
+    ammessi = {d.nome: frozenset(d.turni_possibili) for d in dipendenti}
+
+    # Ordine di scorrimento mescolato ogni giorno (la lista del chiamante non viene toccata)
+    posizione_precedente = {nome: i for i, nome in enumerate(stato.ordine)}
+    ordine = sorted(dipendenti, key=lambda d: posizione_precedente.get(d.nome, len(posizione_precedente)))
     # Per ogni dipendente, tiene traccia dell'ultimo giorno di riposo
-    ultimi_riposi = {d.nome: None for d in dipendenti}
+    ultimi_riposi = stato.ultimi_riposi
     # Tiene traccia se il dipendente era a riposo il giorno prima
-    riposo_ieri = {d.nome: False for d in dipendenti}
-
-    for giorno in giorni_mese:
-        calendario[giorno] = {}
-        random.shuffle(dipendenti)
-        assegnati = []
-
-        # Usa più spesso la forma con più personale
-        if random.random() < 0.8:
-            turni_giornalieri = ['M2', 'P2', 'S', 'P']
+    riposo_ieri = stato.riposo_ieri
+    consecutivi = stato.giorni_consecutivi
+    # Turno del giorno prima e turni che non possono seguirlo (riposo minimo tra due turni)
+    turno_ieri = stato.turno_ieri
+    vietati_dopo = compatibilita_turni().vietati_dopo
+    for d in dipendenti:
+        ultimi_riposi.setdefault(d.nome, None)
+        riposo_ieri.setdefault(d.nome, False)
+        consecutivi.setdefault(d.nome, 0)
+        turno_ieri.setdefault(d.nome, None)
+
+    for g, giorno in enumerate(giorni_periodo):
+        if annulla is not None and annulla.is_set():
+            break
+        turni_giorno = {}
+        rng.shuffle(ordine)
+        assegnati = set()
+        if fabbisogno is None:
+            turni_giornalieri = scegli_turni_giornalieri(rng)
         else:
-            turni_giornalieri = ['M', 'P', 'P']
-
-        for tipo_turno in turni_giornalieri:
-            for dip in dipendenti:
-                # Calcola giorni dall'ultimo riposo
-                ultimo_riposo = ultimi_riposi[dip.nome]
-                giorni_dal_riposo = (giorno - ultimo_riposo).days if ultimo_riposo else 7
-                # Un solo riposo ogni 6/7 giorni
-                if giorni_dal_riposo < 6:
+            turni_giornalieri = fabbisogno[giorno]
+        matrice.fabbisogno[giorno] = list(turni_giornalieri)
+
+        if traccia:
+            t0 = time.perf_counter()
+        # Candidati del giorno: le regole di riposo e le assenze non dipendono dal turno,
+        # quindi vengono valutate una sola volta per dipendente. Ogni scartato conta per un solo
+        # motivo, il primo controllo che fallisce.
+        assenti = indice.assenti(giorno)
+        candidati = []
+        for dip in ordine:
+            # Non permettere due riposi consecutivi (chi ha riposato ieri è anche nella finestra
+            # di riposo, quindi questo controllo va fatto per primo)
+            if riposo_ieri[dip.nome]:
+                if traccia:
+                    scartati['riposo_consecutivo'] += 1
+                continue
+            ultimo_riposo = ultimi_riposi[dip.nome]
+            giorni_dal_riposo = (giorno - ultimo_riposo).days if ultimo_riposo else 7
+            # Un solo riposo ogni 6/7 giorni
+            if giorni_dal_riposo < 6:
+                if traccia:
+                    scartati['finestra_riposo'] += 1
+                continue
+            if assenti >> posizioni[dip.nome] & 1:
+                if traccia:
+                    scartati[indice.motivo_assenza(giorno, dip.nome)] += 1
+                continue
+            candidati.append(dip)
+        if traccia:
+            t1 = time.perf_counter()
+            non_ammessi = 0
+            riposi_brevi = 0
+
+        # Con i contatori di equità i turni notturni si assegnano per primi, così vanno a chi ne ha
+        # fatti meno prima che il turno di giorno lo occupi
+        gruppi = idonei[giorno] if idonei is not None else [None] * len(turni_giornalieri)
+        posti = equita.ordine_posti(turni_giornalieri) if equita is not None else range(len(turni_giornalieri))
+        # Gruppi dei posti rimasti scoperti, da riempire nel ripiego
+        mancanti = []
+        for posto in posti:
+            tipo_turno, gruppo = turni_giornalieri[posto], gruppi[posto]
+            if equita is not None:
+                candidati_turno = equita.ordina(candidati, tipo_turno, giorno)
+            else:
+                candidati_turno = candidati
+            for dip in candidati_turno:
+                if dip.nome in assegnati or (gruppo is not None and dip.nome not in gruppo):
                     continue
-                # Non permettere due riposi consecutivi
-                if riposo_ieri[dip.nome]:
+                if tipo_turno not in ammessi[dip.nome]:
+                    if traccia:
+                        non_ammessi += 1
                     continue
-                if giorno in dip.recuperi or any(start <= giorno <= end for (start, end) in dip.ferie):
+                if tipo_turno in vietati_dopo[turno_ieri[dip.nome]]:
+                    if traccia:
+                        riposi_brevi += 1
                     continue
-                if dip not in assegnati and tipo_turno in dip.turni_possibili:
-                    calendario[giorno][dip.nome] = tipo_turno
-                    dip.aggiungi_turno(giorno, tipo_turno)
-                    assegnati.append(dip)
-                    break
-        # Se la giornata non è coperta, aggiungi qualcuno in M o P
-        if len(calendario[giorno]) < len(turni_giornalieri):
+                turni_giorno[dip.nome] = tipo_turno
+                assegnati.add(dip.nome)
+                break
+            else:
+                mancanti.append(gruppo)
+        if traccia:
+            t2 = time.perf_counter()
+            # Esaminati: tutto l'organico nei controlli di riposo e assenza, poi i candidati dei turni,
+            # ognuno assegnato oppure scartato (turno non ammesso o riposo breve)
+            scartati['non_ammesso'] += non_ammessi
+            scartati['riposo_minimo'] += riposi_brevi
+            report.scansionati += len(ordine) + non_ammessi + riposi_brevi + len(turni_giorno)
+            report.turni_richiesti += len(turni_giornalieri)
+            report.assegnati += len(turni_giorno)
+            prima_del_ripiego = len(turni_giorno)
+        # Se la giornata non è coperta, aggiungi qualcuno in M o P: uno per posto scoperto, tra chi
+        # poteva coprirlo
+        if mancanti:
             for tipo_turno in ['M', 'P']:
-                for dip in dipendenti:
-                    if dip not in assegnati and tipo_turno in dip.turni_possibili and not riposo_ieri[dip.nome]:
-                        calendario[giorno][dip.nome] = tipo_turno
-                        dip.aggiungi_turno(giorno, tipo_turno)
-                        assegnati.append(dip)
-                        if len(calendario[giorno]) >= len(turni_giornalieri):
+                for dip in (equita.ordina(ordine, tipo_turno, giorno) if equita is not None else ordine):
+                    if (dip.nome not in assegnati and tipo_turno in ammessi[dip.nome] and not riposo_ieri[dip.nome]
+                            and tipo_turno not in vietati_dopo[turno_ieri[dip.nome]]):
+                        posto = next((k for k, gruppo in enumerate(mancanti)
+                                      if gruppo is None or dip.nome in gruppo), None)
+                        if posto is None:
+                            continue
+                        turni_giorno[dip.nome] = tipo_turno
+                        assegnati.add(dip.nome)
+                        del mancanti[posto]
+                        if not mancanti:
                             break
-                if len(calendario[giorno]) >= len(turni_giornalieri):
+                if not mancanti:
                     break
+        if traccia:
+            t3 = time.perf_counter()
+            report.ripieghi += len(turni_giorno) - prima_del_ripiego
+            report.scoperti += len(mancanti)
+            prima_della_forzatura = len(turni_giorno)
         # Aggiorna ultimo riposo e flag riposo_ieri
-        for dip in dipendenti:
-            if dip.nome not in calendario[giorno]:
+        for dip in ordine:
+            if dip.nome not in turni_giorno:
                 # Se era già a riposo ieri, forziamo che oggi lavori (non lasciamo due riposi consecutivi)
                 if riposo_ieri[dip.nome]:
                     # Forza un turno qualsiasi disponibile
-                    for tipo_turno in dip.turni_possibili:
-                        if dip.nome not in calendario[giorno]:
-                            calendario[giorno][dip.nome] = tipo_turno
-                            dip.aggiungi_turno(giorno, tipo_turno)
-                            break
+                    if dip.turni_possibili:
+                        tipo_turno = dip.turni_possibili[0]
+                        turni_giorno[dip.nome] = tipo_turno
                     riposo_ieri[dip.nome] = False
                 else:
                     ultimi_riposi[dip.nome] = giorno
                     riposo_ieri[dip.nome] = True
             else:
                 riposo_ieri[dip.nome] = False
-    return calendario
-
-# Funzione per esportare in PDF con colori
-class PDF(FPDF):
-    def header(self):
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "Turni Mensili", ln=True, align="C")
-
-    def create_table(self, calendario, dipendenti):
-        self.set_font("Arial", size=10)
-        self.add_page()
-        giorni = list(calendario.keys())
-        header = ["Giorno"] + [d.nome for d in dipendenti]
-        self.set_fill_color(200, 220, 255)
-        self.cell(25, 10, "Giorno", 1, 0, "C", True)
-        for nome in header[1:]:
-            self.cell(25, 10, nome, 1, 0, "C", True)
-        self.ln()
-
-        for giorno in giorni:
-            self.cell(25, 10, giorno.strftime("%d/%m"), 1)
-            for d in dipendenti:
-                turno = calendario[giorno].get(d.nome, "")
-                colore = None
-                if any(start <= giorno <= end for (start, end) in d.ferie):
-                    colore = (144, 238, 144)
-                    turno = "FERIE"
-                elif giorno in d.recuperi:
-                    colore = (255, 255, 153)
-                    turno = "RECUP"
-                if colore:
-                    self.set_fill_color(*colore)
-                    self.cell(25, 10, turno, 1, 0, "C", True)
-                    self.set_fill_color(255, 255, 255)
-                else:
-                    self.cell(25, 10, turno, 1)
-            self.ln()
-
-# Funzione per esportare in PDF con layout stile orarirec
-class PDFStileOrarirec(FPDF):
-    def header(self):
-        self.set_font("Arial", "B", 10)
-        self.cell(0, 8, "Turni Mensili - Stile Orarirec", ln=True, align="C")
-
-    def create_table(self, calendario, dipendenti):
-        self.set_font("Arial", size=8)
-        self.add_page(orientation="L")
-
-        giorni = list(calendario.keys())
-        giorni.sort()
-        nomi_dipendenti = [d.nome for d in dipendenti]
-
-        # Giorni della settimana (sopra ai numeri)
-        self.cell(30, 8, "", 1, 0, "C")
-        for giorno in giorni:
-            nome_giorno = calendar.day_abbr[giorno.weekday()][:3]
-            self.cell(10, 8, nome_giorno, 1, 0, "C")
-        self.ln()
-
-        # Numeri dei giorni
-        self.cell(30, 8, "", 1, 0, "C")
-        for giorno in giorni:
-            self.cell(10, 8, str(giorno.day), 1, 0, "C")
-        self.ln()
-
-        # Riga per ogni dipendente
-        for d in dipendenti:
-            self.cell(30, 8, d.nome, 1, 0, "L")
-            for giorno in giorni:
-                turno = calendario.get(giorno, {}).get(d.nome, "")
-                colore = None
-                if any(start <= giorno <= end for (start, end) in d.ferie):
-                    colore = (144, 238, 144)
-                    turno = "FER"
-                elif giorno in d.recuperi:
-                    colore = (255, 255, 153)
-                    turno = "REC"
-
-                if colore:
-                    self.set_fill_color(*colore)
-                    self.cell(10, 8, turno, 1, 0, "C", True)
-                    self.set_fill_color(255, 255, 255)
-                else:
-                    self.cell(10, 8, turno, 1, 0, "C")
-            self.ln()
-
-        # Riga finale: ore totali
-        self.cell(30, 8, "Ore Totali", 1, 0, "R")
-        for d in dipendenti:
-            self.cell(10, 8, f"{int(d.ore_totali())}", 1, 0, "C")
-        self.ln()
-
-# Interfaccia grafica
-class TurniApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Gestione Turni Struttura Ricettiva")
-        self.dipendenti = self.carica_dipendenti()
-        self.calendario = {}
-        self.anteprima_calendario = None
-
-        self.label = tk.Label(root, text="Gestione Dipendenti:")
-        self.label.pack()
-
-        self.lista_box = tk.Listbox(root, selectmode=tk.SINGLE, width=50)
-        self.lista_box.pack()
-        self.lista_box.bind('<<ListboxSelect>>', self.mostra_preferenze_turni)
-
-        self.entry = tk.Entry(root)
-        self.entry.pack()
-
-        self.aggiungi_button = tk.Button(root, text="Aggiungi Dipendente", command=self.aggiungi_dipendente)
-        self.aggiungi_button.pack()
-
-        self.rimuovi_button = tk.Button(root, text="Rimuovi Dipendente", command=self.rimuovi_dipendente)
-        self.rimuovi_button.pack()
-
-        self.preferenze_frame = tk.Frame(root)
-        self.preferenze_frame.pack()
-        self.preferenze_label = tk.Label(self.preferenze_frame, text="Preferenze turni (seleziona un dipendente)")
-        self.preferenze_label.pack()
-        self.turni_vars = {}
-        self.priorita_vars = {}
-
-        self.aggiorna_preferenze_turni()
-
-        self.ferie_button = tk.Button(root, text="Assegna Ferie", command=self.assegna_ferie)
-        self.ferie_button.pack()
-
-        self.recupero_button = tk.Button(root, text="Assegna Recupero", command=self.assegna_recupero)
-        self.recupero_button.pack()
-
-        self.modifica_tabella_button = tk.Button(root, text="Modifica Tabella Manualmente", command=self.modifica_tabella)
-        self.modifica_tabella_button.pack()
-
-        self.genera_button = tk.Button(root, text="Genera Turni (Anteprima)", command=self.genera_turni_anteprima)
-        self.genera_button.pack()
-
-    def salva_dipendenti(self):
-        with open("dipendenti.pkl", "wb") as f:
-            pickle.dump(self.dipendenti, f)
-
-    def carica_dipendenti(self):
-        if os.path.exists("dipendenti.pkl"):
-            with open("dipendenti.pkl", "rb") as f:
-                return pickle.load(f)
-        return []
-
-    def aggiorna_lista(self):
-        self.lista_box.delete(0, tk.END)
-        for dip in self.dipendenti:
-            self.lista_box.insert(tk.END, dip.nome)
-        self.salva_dipendenti()
-
-    def aggiungi_dipendente(self):
-        nome = self.entry.get().strip()
-        if nome and nome not in [d.nome for d in self.dipendenti]:
-            self.dipendenti.append(Dipendente(nome))
-            self.entry.delete(0, tk.END)
-            self.aggiorna_lista()
-        else:
-            messagebox.showerror("Errore", "Nome invalido o già presente.")
-
-    def rimuovi_dipendente(self):
-        selezione = self.lista_box.curselection()
-        if selezione:
-            index = selezione[0]
-            self.dipendenti.pop(index)
-            self.aggiorna_lista()
-        else:
-            messagebox.showerror("Errore", "Seleziona un dipendente da rimuovere.")
-
-    def assegna_ferie(self):
-        nome = simpledialog.askstring("Assegna Ferie", "Nome del dipendente:")
-        inizio_str = simpledialog.askstring("Inizio Ferie", "Data inizio (YYYY-MM-DD):")
-        fine_str = simpledialog.askstring("Fine Ferie", "Data fine (YYYY-MM-DD):")
-        try:
-            inizio = datetime.datetime.strptime(inizio_str, "%Y-%m-%d").date()
-            fine = datetime.datetime.strptime(fine_str, "%Y-%m-%d").date()
-            dip = next((d for d in self.dipendenti if d.nome == nome), None)
-            if dip:
-                dip.assegna_ferie(inizio, fine)
-                messagebox.showinfo("Successo", "Ferie assegnate.")
-            else:
-                messagebox.showerror("Errore", "Dipendente non trovato.")
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore nell'assegnazione: {e}")
-
-    def assegna_recupero(self):
-        nome = simpledialog.askstring("Assegna Recupero", "Nome del dipendente:")
-        giorno_str = simpledialog.askstring("Recupero", "Data del recupero (YYYY-MM-DD):")
-        try:
-            giorno = datetime.datetime.strptime(giorno_str, "%Y-%m-%d").date()
-            dip = next((d for d in self.dipendenti if d.nome == nome), None)
-            if dip:
-                dip.assegna_recupero(giorno)
-                messagebox.showinfo("Successo", "Recupero assegnato.")
-            else:
-                messagebox.showerror("Errore", "Dipendente non trovato.")
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore nell'assegnazione: {e}")
-
-    def modifica_turno(self):
-        nome = simpledialog.askstring("Modifica Turno", "Nome del dipendente:")
-        giorno_str = simpledialog.askstring("Modifica Turno", "Giorno (YYYY-MM-DD):")
-        nuovo_turno = simpledialog.askstring("Modifica Turno", f"Nuovo turno ({'/'.join(TURNI.keys())}):")
-        try:
-            giorno = datetime.datetime.strptime(giorno_str, "%Y-%m-%d").date()
-            dip = next((d for d in self.dipendenti if d.nome == nome), None)
-            if dip and nuovo_turno in TURNI:
-                dip.modifica_turno(giorno, nuovo_turno)
-                if giorno in self.calendario:
-                    self.calendario[giorno][nome] = nuovo_turno
-                messagebox.showinfo("Successo", "Turno modificato correttamente.")
-            else:
-                messagebox.showerror("Errore", "Dati non validi.")
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore nella modifica: {e}")
-
-    def genera_turni_gui(self):
-        try:
-            if not self.dipendenti:
-                messagebox.showerror("Errore", "Aggiungi almeno un dipendente.")
-                return
-            # Azzera i turni di tutti i dipendenti prima di generare
-            for dip in self.dipendenti:
-                dip.azzera_turni()
-            messagebox.showinfo("Info", "Generazione turni in corso...")
-            self.calendario = genera_turni(6, 2025, self.dipendenti)
-            pdf = PDFStileOrarirec()
-            pdf.create_table(self.calendario, self.dipendenti)
-            save_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
-            if save_path:
-                pdf.output(save_path)
-                messagebox.showinfo("Successo", f"Turni salvati in {save_path}")
-            else:
-                messagebox.showwarning("Attenzione", "Salvataggio annullato. Il file PDF non è stato creato.")
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore durante la generazione dei turni: {e}")
-
-    def mostra_preferenze_turni(self, event=None):
-        for widget in self.preferenze_frame.winfo_children():
-            if widget != self.preferenze_label:
-                widget.destroy()
-        selezione = self.lista_box.curselection()
-        if not selezione:
-            return
-        index = selezione[0]
-        dip = self.dipendenti[index]
-        self.turni_vars = {}
-        self.priorita_vars = {}
-        for turno in TURNI.keys():
-            var = tk.BooleanVar(value=turno in dip.turni_possibili)
-            prio = tk.IntVar(value=dip.priorita_turni.get(turno, 1))
-            self.turni_vars[turno] = var
-            self.priorita_vars[turno] = prio
-            frame = tk.Frame(self.preferenze_frame)
-            frame.pack(anchor='w')
-            tk.Checkbutton(frame, text=turno, variable=var).pack(side='left')
-            tk.Label(frame, text='Priorità:').pack(side='left')
-            tk.Spinbox(frame, from_=1, to=5, width=2, textvariable=prio).pack(side='left')
-        tk.Button(self.preferenze_frame, text="Salva Preferenze", command=self.salva_preferenze_turni).pack()
-
-    def salva_preferenze_turni(self):
-        selezione = self.lista_box.curselection()
-        if not selezione:
-            return
-        index = selezione[0]
-        dip = self.dipendenti[index]
-        dip.turni_possibili = [t for t, v in self.turni_vars.items() if v.get()]
-        dip.priorita_turni = {t: self.priorita_vars[t].get() for t in dip.turni_possibili}
-        self.salva_dipendenti()
-        messagebox.showinfo("Successo", "Preferenze turni salvate!")
-
-    def aggiorna_preferenze_turni(self):
-        self.mostra_preferenze_turni()
-
-    def modifica_tabella(self):
-        # Da implementare: apertura finestra con tabella modificabile
-        messagebox.showinfo("Info", "Funzionalità di modifica tabella manuale in sviluppo.")
-
-    def genera_turni_anteprima(self):
-        try:
-            if not self.dipendenti:
-                messagebox.showerror("Errore", "Aggiungi almeno un dipendente.")
-                return
-            for dip in self.dipendenti:
-                dip.azzera_turni()
-            self.anteprima_calendario = genera_turni(6, 2025, self.dipendenti)
-            self.mostra_anteprima_tabella()
-        except Exception as e:
-            messagebox.showerror("Errore", f"Errore durante la generazione dei turni: {e}")
-
-    def mostra_anteprima_tabella(self):
-        if not self.anteprima_calendario:
-            messagebox.showerror("Errore", "Nessuna anteprima disponibile.")
-            return
-        anteprima = tk.Toplevel(self.root)
-        anteprima.title("Anteprima e Modifica Tabella Turni")
-        giorni = sorted(self.anteprima_calendario.keys())
-        dipendenti = self.dipendenti
-        turni_possibili = {d.nome: d.turni_possibili for d in dipendenti}
-        celle_vars = {}
-
-        # Intestazione giorni
-        tk.Label(anteprima, text="Dipendente").grid(row=0, column=0, sticky="nsew")
-        for col, giorno in enumerate(giorni, 1):
-            tk.Label(anteprima, text=giorno.strftime("%d/%m")).grid(row=0, column=col, sticky="nsew")
-
-        # Celle modificabili
-        for r, d in enumerate(dipendenti, 1):
-            tk.Label(anteprima, text=d.nome).grid(row=r, column=0, sticky="nsew")
-            celle_vars[d.nome] = {}
-            for c, giorno in enumerate(giorni, 1):
-                turno_attuale = self.anteprima_calendario.get(giorno, {}).get(d.nome, "")
-                var = tk.StringVar(value=turno_attuale)
-                opzioni = [""] + turni_possibili[d.nome]
-                om = tk.OptionMenu(anteprima, var, *opzioni)
-                om.grid(row=r, column=c, sticky="nsew")
-                celle_vars[d.nome][giorno] = var
-
-        def salva_modifiche():
-            for d in dipendenti:
-                for giorno in giorni:
-                    val = celle_vars[d.nome][giorno].get()
-                    if val:
-                        self.anteprima_calendario[giorno][d.nome] = val
-                    elif d.nome in self.anteprima_calendario[giorno]:
-                        del self.anteprima_calendario[giorno][d.nome]
-            anteprima.destroy()
-            self.chiedi_salva_pdf()
-
-        def annulla():
-            anteprima.destroy()
-
-        tk.Button(anteprima, text="Salva e Genera PDF", command=salva_modifiche).grid(row=len(dipendenti)+1, column=0, columnspan=2)
-        tk.Button(anteprima, text="Annulla", command=annulla).grid(row=len(dipendenti)+1, column=2, columnspan=2)
-
-    def chiedi_salva_pdf(self):
-        if messagebox.askyesno("Salva PDF", "Vuoi salvare il PDF dei turni?"):
-            pdf = PDFStileOrarirec()
-            pdf.create_table(self.anteprima_calendario, self.dipendenti)
-            save_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
-            if save_path:
-                pdf.output(save_path)
-                messagebox.showinfo("Successo", f"Turni salvati in {save_path}")
-            else:
-                messagebox.showwarning("Attenzione", "Salvataggio annullato. Il file PDF non è stato creato.")
-        else:
-            messagebox.showinfo("Info", "Modifica la tabella e salva quando sei pronto.")
+            consecutivi[dip.nome] = consecutivi[dip.nome] + 1 if dip.nome in turni_giorno else 0
+            turno_ieri[dip.nome] = turni_giorno.get(dip.nome)
+        for nome, tipo_turno in turni_giorno.items():
+            celle[g, posizioni[nome]] = CODICI[tipo_turno]
+        if equita is not None:
+            equita.registra_giorno(giorno, matrice.nomi, turni_giorno)
+        if aggiorna_dipendenti:
+            for dip in dipendenti:
+                if dip.nome in turni_giorno:
+                    dip.aggiungi_turno(giorno, turni_giorno[dip.nome])
+        stato.ultimo_giorno = giorno
+        if traccia:
+            tempi = report.tempi
+            tempi['candidati'] += t1 - t0
+            tempi['assegnazione'] += t2 - t1
+            tempi['ripiego'] += t3 - t2
+            tempi['forzatura'] += time.perf_counter() - t3
+            report.forzati += len(turni_giorno) - prima_della_forzatura
+            report.giorni += 1
+            if report.al_giorno:
+                report.al_giorno(giorno, report)
+        if progresso:
+            progresso((g + 1) / num_giorni)
+    stato.ordine = [d.nome for d in ordine]
+    return matrice.calendario(), stato
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = TurniApp(root)
-    root.mainloop()
+    import sys
+    from cli import main
+    sys.exit(main())
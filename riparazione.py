@@ -0,0 +1,96 @@
+# Riparazione incrementale di un calendario già generato dopo una modifica puntuale (nuova
+# assenza, giorno di malattia, turno cambiato a mano). Invece di rigenerare tutto il periodo si
+# ririsolvono solo i giorni toccati più i giorni vicini su cui agiscono le regole di riposo;
+# le celle fissate non vengono mai toccate e si riportano le sole celle effettivamente cambiate.
+
+import random
+
+from orari import SIGLE, MAX_GIORNI_CONSECUTIVI, IndiceDisponibilita, MatriceTurni
+from solutore import ProblemaTurni, ricottura
+
+# Costo di ogni cella cambiata rispetto al calendario di partenza: più alto dei pesi degli
+# obiettivi (priorità, ore) e molto più basso di quelli dei vincoli rigidi
+PESO_MODIFICA = 50.0
+
+def giorni_in_conflitto(matrice, dipendenti):
+    # Giorni con turni assegnati a dipendenti assenti o fuori dai loro turni possibili
+    indice = IndiceDisponibilita(matrice.inizio, matrice.fine, dipendenti)
+    giorni = set()
+    for dip in dipendenti:
+        if dip.nome not in matrice.posizioni:
+            continue
+        ammessi = set(dip.turni_possibili)
+        for giorno, turno in matrice.turni_di(dip.nome):
+            if turno not in ammessi or not indice.disponibile(giorno, dip.nome):
+                giorni.add(giorno)
+    return sorted(giorni)
+
+def _fabbisogno_completo(matrice):
+    # Fabbisogno registrato dal generatore; per i giorni senza fabbisogno noto si assume
+    # che vada coperto quanto è assegnato adesso
+    fabbisogno = dict(matrice.fabbisogno or {})
+    for g, giorno in enumerate(matrice.giorni()):
+        if giorno not in fabbisogno:
+            fabbisogno[giorno] = [SIGLE[c] for c in matrice.celle[g] if c]
+    return fabbisogno
+
+def ripara_turni(calendario, dipendenti, giorni=None, bloccate=(), stato=None, rng=None,
+                 tempo_limite=1.0, iterazioni=None, progresso=None, annulla=None):
+    # calendario: vista o dizionario già generato; giorni: giorni toccati dalla modifica (default:
+    # i giorni in conflitto con assenze e turni possibili); bloccate: celle (giorno, nome) da non
+    # toccare; stato: stato delle regole di riposo al giorno prima dell'inizio del calendario.
+    # Restituisce (nuovo calendario, modifiche) con modifiche = [(giorno, nome, prima, dopo)].
+    # progresso e annulla passano alla ricottura: se annullata si tiene la soluzione trovata fin lì.
+    rng = rng or random.Random()
+    originale = MatriceTurni.da_calendario(calendario, dipendenti)
+    risultato = originale.copia()
+    if giorni is None:
+        giorni = giorni_in_conflitto(originale, dipendenti)
+    dipendenti = [d for d in dipendenti if d.nome in originale.posizioni]
+    if not giorni or not dipendenti:
+        return risultato.calendario(), []
+
+    # Finestra: giorni toccati più MAX_GIORNI_CONSECUTIVI giorni per parte
+    finestra = set()
+    for giorno in giorni:
+        g = (giorno - originale.inizio).days
+        finestra.update(range(max(0, g - MAX_GIORNI_CONSECUTIVI),
+                              min(originale.num_giorni, g + MAX_GIORNI_CONSECUTIVI + 1)))
+    finestra = sorted(finestra)
+    giorni_matrice = originale.giorni()
+
+    colonne = [originale.posizioni[d.nome] for d in dipendenti]
+    riferimento = originale.celle[:, colonne].tolist()
+    # Fuori dalla finestra i turni restano quelli attuali, anche se in conflitto
+    in_finestra = set(finestra)
+    fuori = [(giorni_matrice[g], d.nome) for g in range(originale.num_giorni) if g not in in_finestra
+             for e, d in enumerate(dipendenti) if riferimento[g][e]]
+    problema = ProblemaTurni(originale.inizio, originale.fine, dipendenti, _fabbisogno_completo(originale),
+                             stato, list(bloccate) + fuori)
+    problema.carica(originale.calendario())
+    problema.imposta_riferimento(riferimento, PESO_MODIFICA)
+    if tempo_limite is None and iterazioni is None:
+        iterazioni = 2000 * len(finestra)
+    ricottura(problema, rng, tempo_limite=tempo_limite, iterazioni=iterazioni, giorni=finestra,
+              progresso=progresso, annulla=annulla)
+
+    # Riporta al valore originale ogni cella cambiata il cui ripristino non peggiora il costo
+    for g in finestra:
+        for e in range(len(dipendenti)):
+            originale_cella = riferimento[g][e]
+            attuale = problema.celle[g][e]
+            if attuale == originale_cella or problema.bloccata[g][e]:
+                continue
+            if originale_cella and originale_cella not in problema.ammessi[e]:
+                continue
+            if problema.imposta(g, e, originale_cella) > 1e-9:
+                problema.imposta(g, e, attuale)
+
+    modifiche = []
+    for g in range(originale.num_giorni):
+        for e, d in enumerate(dipendenti):
+            prima, dopo = riferimento[g][e], problema.celle[g][e]
+            if prima != dopo:
+                risultato.celle[g, colonne[e]] = dopo
+                modifiche.append((giorni_matrice[g], d.nome, SIGLE[prima], SIGLE[dopo]))
+    return risultato.calendario(), modifiche
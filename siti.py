@@ -0,0 +1,255 @@
+# Pianificazione su più sedi (reception, bar, ...) in un'unica generazione.
+# Ogni sede ha un modello di copertura per giorno della settimana e il proprio personale; un
+# dipendente può lavorare in più sedi. Le sedi che condividono personale formano una componente
+# e vengono risolte insieme, con un solo turno al giorno per dipendente, così nessuno viene
+# assegnato due volte; le componenti con personale disgiunto si risolvono in parallelo.
+# Dentro una componente ogni turno richiesto è un posto (sede, turno) che i generatori offrono
+# solo al personale di quella sede (opzione idonei); alla fine i turni assegnati vengono
+# attribuiti alle sedi con un abbinamento massimo, così i turni scoperti di ogni sede sono
+# quelli che nessun dipendente della sede poteva coprire.
+
+import datetime
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from orari import TURNI, CODICI, Dipendente, MatriceTurni, StatoGenerazione
+
+# Modelli di esempio: giorno della settimana (0 = lunedì ... 6 = domenica) -> turni da coprire
+MODELLO_RECEPTION = {g: ['M2', 'P2', 'S', 'P'] for g in range(7)}
+MODELLO_RECEPTION[5] = ['M2', 'P2', 'S', 'P', 'C_sabato']
+MODELLO_BAR = {g: ['bar', 'bar_matin'] for g in range(7)}
+
+class Sede:
+    def __init__(self, nome, modello, dipendenti=(), eccezioni=None):
+        # modello: {giorno della settimana: [turni]}; dipendenti: nomi (o Dipendente) del personale;
+        # eccezioni: {data: [turni]} per i giorni che non seguono il modello (festivi, eventi)
+        self.nome = nome
+        self.modello = {int(g): list(turni) for g, turni in modello.items()}
+        self.dipendenti = [getattr(d, 'nome', d) for d in dipendenti]
+        self.eccezioni = dict(eccezioni or {})
+        for turni in list(self.modello.values()) + list(self.eccezioni.values()):
+            for turno in turni:
+                if turno not in TURNI:
+                    raise ValueError(f"Sede {nome}: turno sconosciuto {turno}")
+
+    def turni_giorno(self, giorno):
+        if giorno in self.eccezioni:
+            return list(self.eccezioni[giorno])
+        return list(self.modello.get(giorno.weekday(), []))
+
+    def fabbisogno(self, inizio, fine):
+        num_giorni = (fine - inizio).days + 1
+        giorni = (inizio + datetime.timedelta(days=i) for i in range(num_giorni))
+        return {giorno: self.turni_giorno(giorno) for giorno in giorni}
+
+    def turni_richiesti(self):
+        turni = set()
+        for lista in list(self.modello.values()) + list(self.eccezioni.values()):
+            turni.update(lista)
+        return turni
+
+    def a_dict(self):
+        return {
+            'nome': self.nome,
+            'modello': {str(g): turni for g, turni in self.modello.items()},
+            'dipendenti': list(self.dipendenti),
+            'eccezioni': {g.isoformat(): turni for g, turni in self.eccezioni.items()},
+        }
+
+    @classmethod
+    def da_dict(cls, dati):
+        eccezioni = {datetime.date.fromisoformat(g): t for g, t in dati.get('eccezioni', {}).items()}
+        return cls(dati['nome'], dati['modello'], dati.get('dipendenti', ()), eccezioni)
+
+def carica_sedi(percorso):
+    # File JSON con una lista di sedi nel formato di Sede.a_dict
+    with open(percorso, encoding="utf-8") as f:
+        return [Sede.da_dict(dati) for dati in json.load(f)]
+
+def salva_sedi(sedi, percorso):
+    with open(percorso, "w", encoding="utf-8") as f:
+        json.dump([s.a_dict() for s in sedi], f, indent=2, ensure_ascii=False)
+
+def componenti_sedi(sedi):
+    # Gruppi di sedi collegate da personale in comune (union-find), nell'ordine delle sedi
+    padre = list(range(len(sedi)))
+
+    def radice(i):
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]
+            i = padre[i]
+        return i
+
+    prima_sede = {}
+    for i, sede in enumerate(sedi):
+        for nome in sede.dipendenti:
+            if nome in prima_sede:
+                a, b = radice(prima_sede[nome]), radice(i)
+                if a != b:
+                    padre[max(a, b)] = min(a, b)
+            else:
+                prima_sede[nome] = i
+    gruppi = {}
+    for i in range(len(sedi)):
+        gruppi.setdefault(radice(i), []).append(i)
+    return [[sedi[i] for i in gruppo] for gruppo in gruppi.values()]
+
+def _dipendente_per_sedi(dip, turni):
+    # Copia del dipendente limitata ai turni richiesti dalle sue sedi
+    copia = Dipendente(dip.nome)
+    copia.ferie = list(dip.ferie)
+    copia.riposi_aggiuntivi = list(dip.riposi_aggiuntivi)
+    copia.recuperi = list(dip.recuperi)
+    copia.turni_possibili = [t for t in dip.turni_possibili if t in turni]
+    copia.priorita_turni = dict(dip.priorita_turni)
+    return copia
+
+def _risolvi_componente(argomenti):
+    inizio, fine, dipendenti, fabbisogno, stato, seme, motore, opzioni = argomenti
+    from solutore import risolvi
+    calendario, nuovo_stato = risolvi(inizio, fine, dipendenti, motore=motore, stato=stato,
+                                      rng=random.Random(seme), fabbisogno=fabbisogno,
+                                      aggiorna_dipendenti=False, **opzioni)
+    return MatriceTurni.da_calendario(calendario, dipendenti), nuovo_stato
+
+# Risultato di genera_sedi: calendario complessivo, stato, calendario e scoperti di ogni sede
+class RisultatoSedi:
+    def __init__(self, matrice, stato, per_sede, scoperti, seme):
+        self.matrice = matrice
+        self.calendario = matrice.calendario()
+        self.stato = stato
+        self.per_sede = per_sede
+        self.scoperti = scoperti
+        self.seme = seme
+
+    def violazioni(self, dipendenti, stato=None):
+        # Regole dei dipendenti sul calendario complessivo (un dipendente può lavorare in più sedi),
+        # copertura sede per sede sui turni attribuiti a ciascuna
+        from validazione import COPERTURA, TIPI, Validatore
+        violazioni = Validatore(self.matrice, dipendenti, fabbisogno={}, stato=stato).valida()
+        for nome, matrice in self.per_sede.items():
+            for violazione in Validatore(matrice, dipendenti).valida():
+                if violazione.tipo == COPERTURA:
+                    violazione.dettaglio = f"{nome}: {violazione.dettaglio}"
+                    violazioni.append(violazione)
+        return sorted(violazioni, key=lambda v: (v.giorno, TIPI.index(v.tipo)))
+
+    def sezioni(self, dipendenti):
+        # (titolo, calendario, dipendenti) per esportare una sezione per sede in un unico PDF
+        per_nome = {d.nome: d for d in dipendenti}
+        return [(nome, matrice.calendario(), [per_nome[n] for n in matrice.nomi if n in per_nome])
+                for nome, matrice in self.per_sede.items()]
+
+def _attribuisci_sedi(matrice, sedi, fabbisogni):
+    # Divide i turni assegnati tra le sedi: per ogni giorno e turno, un abbinamento massimo tra i
+    # posti richiesti dalle sedi e i dipendenti delle sedi che fanno quel turno; i turni rimasti
+    # (ripieghi, turni forzati) vanno alla prima sede del dipendente
+    from solutore import abbina_posti
+    personale = {sede.nome: frozenset(sede.dipendenti) for sede in sedi}
+    per_sede = {}
+    for sede in sedi:
+        per_sede[sede.nome] = MatriceTurni(matrice.inizio, matrice.fine,
+                                           [n for n in sede.dipendenti if n in matrice.posizioni])
+        per_sede[sede.nome].fabbisogno = fabbisogni[sede.nome]
+    scoperti = {sede.nome: 0 for sede in sedi}
+    for g, giorno in enumerate(matrice.giorni()):
+        riga = matrice.celle[g]
+        liberi = {n: riga[matrice.posizioni[n]] for n in matrice.nomi if riga[matrice.posizioni[n]]}
+        posti = {}
+        for sede in sedi:
+            for turno in fabbisogni[sede.nome].get(giorno, ()):
+                posti.setdefault(CODICI[turno], []).append(sede.nome)
+        for codice, sedi_posti in posti.items():
+            persone = [n for n, c in liberi.items() if c == codice]
+            abbinati = abbina_posti([personale[nome_sede] for nome_sede in sedi_posti], persone)
+            for nome_sede, nome in zip(sedi_posti, abbinati):
+                if nome is None:
+                    scoperti[nome_sede] += 1
+                    continue
+                destinazione = per_sede[nome_sede]
+                destinazione.celle[g, destinazione.posizioni[nome]] = codice
+                del liberi[nome]
+        for sede in sedi:
+            destinazione = per_sede[sede.nome]
+            for nome in sede.dipendenti:
+                if nome in liberi:
+                    destinazione.celle[g, destinazione.posizioni[nome]] = liberi.pop(nome)
+    return per_sede, scoperti
+
+def genera_sedi(inizio, fine, sedi, dipendenti, motore="greedy", seme=None, stato=None, processi=None,
+                aggiorna_dipendenti=True, **opzioni):
+    # Genera i turni di tutte le sedi dal/al (estremi inclusi). I dipendenti che non appartengono
+    # a nessuna sede non vengono pianificati. Con lo stesso seme il risultato è riproducibile,
+    # indipendentemente dal numero di processi. I contatori di equità (opzione equita) vengono
+    # copiati per ogni componente e aggiornati alla fine con il calendario complessivo.
+    if fine < inizio:
+        raise ValueError("La data di fine precede la data di inizio.")
+    nomi_sedi = [s.nome for s in sedi]
+    if len(set(nomi_sedi)) != len(nomi_sedi):
+        raise ValueError("Nomi di sede duplicati.")
+    per_nome = {d.nome: d for d in dipendenti}
+    for sede in sedi:
+        sconosciuti = [n for n in sede.dipendenti if n not in per_nome]
+        if sconosciuti:
+            raise ValueError(f"Sede {sede.nome}: dipendenti sconosciuti {', '.join(sconosciuti)}")
+    if seme is None:
+        seme = random.SystemRandom().getrandbits(32)
+    generatore_semi = random.Random(seme)
+    equita = opzioni.pop('equita', None)
+
+    fabbisogni = {sede.nome: sede.fabbisogno(inizio, fine) for sede in sedi}
+    lavori = []
+    componenti = componenti_sedi(sedi)
+    for componente in componenti:
+        nomi = list(dict.fromkeys(n for sede in componente for n in sede.dipendenti))
+        turni_ammessi = {n: set() for n in nomi}
+        for sede in componente:
+            for n in sede.dipendenti:
+                turni_ammessi[n] |= sede.turni_richiesti()
+        personale = [_dipendente_per_sedi(per_nome[n], turni_ammessi[n]) for n in nomi]
+        fabbisogno = {giorno: [t for sede in componente for t in fabbisogni[sede.nome][giorno]]
+                      for giorno in fabbisogni[componente[0].nome]}
+        opzioni_componente = dict(opzioni, equita=equita.copia()) if equita is not None else dict(opzioni)
+        if len(componente) > 1:
+            # Ogni posto solo al personale della sede che lo richiede
+            gruppi = {sede.nome: frozenset(sede.dipendenti) for sede in componente}
+            opzioni_componente['idonei'] = {
+                giorno: [gruppi[sede.nome] for sede in componente for _ in fabbisogni[sede.nome][giorno]]
+                for giorno in fabbisogno}
+        lavori.append((inizio, fine, personale, fabbisogno, stato, generatore_semi.getrandbits(32), motore,
+                       opzioni_componente))
+
+    if processi == 1 or len(lavori) < 2:
+        risultati = [_risolvi_componente(lavoro) for lavoro in lavori]
+    else:
+        with ProcessPoolExecutor(max_workers=processi) as pool:
+            risultati = list(pool.map(_risolvi_componente, lavori))
+
+    nomi = list(dict.fromkeys(n for sede in sedi for n in sede.dipendenti))
+    matrice = MatriceTurni(inizio, fine, nomi)
+    matrice.fabbisogno = {}
+    nuovo_stato = stato.copia() if stato else StatoGenerazione()
+    nuovo_stato.ordine = []
+    per_sede, scoperti = {}, {}
+    for componente, (parziale, stato_componente) in zip(componenti, risultati):
+        for n in parziale.nomi:
+            matrice.celle[:, matrice.posizioni[n]] = parziale.celle[:, parziale.posizioni[n]]
+            nuovo_stato.ultimi_riposi[n] = stato_componente.ultimi_riposi.get(n)
+            nuovo_stato.riposo_ieri[n] = stato_componente.riposo_ieri.get(n, False)
+            nuovo_stato.giorni_consecutivi[n] = stato_componente.giorni_consecutivi.get(n, 0)
+            nuovo_stato.turno_ieri[n] = stato_componente.turno_ieri.get(n)
+        nuovo_stato.ordine += [n for n in stato_componente.ordine if n in parziale.posizioni]
+        componente_per_sede, componente_scoperti = _attribuisci_sedi(parziale, componente, fabbisogni)
+        per_sede.update(componente_per_sede)
+        scoperti.update(componente_scoperti)
+    for giorno in matrice.giorni():
+        matrice.fabbisogno[giorno] = [t for sede in sedi for t in fabbisogni[sede.nome][giorno]]
+    nuovo_stato.ultimo_giorno = fine
+    # Sedi nell'ordine in cui sono state passate
+    per_sede = {nome: per_sede[nome] for nome in nomi_sedi}
+    if aggiorna_dipendenti:
+        matrice.applica_a([per_nome[n] for n in nomi])
+    if equita is not None:
+        equita.registra_matrice(matrice)
+    return RisultatoSedi(matrice, nuovo_stato, per_sede, scoperti, seme)
@@ -0,0 +1,584 @@
+# Motori di generazione dei turni: registro dei motori disponibili e motore a ricottura simulata
+# (simulated annealing) con copertura e regole di riposo come vincoli rigidi e priorità/bilanciamento
+# delle ore come obiettivo. Il motore greedy di orari.py resta disponibile come base veloce.
+
+import datetime
+import math
+import random
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from orari import (SIGLE, CODICI, DURATE_ORE, MAX_GIORNI_CONSECUTIVI, IndiceDisponibilita, MatriceTurni,
+                   StatoGenerazione, calcola_fabbisogno, compatibilita_turni, genera_turni_periodo)
+
+# Pesi della funzione di costo: i vincoli rigidi pesano ordini di grandezza più degli obiettivi
+PESO_SCOPERTO = 1000.0      # turno del fabbisogno non coperto
+PESO_RIPOSO = 1000.0        # violazione delle regole di riposo (anche riposo minimo tra due turni)
+PESO_PRIORITA = 1.0         # per ogni punto di priorità sotto la preferita del dipendente
+PESO_ECCEDENZA = 2.0        # turno assegnato oltre il fabbisogno del giorno
+PESO_ORE = 0.05             # scarto quadratico delle ore dal carico proporzionale ai giorni disponibili
+
+# Registro dei motori: ogni motore ha firma
+# motore(inizio, fine, dipendenti, stato=None, rng=None, fabbisogno=None, tempo_limite=None, **opzioni)
+# e restituisce (calendario, stato) come genera_turni_periodo. Le opzioni che riguardano un solo
+# motore (tempo_limite, iterazioni) sono accettate e ignorate dagli altri. Tra le opzioni comuni: report,
+# progresso(frazione) e annulla (threading.Event): se annullato, un motore restituisce la
+# migliore soluzione trovata fino a quel momento; equita (ContatoriEquita) orienta la scelta dei
+# candidati e viene aggiornato con il calendario restituito; idonei ({giorno: [insieme di nomi o
+# None per ogni turno del fabbisogno]}) limita ogni posto a chi può coprirlo.
+MOTORI = {}
+
+def registra_motore(nome, funzione):
+    MOTORI[nome] = funzione
+
+def risolvi(inizio, fine, dipendenti, motore="ricottura", **opzioni):
+    try:
+        funzione = MOTORI[motore]
+    except KeyError:
+        raise ValueError(f"Motore sconosciuto: {motore}. Disponibili: {', '.join(sorted(MOTORI))}")
+    return funzione(inizio, fine, dipendenti, **opzioni)
+
+def _motore_greedy(inizio, fine, dipendenti, stato=None, rng=None, fabbisogno=None, tempo_limite=None,
+                   iterazioni=None, aggiorna_dipendenti=True, report=None, progresso=None, annulla=None, equita=None,
+                   idonei=None):
+    return genera_turni_periodo(inizio, fine, dipendenti, stato, rng=rng, fabbisogno=fabbisogno,
+                                aggiorna_dipendenti=aggiorna_dipendenti, report=report,
+                                progresso=progresso, annulla=annulla, equita=equita, idonei=idonei)
+
+def abbina_posti(posti, persone):
+    # Abbinamento massimo tra i posti di un turno (insieme di chi può coprirli, None = chiunque) e le
+    # persone che fanno quel turno, con i cammini aumentanti di Kuhn. Restituisce per ogni posto la
+    # persona assegnata oppure None; a parità vince l'ordine di posti e persone.
+    assegnati = {}
+
+    def assegna(posto, viste):
+        gruppo = posti[posto]
+        for persona in persone:
+            if persona in viste or (gruppo is not None and persona not in gruppo):
+                continue
+            viste.add(persona)
+            if persona not in assegnati or assegna(assegnati[persona], viste):
+                assegnati[persona] = posto
+                return True
+        return False
+
+    for posto in range(len(posti)):
+        assegna(posto, set())
+    risultato = [None] * len(posti)
+    for persona, posto in assegnati.items():
+        risultato[posto] = persona
+    return risultato
+
+def stato_da_calendario(calendario, dipendenti, stato=None):
+    # Ricostruisce lo stato delle regole di riposo al termine di un calendario già generato,
+    # con la stessa semantica usata da genera_turni_periodo
+    stato = stato.copia() if stato else StatoGenerazione()
+    for d in dipendenti:
+        stato.ultimi_riposi.setdefault(d.nome, None)
+        stato.riposo_ieri.setdefault(d.nome, False)
+        stato.giorni_consecutivi.setdefault(d.nome, 0)
+        stato.turno_ieri.setdefault(d.nome, None)
+    for giorno in sorted(calendario):
+        turni_giorno = calendario[giorno]
+        for d in dipendenti:
+            stato.turno_ieri[d.nome] = turni_giorno.get(d.nome)
+            if d.nome in turni_giorno:
+                stato.riposo_ieri[d.nome] = False
+                stato.giorni_consecutivi[d.nome] += 1
+            else:
+                stato.ultimi_riposi[d.nome] = giorno
+                stato.riposo_ieri[d.nome] = True
+                stato.giorni_consecutivi[d.nome] = 0
+        stato.ultimo_giorno = giorno
+    if not stato.ordine:
+        stato.ordine = [d.nome for d in dipendenti]
+    return stato
+
+# Problema di assegnazione su una griglia giorni x dipendenti. Ogni cella contiene 0 (riposo)
+# oppure il codice (1..n) di un turno; il costo è mantenuto in modo incrementale così che
+# ogni mossa costi O(lunghezza della sequenza lavorativa toccata) e non O(giorni x dipendenti).
+class ProblemaTurni:
+    def __init__(self, inizio, fine, dipendenti, fabbisogno, stato=None, bloccate=None, idonei=None):
+        self.dipendenti = list(dipendenti)
+        self.inizio = inizio
+        self.fine = fine
+        self.fabbisogno = fabbisogno
+        self.giorni = sorted(fabbisogno)
+        self.sigle = SIGLE
+        self.codici = {s: c for s, c in CODICI.items() if s}
+        self.durate = [0.0] + [DURATE_ORE[s] for s in self.sigle[1:]]
+        num_giorni = len(self.giorni)
+        num_dip = len(self.dipendenti)
+        n_codici = len(self.sigle)
+
+        indice = IndiceDisponibilita(inizio, fine, self.dipendenti)
+        self.assente = [[bool(indice.assenti(g) >> e & 1) for e in range(num_dip)] for g in self.giorni]
+        # Celle che il motore non può modificare (assenze e celle fissate dal chiamante)
+        self.bloccata = [row[:] for row in self.assente]
+        indice_giorni = {g: i for i, g in enumerate(self.giorni)}
+        self.fissate = set()
+        for giorno, nome in bloccate or ():
+            if giorno in indice_giorni and nome in indice.posizioni:
+                g, e = indice_giorni[giorno], indice.posizioni[nome]
+                self.bloccata[g][e] = True
+                self.fissate.add((g, e))
+
+        self.ammessi = [[self.codici[t] for t in d.turni_possibili if t in self.codici] for d in self.dipendenti]
+        # Priorità: 1 è la più alta; il costo è la distanza dalla priorità migliore del dipendente
+        self.costo_priorita = []
+        for d, ammessi in zip(self.dipendenti, self.ammessi):
+            prio = {c: d.priorita_turni.get(self.sigle[c], 1) for c in ammessi}
+            migliore = min(prio.values(), default=1)
+            costi = [0.0] * n_codici
+            for c, p in prio.items():
+                costi[c] = float(p - migliore)
+            self.costo_priorita.append(costi)
+
+        self.domanda = []
+        for g in self.giorni:
+            conteggio = [0] * n_codici
+            for t in fabbisogno[g]:
+                conteggio[self.codici[t]] += 1
+            self.domanda.append(conteggio)
+        # Con idonei: per giorno e codice, i posti come insiemi di indici dei dipendenti che possono
+        # coprirli (None = chiunque); la copertura di quel codice diventa un abbinamento
+        self.posti = None
+        if idonei is not None:
+            indici = {}
+            self.posti = []
+            for g in self.giorni:
+                posti = {}
+                for t, gruppo in zip(fabbisogno[g], idonei[g]):
+                    if gruppo is not None and gruppo not in indici:
+                        indici[gruppo] = frozenset(e for e, d in enumerate(self.dipendenti) if d.nome in gruppo)
+                    posti.setdefault(self.codici[t], []).append(indici[gruppo] if gruppo is not None else None)
+                self.posti.append({c: lista for c, lista in posti.items() if any(x is not None for x in lista)})
+
+        stato = stato or StatoGenerazione()
+        self.consecutivi_iniziali = [stato.giorni_consecutivi.get(d.nome, 0) for d in self.dipendenti]
+        self.riposo_iniziale = [stato.riposo_ieri.get(d.nome, False) for d in self.dipendenti]
+        # Coppie di turni in giorni consecutivi senza il riposo minimo, per codice
+        self.incompatibili = compatibilita_turni().incompatibili
+        self.turno_iniziale = [self.codici.get(stato.turno_ieri.get(d.nome), 0) for d in self.dipendenti]
+        disponibili = [sum(not self.assente[g][e] for g in range(num_giorni)) for e in range(num_dip)]
+        self.peso_disponibilita = [max(a, 1) for a in disponibili]
+        self.disponibilita_totale = float(sum(self.peso_disponibilita))
+
+        self.celle = [[0] * num_dip for _ in range(num_giorni)]
+        self.conteggi = [[0] * n_codici for _ in range(num_giorni)]
+        self.ore = [0.0] * num_dip
+        self._totale_ore = 0.0
+        self.costo = 0.0
+        # Griglia di riferimento opzionale: ogni cella diversa da essa costa peso_modifica
+        self.riferimento = None
+        self.peso_modifica = 0.0
+
+    # --- valutazione ---
+
+    def _riposo_libero(self, g, e):
+        # Riposo non giustificato da ferie/recupero/riposo aggiuntivo
+        if g < 0:
+            return self.riposo_iniziale[e]
+        return self.celle[g][e] == 0 and not self.assente[g][e]
+
+    def _sequenza(self, g, e, passo):
+        # Giorni lavorati consecutivi a partire da g (escluso) nella direzione indicata
+        n = 0
+        g += passo
+        while 0 <= g < len(self.giorni) and self.celle[g][e]:
+            n += 1
+            g += passo
+        if g < 0 and passo < 0:
+            n += self.consecutivi_iniziali[e]
+        return n
+
+    def _precedente(self, g, e):
+        return self.celle[g - 1][e] if g > 0 else self.turno_iniziale[e]
+
+    def _penalita_riposo(self, g, e):
+        # Violazioni delle regole di riposo che coinvolgono la cella (g, e)
+        codice = self.celle[g][e]
+        brevi = self.incompatibili[self._precedente(g, e)][codice]
+        if g + 1 < len(self.giorni):
+            brevi += self.incompatibili[codice][self.celle[g + 1][e]]
+        sinistra = self._sequenza(g, e, -1)
+        destra = self._sequenza(g, e, 1)
+        if self.celle[g][e]:
+            eccesso = max(0, sinistra + 1 + destra - MAX_GIORNI_CONSECUTIVI)
+        else:
+            eccesso = max(0, sinistra - MAX_GIORNI_CONSECUTIVI) + max(0, destra - MAX_GIORNI_CONSECUTIVI)
+        doppi = 0
+        if self._riposo_libero(g, e):
+            doppi += self._riposo_libero(g - 1, e)
+            if g + 1 < len(self.giorni):
+                doppi += self._riposo_libero(g + 1, e)
+        return eccesso + doppi + brevi
+
+    def _costo_giorno(self, g, codice):
+        posti = self.posti[g].get(codice) if self.posti is not None else None
+        if posti and self.conteggi[g][codice]:
+            persone = [e for e, c in enumerate(self.celle[g]) if c == codice]
+            coperti = sum(persona is not None for persona in abbina_posti(posti, persone))
+            return PESO_SCOPERTO * (len(posti) - coperti) + PESO_ECCEDENZA * (len(persone) - coperti)
+        mancanti = self.domanda[g][codice] - self.conteggi[g][codice]
+        if mancanti > 0:
+            return PESO_SCOPERTO * mancanti
+        return PESO_ECCEDENZA * -mancanti
+
+    def _costo_ore(self, e, ore):
+        return PESO_ORE * ore * ore / self.peso_disponibilita[e]
+
+    def costo_totale(self):
+        # Costo completo, usato all'avvio e per controllo; le mosse usano gli aggiornamenti incrementali
+        costo = 0.0
+        for g in range(len(self.giorni)):
+            for c in range(1, len(self.sigle)):
+                costo += self._costo_giorno(g, c)
+        for e in range(len(self.dipendenti)):
+            eccesso = 0
+            corsa = self.consecutivi_iniziali[e]
+            for g in range(len(self.giorni)):
+                eccesso += self.incompatibili[self._precedente(g, e)][self.celle[g][e]]
+                if self.celle[g][e]:
+                    corsa += 1
+                else:
+                    eccesso += max(0, corsa - MAX_GIORNI_CONSECUTIVI)
+                    corsa = 0
+                    if self._riposo_libero(g, e) and self._riposo_libero(g - 1, e):
+                        eccesso += 1
+                costo += PESO_PRIORITA * self.costo_priorita[e][self.celle[g][e]]
+            eccesso += max(0, corsa - MAX_GIORNI_CONSECUTIVI)
+            costo += PESO_RIPOSO * eccesso + self._costo_ore(e, self.ore[e])
+        if self.riferimento is not None:
+            costo += self.peso_modifica * sum(a != b for riga, rif in zip(self.celle, self.riferimento)
+                                              for a, b in zip(riga, rif))
+        totale_ore = sum(self.ore)
+        costo -= PESO_ORE * totale_ore * totale_ore / self.disponibilita_totale
+        return costo
+
+    # --- modifiche ---
+
+    def imposta(self, g, e, codice):
+        # Cambia una cella e restituisce la variazione di costo
+        vecchio = self.celle[g][e]
+        if vecchio == codice:
+            return 0.0
+        delta = -PESO_RIPOSO * self._penalita_riposo(g, e)
+        delta -= PESO_PRIORITA * self.costo_priorita[e][vecchio]
+        delta -= self._costo_giorno(g, vecchio) if vecchio else 0.0
+        delta -= self._costo_giorno(g, codice) if codice else 0.0
+        totale_prima = self._totale_ore
+        ore_prima = self.ore[e]
+
+        self.celle[g][e] = codice
+        if vecchio:
+            self.conteggi[g][vecchio] -= 1
+        if codice:
+            self.conteggi[g][codice] += 1
+        ore_dopo = ore_prima - self.durate[vecchio] + self.durate[codice]
+        self.ore[e] = ore_dopo
+        sum_ore = totale_prima - ore_prima + ore_dopo
+        self._totale_ore = sum_ore
+
+        delta += PESO_RIPOSO * self._penalita_riposo(g, e)
+        delta += PESO_PRIORITA * self.costo_priorita[e][codice]
+        delta += self._costo_giorno(g, vecchio) if vecchio else 0.0
+        delta += self._costo_giorno(g, codice) if codice else 0.0
+        delta += self._costo_ore(e, ore_dopo) - self._costo_ore(e, ore_prima)
+        delta -= PESO_ORE * (sum_ore * sum_ore - totale_prima * totale_prima) / self.disponibilita_totale
+        if self.riferimento is not None:
+            rif = self.riferimento[g][e]
+            delta += self.peso_modifica * ((codice != rif) - (vecchio != rif))
+        self.costo += delta
+        return delta
+
+    def carica(self, calendario):
+        # Inizializza la griglia da un calendario {giorno: {nome: turno}}, scartando le celle
+        # incompatibili con assenze o turni possibili
+        posizioni = {d.nome: e for e, d in enumerate(self.dipendenti)}
+        for g, giorno in enumerate(self.giorni):
+            for nome, turno in calendario.get(giorno, {}).items():
+                e = posizioni.get(nome)
+                codice = self.codici.get(turno)
+                if e is None or codice is None:
+                    continue
+                fissata = (g, e) in self.fissate
+                if self.assente[g][e] and not fissata:
+                    continue
+                if codice in self.ammessi[e] or fissata:
+                    self.celle[g][e] = codice
+                    self.conteggi[g][codice] += 1
+                    self.ore[e] += self.durate[codice]
+        self._totale_ore = sum(self.ore)
+        self.costo = self.costo_totale()
+
+    def imposta_riferimento(self, celle, peso):
+        self.riferimento = [riga[:] for riga in celle]
+        self.peso_modifica = peso
+        self.costo = self.costo_totale()
+
+    def matrice(self):
+        matrice = MatriceTurni(self.inizio, self.fine, [d.nome for d in self.dipendenti],
+                               np.array(self.celle, dtype=np.int8).reshape(len(self.giorni), len(self.dipendenti)))
+        matrice.fabbisogno = dict(self.fabbisogno)
+        return matrice
+
+    def calendario(self):
+        return self.matrice().calendario()
+
+    def copia_celle(self):
+        return [riga[:] for riga in self.celle]
+
+    def ripristina_celle(self, celle):
+        for g, riga in enumerate(celle):
+            for e, codice in enumerate(riga):
+                if self.celle[g][e] != codice:
+                    self.imposta(g, e, codice)
+
+    def celle_modificabili(self, giorni=None):
+        giorni = range(len(self.giorni)) if giorni is None else giorni
+        return [(g, e) for g in giorni for e in range(len(self.dipendenti))
+                if not self.bloccata[g][e] and self.ammessi[e]]
+
+def ricottura(problema, rng, tempo_limite=None, iterazioni=None, giorni=None,
+              temperatura_iniziale=50.0, temperatura_finale=0.05, report=None, progresso=None, annulla=None):
+    # Ricerca locale con ricottura simulata sulle celle modificabili del problema.
+    # Con iterazioni il risultato è riproducibile a parità di seme; con solo tempo_limite
+    # viene restituita la migliore soluzione trovata entro il tempo indicato (secondi).
+    # report (ReportGenerazione) riceve iterazioni, mosse accettate, costi e tempo impiegato.
+    # progresso e annulla vengono consultati ogni 256 iterazioni, insieme al tempo limite.
+    celle = problema.celle_modificabili(giorni)
+    if not celle or (tempo_limite is None and iterazioni is None):
+        return problema.costo
+    costo_iniziale = problema.costo
+    accettate = 0
+    num_dip = len(problema.dipendenti)
+    migliore_costo = problema.costo
+    migliori_celle = problema.copia_celle()
+    inizio = time.perf_counter()
+    rapporto = temperatura_finale / temperatura_iniziale
+    temperatura = temperatura_iniziale
+    i = 0
+    while True:
+        if i & 255 == 0:
+            if iterazioni is not None:
+                avanzamento = i / iterazioni
+            else:
+                avanzamento = (time.perf_counter() - inizio) / tempo_limite
+            if tempo_limite is not None and time.perf_counter() - inizio >= tempo_limite:
+                break
+            if avanzamento >= 1.0 or (annulla is not None and annulla.is_set()):
+                break
+            if progresso:
+                progresso(avanzamento)
+            temperatura = temperatura_iniziale * rapporto ** avanzamento
+        i += 1
+
+        g, e = celle[rng.randrange(len(celle))]
+        vecchio = problema.celle[g][e]
+        if rng.random() < 0.5:
+            # Scambio dei turni di due dipendenti nello stesso giorno: conserva la copertura
+            altro = rng.randrange(num_dip)
+            nuovo = problema.celle[g][altro]
+            if (altro == e or nuovo == vecchio or problema.bloccata[g][altro]
+                    or (nuovo and nuovo not in problema.ammessi[e])
+                    or (vecchio and vecchio not in problema.ammessi[altro])):
+                continue
+            delta = problema.imposta(g, e, nuovo) + problema.imposta(g, altro, vecchio)
+            if delta <= 0 or rng.random() < math.exp(-delta / temperatura):
+                accettate += 1
+                if problema.costo < migliore_costo - 1e-9:
+                    migliore_costo = problema.costo
+                    migliori_celle = problema.copia_celle()
+            else:
+                problema.imposta(g, altro, nuovo)
+                problema.imposta(g, e, vecchio)
+        else:
+            ammessi = problema.ammessi[e]
+            nuovo = 0 if vecchio and rng.random() < 0.3 else ammessi[rng.randrange(len(ammessi))]
+            if nuovo == vecchio:
+                continue
+            delta = problema.imposta(g, e, nuovo)
+            if delta <= 0 or rng.random() < math.exp(-delta / temperatura):
+                accettate += 1
+                if problema.costo < migliore_costo - 1e-9:
+                    migliore_costo = problema.costo
+                    migliori_celle = problema.copia_celle()
+            else:
+                problema.imposta(g, e, vecchio)
+    problema.ripristina_celle(migliori_celle)
+    if report is not None:
+        report.tempi['ricottura'] = report.tempi.get('ricottura', 0.0) + time.perf_counter() - inizio
+        report.iterazioni += i
+        report.mosse_accettate += accettate
+        if report.costo_iniziale is None:
+            report.costo_iniziale = costo_iniziale
+        report.costo_finale = problema.costo
+    return problema.costo
+
+def genera_turni_ricottura(inizio, fine, dipendenti, stato=None, rng=None, fabbisogno=None, tempo_limite=5.0,
+                           iterazioni=None, aggiorna_dipendenti=True, report=None, progresso=None, annulla=None,
+                           equita=None, idonei=None):
+    # Parte dalla soluzione greedy sullo stesso fabbisogno e la migliora entro il tempo limite.
+    # Il greedy lavora su una copia dei contatori di equità, aggiornati poi con il risultato finale.
+    rng = rng or random.Random()
+    if fabbisogno is None:
+        fabbisogno = calcola_fabbisogno(inizio, fine, rng)
+    iniziale, stato_iniziale = genera_turni_periodo(inizio, fine, dipendenti, stato, rng=rng, fabbisogno=fabbisogno,
+                                                    aggiorna_dipendenti=False, report=report, annulla=annulla,
+                                                    equita=equita.copia() if equita is not None else None,
+                                                    idonei=idonei)
+    if annulla is not None and annulla.is_set() and stato_iniziale.ultimo_giorno != fine:
+        # Annullato durante la soluzione greedy: come genera_turni_periodo si restituiscono i soli
+        # giorni generati e lo stato fermo all'ultimo di essi, senza ricottura sui giorni vuoti
+        matrice = iniziale.matrice
+        if aggiorna_dipendenti:
+            matrice.applica_a(dipendenti)
+        if equita is not None:
+            generati_fino_al = stato_iniziale.ultimo_giorno or inizio - datetime.timedelta(days=1)
+            equita.registra_matrice(matrice, fino_al=generati_fino_al)
+        return iniziale, stato_iniziale
+    problema = ProblemaTurni(inizio, fine, dipendenti, fabbisogno, stato, idonei=idonei)
+    problema.carica(iniziale)
+    ricottura(problema, rng, tempo_limite=tempo_limite, iterazioni=iterazioni, report=report,
+              progresso=progresso, annulla=annulla)
+    matrice = problema.matrice()
+    if aggiorna_dipendenti:
+        matrice.applica_a(dipendenti)
+    if equita is not None:
+        equita.registra_matrice(matrice)
+    calendario = matrice.calendario()
+    return calendario, stato_da_calendario(calendario, dipendenti, stato)
+
+# --- Generazione multi-seme ---
+
+# Pesi predefiniti della metrica di qualità (più basso è meglio)
+PESI_QUALITA = {
+    'scoperti': 100.0,      # turni del fabbisogno non coperti
+    'varianza_ore': 1.0,    # varianza delle ore totali tra i dipendenti
+    'priorita': 1.0,        # punti di priorità sotto la preferita, sommati su tutti i turni
+}
+
+def metriche_calendario(calendario, dipendenti, fabbisogno):
+    scoperti = 0
+    for giorno, turni_richiesti in fabbisogno.items():
+        presenti = Counter(calendario.get(giorno, {}).values())
+        for turno, richiesti in Counter(turni_richiesti).items():
+            scoperti += max(0, richiesti - presenti[turno])
+    ore = {d.nome: 0.0 for d in dipendenti}
+    priorita = 0
+    migliori = {d.nome: min((d.priorita_turni.get(t, 1) for t in d.turni_possibili), default=1) for d in dipendenti}
+    preferenze = {d.nome: d.priorita_turni for d in dipendenti}
+    for turni_giorno in calendario.values():
+        for nome, turno in turni_giorno.items():
+            if nome in ore:
+                ore[nome] += DURATE_ORE[turno]
+                priorita += preferenze[nome].get(turno, 1) - migliori[nome]
+    media = sum(ore.values()) / len(ore) if ore else 0.0
+    varianza = sum((h - media) ** 2 for h in ore.values()) / len(ore) if ore else 0.0
+    return {'scoperti': scoperti, 'varianza_ore': varianza, 'priorita': priorita}
+
+def valuta_calendario(calendario, dipendenti, fabbisogno, pesi=None):
+    pesi = pesi or PESI_QUALITA
+    metriche = metriche_calendario(calendario, dipendenti, fabbisogno)
+    return sum(pesi.get(k, 0.0) * v for k, v in metriche.items()), metriche
+
+# Risultato di una generazione con seme: il seme basta a riprodurre il calendario se il motore
+# si ferma dopo un numero fisso di passi (greedy, ricottura con iterazioni); con un tempo limite il
+# risultato dipende anche dalla velocità della macchina
+class Candidato:
+    def __init__(self, seme, calendario, stato, fabbisogno, punteggio, metriche):
+        self.seme = seme
+        self.calendario = calendario
+        self.stato = stato
+        self.fabbisogno = fabbisogno
+        self.punteggio = punteggio
+        self.metriche = metriche
+
+def genera_con_seme(inizio, fine, dipendenti, seme, motore="greedy", stato=None, pesi=None, metrica=None,
+                    **opzioni):
+    # Ogni chiamata usa un proprio random.Random e non tocca Dipendente.turni. È deterministica se il
+    # motore è limitato da iterazioni e non da tempo_limite (vedi Candidato).
+    # Anche i contatori di equità restano invariati (il motore ne riceve una copia): il chiamante
+    # registra il calendario che sceglie di tenere.
+    rng = random.Random(seme)
+    if opzioni.get('equita') is not None:
+        opzioni['equita'] = opzioni['equita'].copia()
+    fabbisogno = calcola_fabbisogno(inizio, fine, rng)
+    calendario, nuovo_stato = risolvi(inizio, fine, dipendenti, motore=motore, stato=stato, rng=rng,
+                                      fabbisogno=fabbisogno, aggiorna_dipendenti=False, **opzioni)
+    if metrica is not None:
+        punteggio, metriche = metrica(calendario, dipendenti, fabbisogno), {}
+    else:
+        punteggio, metriche = valuta_calendario(calendario, dipendenti, fabbisogno, pesi)
+    return Candidato(seme, calendario, nuovo_stato, fabbisogno, punteggio, metriche)
+
+# Dipendenti condivisi dal processo di lavoro: inviati una volta sola dall'initializer del pool
+_dipendenti_worker = None
+
+def _inizializza_worker(dipendenti):
+    global _dipendenti_worker
+    _dipendenti_worker = dipendenti
+
+def _genera_candidato_worker(argomenti):
+    inizio, fine, seme, kwargs = argomenti
+    return genera_con_seme(inizio, fine, _dipendenti_worker, seme, **kwargs)
+
+def genera_migliore(inizio, fine, dipendenti, tentativi=8, processi=None, seme=None, motore="greedy",
+                    stato=None, pesi=None, metrica=None, **opzioni):
+    # Esegue `tentativi` generazioni con semi indipendenti (in parallelo su `processi` processi,
+    # default: numero di CPU) e restituisce il Candidato con il punteggio più basso.
+    # Con lo stesso seme la scelta dei semi è riproducibile, e con essa il risultato se ogni
+    # tentativo lo è (motore greedy o ricottura con iterazioni, vedi Candidato).
+    # metrica, se indicata, è una funzione (calendario, dipendenti, fabbisogno) -> float e deve
+    # essere definita a livello di modulo per poter essere inviata ai processi.
+    # Un report passato in opzioni accumula i dati di tutti i tentativi ed è supportato solo
+    # senza processi separati (processi=1), perché i processi ne riceverebbero una copia.
+    if tentativi < 1:
+        raise ValueError("Serve almeno un tentativo.")
+    if opzioni.get('report') is not None and processi != 1 and tentativi > 1:
+        raise ValueError("Il report di generazione richiede processi=1.")
+    generatore_semi = random.Random(seme)
+    semi = [generatore_semi.getrandbits(32) for _ in range(tentativi)]
+    # progresso riceve la frazione di lavoro complessiva; con annulla si tiene il migliore tra i
+    # tentativi già conclusi (quello in corso restituisce la sua soluzione migliore fino a quel momento)
+    progresso = opzioni.pop('progresso', None)
+    annulla = opzioni.get('annulla')
+    kwargs = dict(opzioni, motore=motore, stato=stato, pesi=pesi, metrica=metrica)
+    if processi == 1 or tentativi == 1:
+        candidati = []
+        for k, s in enumerate(semi):
+            if candidati and annulla is not None and annulla.is_set():
+                break
+            avanzamento = (lambda x, k=k: progresso((k + x) / tentativi)) if progresso else None
+            candidati.append(genera_con_seme(inizio, fine, dipendenti, s, progresso=avanzamento, **kwargs))
+    else:
+        # Un Event non si può inviare ai processi: l'annullamento smette di attendere i tentativi
+        # in corso e scarta quelli non ancora avviati
+        kwargs.pop('annulla', None)
+        pool = ProcessPoolExecutor(max_workers=processi, initializer=_inizializza_worker,
+                                   initargs=(list(dipendenti),))
+        in_attesa = set()
+        try:
+            futuri = {pool.submit(_genera_candidato_worker, (inizio, fine, s, kwargs)): k for k, s in enumerate(semi)}
+            conclusi = {}
+            in_attesa.update(futuri)
+            while in_attesa:
+                fatti, in_attesa = wait(in_attesa, timeout=0.2, return_when=FIRST_COMPLETED)
+                for futuro in fatti:
+                    conclusi[futuri[futuro]] = futuro.result()
+                if progresso:
+                    progresso(len(conclusi) / tentativi)
+                if conclusi and annulla is not None and annulla.is_set():
+                    break
+        finally:
+            pool.shutdown(wait=not in_attesa, cancel_futures=True)
+        candidati = [conclusi[k] for k in sorted(conclusi)]
+    # A parità di punteggio vince il primo seme, così il risultato non dipende dall'ordine di arrivo
+    return min(candidati, key=lambda c: c.punteggio)
+
+registra_motore("greedy", _motore_greedy)
+registra_motore("ricottura", genera_turni_ricottura)
@@ -0,0 +1,102 @@
+# Statistiche orarie e di legge sul lavoro calcolate sulla matrice dei turni (MatriceTurni).
+# Gli orari dei turni sono convertiti una volta sola in tabelle indicizzate per codice turno;
+# ogni statistica è poi una passata vettoriale numpy su tutta la matrice giorni x dipendenti,
+# abbastanza veloce da essere ricalcolata dopo ogni modifica nell'anteprima.
+
+import numpy as np
+
+from orari import (SIGLE, ORARI_MINUTI, MINUTI_GIORNO, MAX_GIORNI_CONSECUTIVI, RIPOSO_MINIMO_ORE, MatriceTurni,
+                   compatibilita_turni)
+
+# Fascia notturna (22:00 - 06:00)
+NOTTE_INIZIO = 22 * 60
+NOTTE_FINE = 6 * 60
+
+def _sovrapposizione(inizio, fine, a, b):
+    return max(0, min(fine, b) - max(inizio, a))
+
+def _tabelle_turni():
+    # Per ogni codice turno: minuti di inizio e fine (fine > 24h per i turni notturni), durata
+    # e minuti in fascia notturna. Il codice 0 (riposo) ha tutto a zero.
+    n = len(SIGLE)
+    inizio = np.zeros(n, dtype=np.int32)
+    fine = np.zeros(n, dtype=np.int32)
+    notturni = np.zeros(n, dtype=np.int32)
+    for codice, sigla in enumerate(SIGLE):
+        if not sigla:
+            continue
+        m_inizio, m_fine = ORARI_MINUTI[sigla]
+        inizio[codice] = m_inizio
+        fine[codice] = m_fine
+        # La fascia notturna del giorno prima (fino alle 06:00) e quella che inizia alle 22:00
+        notturni[codice] = (_sovrapposizione(m_inizio, m_fine, -MINUTI_GIORNO + NOTTE_INIZIO, NOTTE_FINE)
+                            + _sovrapposizione(m_inizio, m_fine, NOTTE_INIZIO, MINUTI_GIORNO + NOTTE_FINE))
+    tabelle = inizio, fine, fine - inizio, notturni
+    for tabella in tabelle:
+        tabella.flags.writeable = False
+    return tabelle
+
+INIZIO_MINUTI, FINE_MINUTI, DURATA_MINUTI, NOTTURNI_MINUTI = _tabelle_turni()
+
+def sequenze_lavorative(lavorati, consecutivi_iniziali=None):
+    # Lunghezza della sequenza di giorni lavorati che termina in ogni cella (0 se riposo),
+    # calcolata per colonne con cumsum e azzeramento sui riposi
+    lavorati = lavorati.astype(np.int32)
+    cumulata = np.cumsum(lavorati, axis=0)
+    azzeramenti = np.maximum.accumulate(np.where(lavorati == 0, cumulata, 0), axis=0)
+    sequenze = cumulata - azzeramenti
+    if consecutivi_iniziali is not None:
+        # Le celle prima del primo riposo proseguono la sequenza del periodo precedente
+        iniziali = np.asarray(consecutivi_iniziali, dtype=np.int32)
+        prima_del_riposo = np.cumsum(lavorati == 0, axis=0) == 0
+        sequenze = sequenze + prima_del_riposo * iniziali
+    return sequenze
+
+class Statistiche:
+    def __init__(self, matrice, stato=None):
+        celle = matrice.celle
+        self.nomi = list(matrice.nomi)
+        lavorati = celle != 0
+        durate = DURATA_MINUTI[celle]
+        self.giorni_lavorati = lavorati.sum(axis=0)
+        self.ore_totali = durate.sum(axis=0) / 60
+        self.ore_notturne = NOTTURNI_MINUTI[celle].sum(axis=0) / 60
+
+        giorni = matrice.giorni()
+        weekend = np.array([g.weekday() >= 5 for g in giorni], dtype=bool)
+        self.ore_weekend = durate[weekend].sum(axis=0) / 60
+
+        iniziali = None
+        if stato is not None:
+            iniziali = [stato.giorni_consecutivi.get(nome, 0) for nome in self.nomi]
+        sequenze = sequenze_lavorative(lavorati, iniziali)
+        self.max_consecutivi = sequenze.max(axis=0) if len(celle) else np.zeros(len(self.nomi), dtype=np.int32)
+        self.giorni_oltre_limite = (sequenze > MAX_GIORNI_CONSECUTIVI).sum(axis=0)
+
+        # Riposo tra la fine del turno di un giorno e l'inizio del turno del giorno dopo, letto
+        # dalla matrice di compatibilità (valore massimo se uno dei due giorni è di riposo)
+        if len(celle) > 1:
+            pause = compatibilita_turni().riposo[celle[:-1], celle[1:]]
+            minimo = pause.min(axis=0)
+            self.riposo_minimo = np.where(minimo == np.iinfo(np.int32).max, np.nan, minimo / 60)
+            self.riposi_brevi = (pause < RIPOSO_MINIMO_ORE * 60).sum(axis=0)
+        else:
+            self.riposo_minimo = np.full(len(self.nomi), np.nan)
+            self.riposi_brevi = np.zeros(len(self.nomi), dtype=np.int64)
+
+    def per_dipendente(self):
+        campi = ('giorni_lavorati', 'ore_totali', 'ore_notturne', 'ore_weekend', 'max_consecutivi',
+                 'giorni_oltre_limite', 'riposo_minimo', 'riposi_brevi')
+        return {nome: {campo: getattr(self, campo)[e].item() for campo in campi}
+                for e, nome in enumerate(self.nomi)}
+
+def calcola_statistiche(calendario_o_matrice, dipendenti=None, stato=None):
+    # Accetta una MatriceTurni oppure un calendario (vista o dizionario) più la lista dei dipendenti
+    matrice = calendario_o_matrice
+    if not isinstance(matrice, MatriceTurni):
+        matrice = MatriceTurni.da_calendario(calendario_o_matrice, dipendenti or [])
+    return Statistiche(matrice, stato)
+
+def ore_per_dipendente(matrice):
+    # Solo le ore totali, per chi deve ricalcolarle spesso (es. a ogni modifica di una cella)
+    return dict(zip(matrice.nomi, (DURATA_MINUTI[matrice.celle].sum(axis=0) / 60).tolist()))
@@ -0,0 +1,218 @@
+# Validazione di un calendario già fatto (generato o corretto a mano) contro le regole usate dai
+# generatori: copertura del fabbisogno, al massimo MAX_GIORNI_CONSECUTIVI giorni lavorati di
+# fila, niente due riposi liberi consecutivi, riposo minimo tra turni di giorni consecutivi,
+# nessun turno in ferie, recupero o riposo aggiuntivo e solo turni tra quelli possibili.
+# Ogni regola è una passata vettoriale sulle righe (giorni) della matrice. Le regole guardano al
+# massimo MAX_GIORNI_CONSECUTIVI + 1 giorni indietro, quindi dopo una modifica basta rivalidare
+# la finestra dei giorni toccati (rivalida) invece di tutto il periodo.
+
+from collections import Counter
+
+import numpy as np
+
+from orari import SIGLE, CODICI, MAX_GIORNI_CONSECUTIVI, MatriceTurni, compatibilita_turni
+from statistiche import sequenze_lavorative
+
+# Tipi di violazione, nell'ordine in cui vengono riportati per ogni giorno
+COPERTURA = 'copertura'
+GIORNI_CONSECUTIVI = 'giorni_consecutivi'
+RIPOSO_CONSECUTIVO = 'riposo_consecutivo'
+RIPOSO_MINIMO = 'riposo_minimo'
+FERIE = 'ferie'
+RECUPERO = 'recupero'
+RIPOSO_AGGIUNTIVO = 'riposo_aggiuntivo'
+NON_AMMESSO = 'non_ammesso'
+TIPI = (COPERTURA, GIORNI_CONSECUTIVI, RIPOSO_CONSECUTIVO, RIPOSO_MINIMO, FERIE, RECUPERO, RIPOSO_AGGIUNTIVO,
+        NON_AMMESSO)
+ASSENZE = (FERIE, RECUPERO, RIPOSO_AGGIUNTIVO)
+
+class Violazione:
+    __slots__ = ('tipo', 'giorno', 'nome', 'turno', 'dettaglio')
+
+    def __init__(self, tipo, giorno, nome=None, turno=None, dettaglio=""):
+        # nome è None per le violazioni del giorno (copertura); turno è il turno coinvolto, se c'è
+        self.tipo = tipo
+        self.giorno = giorno
+        self.nome = nome
+        self.turno = turno
+        self.dettaglio = dettaglio
+
+    def __eq__(self, altra):
+        return isinstance(altra, Violazione) and self.a_dict() == altra.a_dict()
+
+    def __hash__(self):
+        return hash((self.tipo, self.giorno, self.nome, self.turno))
+
+    def __repr__(self):
+        return f"Violazione({self.tipo}, {self.giorno}, {self.nome}, {self.turno})"
+
+    def descrizione(self):
+        chi = f" {self.nome}" if self.nome else ""
+        return f"{self.giorno.strftime('%d/%m/%Y')}{chi}: {self.dettaglio}"
+
+    def a_dict(self):
+        return {'tipo': self.tipo, 'giorno': self.giorno.isoformat(), 'nome': self.nome, 'turno': self.turno,
+                'dettaglio': self.dettaglio}
+
+def conta_per_tipo(violazioni):
+    conteggi = Counter(v.tipo for v in violazioni)
+    return {tipo: conteggi[tipo] for tipo in TIPI if conteggi[tipo]}
+
+class Validatore:
+    def __init__(self, matrice, dipendenti, fabbisogno=None, stato=None):
+        # La matrice non viene copiata: rivalida legge le celle correnti dopo ogni modifica.
+        # fabbisogno (default matrice.fabbisogno) serve per la copertura; stato (StatoGenerazione
+        # al giorno prima dell'inizio) per le regole che proseguono dal periodo precedente.
+        self.matrice = matrice
+        self.dipendenti = dipendenti
+        self.fabbisogno = fabbisogno
+        self.stato = stato
+        self.giorni = matrice.giorni()
+        self._prepara()
+
+    def _prepara(self):
+        # Maschere per dipendente, una colonna per ogni colonna attuale della matrice
+        matrice = self.matrice
+        num_giorni, num_dip = matrice.celle.shape
+        nomi = matrice.nomi
+        per_nome = {d.nome: d for d in self.dipendenti}
+        stato = self.stato
+
+        fabbisogno = matrice.fabbisogno if self.fabbisogno is None else self.fabbisogno
+        self.domanda = None
+        if fabbisogno is not None:
+            self.domanda = np.zeros((num_giorni, len(SIGLE)), dtype=np.int32)
+            for g, giorno in enumerate(self.giorni):
+                for turno in fabbisogno.get(giorno, ()):
+                    self.domanda[g, CODICI[turno]] += 1
+
+        # Assenze come matrici booleane giorni x dipendenti
+        self.assenze = {tipo: np.zeros((num_giorni, num_dip), dtype=bool) for tipo in ASSENZE}
+        for e, nome in enumerate(nomi):
+            dip = per_nome.get(nome)
+            if dip is None:
+                continue
+            intervalli = {FERIE: dip.ferie, RECUPERO: [(g, g) for g in dip.recuperi],
+                          RIPOSO_AGGIUNTIVO: [(g, g) for g in dip.riposi_aggiuntivi]}
+            for tipo, lista in intervalli.items():
+                for inizio, fine in lista:
+                    primo = max((inizio - matrice.inizio).days, 0)
+                    ultimo = min((fine - matrice.inizio).days, num_giorni - 1)
+                    if primo <= ultimo:
+                        self.assenze[tipo][primo:ultimo + 1, e] = True
+        self.assente = self.assenze[FERIE] | self.assenze[RECUPERO] | self.assenze[RIPOSO_AGGIUNTIVO]
+
+        # Turni ammessi per dipendente (riga) e codice (colonna); chi non è tra i dipendenti può tutto
+        self.ammessi = np.ones((num_dip, len(SIGLE)), dtype=bool)
+        for e, nome in enumerate(nomi):
+            if nome in per_nome:
+                self.ammessi[e, 1:] = False
+                for turno in per_nome[nome].turni_possibili:
+                    self.ammessi[e, CODICI[turno]] = True
+        self.incompatibili = np.array(compatibilita_turni().incompatibili, dtype=bool)
+
+        # Situazione al giorno prima dell'inizio
+        self.consecutivi_iniziali = np.zeros(num_dip, dtype=np.int32)
+        self.riposo_iniziale = np.zeros(num_dip, dtype=bool)
+        self.turno_iniziale = np.zeros(num_dip, dtype=np.int8)
+        if stato is not None:
+            for e, nome in enumerate(nomi):
+                self.consecutivi_iniziali[e] = stato.giorni_consecutivi.get(nome, 0)
+                self.riposo_iniziale[e] = stato.riposo_ieri.get(nome, False)
+                self.turno_iniziale[e] = CODICI.get(stato.turno_ieri.get(nome) or '', 0)
+
+    def _allinea(self):
+        # Se alla matrice è stato aggiunto un dipendente (MatriceTurni.imposta su un nome nuovo) le
+        # maschere vanno ricostruite; restituisce True in quel caso
+        if self.matrice.celle.shape[1] == len(self.ammessi):
+            return False
+        self._prepara()
+        return True
+
+    def finestra(self, giorno):
+        # Giorni le cui violazioni possono cambiare se cambia una cella del giorno indicato: il giorno
+        # stesso, il successivo (riposi) e fino a MAX_GIORNI_CONSECUTIVI + 1 giorni dopo (sequenze)
+        g = self.matrice.indice_giorno(giorno)
+        return self.giorni[g], self.giorni[min(g + MAX_GIORNI_CONSECUTIVI + 1, len(self.giorni) - 1)]
+
+    def valida(self, primo=None, ultimo=None):
+        # Violazioni dei giorni da primo a ultimo (estremi inclusi; default tutto il periodo),
+        # ordinate per giorno, tipo e dipendente
+        if not len(self.giorni):
+            return []
+        self._allinea()
+        g0 = self.matrice.indice_giorno(primo) if primo is not None else 0
+        g1 = self.matrice.indice_giorno(ultimo) if ultimo is not None else len(self.giorni) - 1
+        if g1 < g0:
+            return []
+        # Contesto: i giorni precedenti che servono alle regole sulle sequenze
+        c0 = max(0, g0 - MAX_GIORNI_CONSECUTIVI - 1)
+        celle = self.matrice.celle[c0:g1 + 1]
+        assente = self.assente[c0:g1 + 1]
+        k = g0 - c0
+        trovate = []
+
+        def aggiungi(tipo, maschera, dettaglio):
+            for g, e in zip(*np.nonzero(maschera[k:])):
+                codice = celle[k + g, e]
+                trovate.append((g0 + g, TIPI.index(tipo), e, tipo, SIGLE[codice] or None,
+                                dettaglio(g0 + g, e, codice) if callable(dettaglio) else dettaglio))
+
+        lavorati = celle != 0
+        if self.domanda is not None:
+            conteggi = np.zeros((len(celle), len(SIGLE)), dtype=np.int32)
+            np.add.at(conteggi, (np.repeat(np.arange(len(celle)), celle.shape[1]), celle.ravel()), 1)
+            mancanti = self.domanda[c0:g1 + 1] - conteggi
+            mancanti[:, 0] = 0
+            for g, c in zip(*np.nonzero(mancanti[k:] > 0)):
+                trovate.append((g0 + g, TIPI.index(COPERTURA), -1, COPERTURA, SIGLE[c],
+                                f"turno {SIGLE[c]} scoperto ({mancanti[k + g, c]} mancante/i)"))
+
+        # Sequenze: la violazione è sul primo giorno oltre il limite (o sul primo giorno del periodo
+        # se la sequenza prosegue già oltre), che si riconosce guardando solo
+        # MAX_GIORNI_CONSECUTIVI + 1 giorni indietro
+        sequenze = sequenze_lavorative(lavorati, self.consecutivi_iniziali if c0 == 0 else None)
+        oltre = sequenze > MAX_GIORNI_CONSECUTIVI
+        aggiungi(GIORNI_CONSECUTIVI, oltre & ~np.vstack([np.zeros((1, celle.shape[1]), bool), oltre[:-1]]),
+                 f"più di {MAX_GIORNI_CONSECUTIVI} giorni lavorati consecutivi")
+
+        # Riposi liberi (non dovuti ad assenze) in due giorni consecutivi
+        libero = ~lavorati & ~assente
+        if c0 == 0:
+            libero_prima = self.riposo_iniziale
+        else:
+            libero_prima = (self.matrice.celle[c0 - 1] == 0) & ~self.assente[c0 - 1]
+        libero_ieri = np.vstack([libero_prima[None, :], libero[:-1]])
+        aggiungi(RIPOSO_CONSECUTIVO, libero & libero_ieri, "due riposi consecutivi")
+
+        # Riposo minimo tra il turno del giorno prima e quello del giorno
+        ieri = np.vstack([(self.turno_iniziale if c0 == 0 else self.matrice.celle[c0 - 1])[None, :], celle[:-1]])
+        aggiungi(RIPOSO_MINIMO, self.incompatibili[ieri, celle],
+                 lambda g, e, codice: f"riposo insufficiente dopo il turno {SIGLE[ieri[g - c0, e]]}")
+
+        for tipo, testo in ((FERIE, "turno in ferie"), (RECUPERO, "turno in un giorno di recupero"),
+                            (RIPOSO_AGGIUNTIVO, "turno in un giorno di riposo aggiuntivo")):
+            aggiungi(tipo, lavorati & self.assenze[tipo][c0:g1 + 1], testo)
+        aggiungi(NON_AMMESSO, lavorati & ~self.ammessi[np.arange(celle.shape[1])[None, :], celle],
+                 lambda g, e, codice: f"turno {SIGLE[codice]} non tra i turni possibili")
+
+        trovate.sort(key=lambda v: v[:3])
+        nomi = self.matrice.nomi
+        return [Violazione(tipo, self.giorni[g], nomi[e] if e >= 0 else None, turno, dettaglio)
+                for g, _, e, tipo, turno, dettaglio in trovate]
+
+    def rivalida(self, violazioni, giorno):
+        # Dopo la modifica di una cella del giorno indicato: sostituisce le violazioni della
+        # finestra interessata con quelle ricalcolate, lasciando invariate le altre. Con un
+        # dipendente nuovo nella matrice la sua colonna è tutta da validare: si rifà tutto il periodo
+        if self._allinea():
+            return self.valida()
+        primo, ultimo = self.finestra(giorno)
+        fuori = [v for v in violazioni if not primo <= v.giorno <= ultimo]
+        nuove = self.valida(primo, ultimo)
+        return sorted(fuori + nuove, key=lambda v: (v.giorno, TIPI.index(v.tipo)))
+
+def valida_calendario(calendario, dipendenti, fabbisogno=None, stato=None):
+    # Validazione completa di un calendario (vista, dizionario o MatriceTurni)
+    matrice = calendario if isinstance(calendario, MatriceTurni) else MatriceTurni.da_calendario(calendario, dipendenti)
+    return Validatore(matrice, dipendenti, fabbisogno, stato).valida()
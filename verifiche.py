@@ -0,0 +1,191 @@
+# Verifiche di coerenza tra i percorsi veloci e quelli completi, su organici sintetici: costo
+# incrementale della ricottura, ripresa da uno stato salvato, validazione incrementale, confronto
+# tra versioni e importazione del vecchio pickle. Ogni verifica confronta il risultato con un
+# calcolo diretto e segnala la prima differenza; l'esito è 0 se passano tutte.
+#   python verifiche.py                                      tutte le verifiche
+#   python verifiche.py --solo ripresa validazione --seme 3
+
+import argparse
+import datetime
+import os
+import pickle
+import random
+import sys
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+from orari import SIGLE, CODICI, MatriceTurni, StatoGenerazione, calcola_fabbisogno, genera_turni_periodo
+from benchmark import organico_sintetico
+
+INIZIO = datetime.date(2025, 1, 1)
+FINE = datetime.date(2025, 3, 31)
+NUM_DIPENDENTI = 25
+MODIFICHE = 2000
+
+class VerificaFallita(Exception):
+    pass
+
+def _controlla(condizione, messaggio):
+    if not condizione:
+        raise VerificaFallita(messaggio)
+
+def _scenario(seme):
+    dipendenti = organico_sintetico(NUM_DIPENDENTI, INIZIO, FINE, seme)
+    fabbisogno = calcola_fabbisogno(INIZIO, FINE, random.Random(seme))
+    calendario, stato = genera_turni_periodo(INIZIO, FINE, dipendenti, rng=random.Random(seme),
+                                             fabbisogno=fabbisogno, aggiorna_dipendenti=False)
+    return dipendenti, fabbisogno, calendario, stato
+
+def verifica_costo_incrementale(seme):
+    # Il costo aggiornato a ogni imposta coincide con quello ricalcolato da zero
+    from solutore import ProblemaTurni
+    dipendenti, fabbisogno, calendario, _ = _scenario(seme)
+    problema = ProblemaTurni(INIZIO, FINE, dipendenti, fabbisogno)
+    problema.carica(calendario)
+    rng = random.Random(seme)
+    for i in range(MODIFICHE):
+        g, e = rng.randrange(len(problema.giorni)), rng.randrange(len(dipendenti))
+        problema.imposta(g, e, rng.choice(problema.ammessi[e] + [0]))
+        if i % 100 == 0 or i == MODIFICHE - 1:
+            totale = problema.costo_totale()
+            _controlla(abs(problema.costo - totale) < 1e-6,
+                       f"dopo {i + 1} modifiche costo incrementale {problema.costo} != costo totale {totale}")
+
+def verifica_ripresa(seme):
+    # Due metà generate con lo stato (e i contatori di equità) salvati e ricaricati in mezzo
+    # danno lo stesso calendario e lo stesso stato di un'unica generazione
+    from equita import ContatoriEquita
+    dipendenti = organico_sintetico(NUM_DIPENDENTI, INIZIO, FINE, seme)
+    fabbisogno = calcola_fabbisogno(INIZIO, FINE, random.Random(seme))
+    equita = ContatoriEquita()
+    intero, stato = genera_turni_periodo(INIZIO, FINE, dipendenti, rng=random.Random(seme), fabbisogno=fabbisogno,
+                                         aggiorna_dipendenti=False, equita=equita)
+    meta = INIZIO + (FINE - INIZIO) / 2
+    rng = random.Random(seme)
+    equita_parziale = ContatoriEquita()
+    prima, stato_parziale = genera_turni_periodo(INIZIO, meta, dipendenti, rng=rng, fabbisogno=fabbisogno,
+                                                 aggiorna_dipendenti=False, equita=equita_parziale)
+    stato_parziale = StatoGenerazione.da_dict(stato_parziale.a_dict())
+    equita_parziale = ContatoriEquita.da_dict(equita_parziale.a_dict())
+    dopo, stato_ripreso = genera_turni_periodo(meta + datetime.timedelta(days=1), FINE, dipendenti, stato_parziale,
+                                               rng=rng, fabbisogno=fabbisogno, aggiorna_dipendenti=False,
+                                               equita=equita_parziale)
+    for giorno in intero:
+        parte = prima if giorno <= meta else dopo
+        _controlla(dict(intero[giorno]) == dict(parte[giorno]), f"turni diversi il {giorno}")
+    _controlla(stato_ripreso.a_dict() == stato.a_dict(), "stato finale diverso dopo la ripresa")
+    _controlla(equita_parziale.a_dict() == equita.a_dict(), "contatori di equità diversi dopo la ripresa")
+
+def verifica_validazione(seme):
+    # Dopo ogni modifica di una cella, rivalida dà le stesse violazioni di una valida completa
+    from validazione import Validatore
+    dipendenti, _, calendario, _ = _scenario(seme)
+    matrice = calendario.matrice.copia()
+    validatore = Validatore(matrice, dipendenti)
+    violazioni = validatore.valida()
+    rng = random.Random(seme)
+    for i in range(MODIFICHE // 4):
+        g = rng.randrange(matrice.num_giorni)
+        matrice.celle[g, rng.randrange(len(matrice.nomi))] = rng.randrange(len(SIGLE))
+        violazioni = validatore.rivalida(violazioni, validatore.giorni[g])
+        complete = validatore.valida()
+        _controlla(Counter(violazioni) == Counter(complete),
+                   f"dopo {i + 1} modifiche rivalida trova {len(violazioni)} violazioni, valida {len(complete)}")
+
+def verifica_differenze(seme):
+    # differenze_matrici contro il confronto cella per cella di due matrici
+    from statistiche import DURATA_MINUTI
+    from versioni import differenze_matrici
+    dipendenti, fabbisogno, calendario, _ = _scenario(seme)
+    prima = calendario.matrice
+    dopo = prima.copia()
+    rng = random.Random(seme)
+    for _ in range(MODIFICHE // 10):
+        dopo.celle[rng.randrange(dopo.num_giorni), rng.randrange(len(dopo.nomi))] = rng.randrange(len(SIGLE))
+    diff = differenze_matrici(prima, dopo)
+    giorni = prima.giorni()
+    attese = [(giorni[g], prima.nomi[e], SIGLE[prima.celle[g, e]], SIGLE[dopo.celle[g, e]])
+              for g, e in np.argwhere(prima.celle != dopo.celle).tolist()]
+    _controlla(sorted(diff.celle) == sorted(attese), f"celle cambiate: {len(diff.celle)} invece di {len(attese)}")
+    for e, nome in enumerate(prima.nomi):
+        ore = (int(DURATA_MINUTI[dopo.celle[:, e]].sum()) - int(DURATA_MINUTI[prima.celle[:, e]].sum())) / 60
+        _controlla(abs(diff.ore.get(nome, 0.0) - ore) < 1e-9,
+                   f"ore di {nome}: {diff.ore.get(nome, 0.0)} invece di {ore}")
+
+    def scoperti(matrice, g):
+        presenti = Counter(matrice.celle[g].tolist())
+        return sum(max(0, n - presenti[CODICI[t]]) for t, n in Counter(fabbisogno.get(giorni[g], ())).items())
+
+    for g, giorno in enumerate(giorni):
+        attesi = (scoperti(prima, g), scoperti(dopo, g))
+        if giorno in diff.copertura:
+            _controlla(diff.copertura[giorno]['scoperti'] == attesi, f"scoperti del {giorno} diversi")
+        else:
+            _controlla(attesi[0] == attesi[1], f"giorno {giorno} con copertura cambiata non segnalato")
+    _controlla(not differenze_matrici(prima, prima), "differenze tra una matrice e se stessa")
+
+def verifica_importazione_pickle(seme):
+    # Il vecchio pickle viene importato per intero la prima volta e poi mai più, anche se cambia
+    from archivio import ArchivioTurni
+    dipendenti, _, calendario, _ = _scenario(seme)
+    MatriceTurni.da_calendario(calendario, dipendenti).applica_a(dipendenti)
+    cartella = tempfile.mkdtemp()
+    percorso_pickle = os.path.join(cartella, "dipendenti.pkl")
+    percorso_db = os.path.join(cartella, "dipendenti.db")
+    try:
+        with open(percorso_pickle, "wb") as f:
+            pickle.dump(dipendenti, f)
+        with ArchivioTurni(percorso_db) as db:
+            _controlla(db.importa_pickle(percorso_pickle) == len(dipendenti), "prima importazione incompleta")
+            caricati = db.carica_dipendenti()
+            db.carica_storico(caricati, INIZIO, FINE)
+        _controlla([d.nome for d in caricati] == [d.nome for d in dipendenti], "ordine dei dipendenti diverso")
+        for originale, caricato in zip(dipendenti, caricati):
+            _controlla(caricato.turni == originale.turni and caricato.ferie == originale.ferie
+                       and caricato.recuperi == originale.recuperi
+                       and caricato.turni_possibili == originale.turni_possibili,
+                       f"dati di {originale.nome} diversi dopo l'importazione")
+        with open(percorso_pickle, "wb") as f:
+            pickle.dump(dipendenti[:1], f)
+        with ArchivioTurni(percorso_db) as db:
+            _controlla(db.importa_pickle(percorso_pickle) == 0, "pickle importato una seconda volta")
+            _controlla(len(db.carica_dipendenti()) == len(dipendenti), "archivio cambiato dalla seconda importazione")
+    finally:
+        for percorso in (percorso_pickle, percorso_db, percorso_db + "-wal", percorso_db + "-shm"):
+            if os.path.exists(percorso):
+                os.remove(percorso)
+        os.rmdir(cartella)
+
+VERIFICHE = {
+    'costo': verifica_costo_incrementale,
+    'ripresa': verifica_ripresa,
+    'validazione': verifica_validazione,
+    'differenze': verifica_differenze,
+    'pickle': verifica_importazione_pickle,
+}
+
+def esegui(nomi=tuple(VERIFICHE), seme=0, stampa=print):
+    # Restituisce {nome: messaggio di errore o None}
+    esiti = {}
+    for nome in nomi:
+        try:
+            VERIFICHE[nome](seme)
+            esiti[nome] = None
+        except VerificaFallita as e:
+            esiti[nome] = str(e)
+        if stampa:
+            stampa(f"{nome:<12} {'ok' if esiti[nome] is None else 'ERRORE: ' + esiti[nome]}")
+    return esiti
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifiche di coerenza tra calcoli incrementali e completi.")
+    parser.add_argument("--solo", nargs="+", choices=list(VERIFICHE), default=list(VERIFICHE))
+    parser.add_argument("--seme", type=int, default=0)
+    args = parser.parse_args(argv)
+    esiti = esegui(args.solo, args.seme)
+    return 1 if any(esiti.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+# Versioni dello stesso periodo di turni per confrontare alternative ("what-if") senza tenerne
+# copie complete. Lo storico conserva una sola matrice di base; ogni versione è un delta
+# copy-on-write: due array ordinati con le celle diverse dalla base (indice piatto giorno x
+# dipendente e codice del turno). Una versione derivata da un'altra condivide i suoi array
+# finché non viene modificata; le modifiche cella per cella si accumulano in un dizionario e
+# vengono fuse negli array solo quando servono. Il confronto tra due versioni guarda solo le
+# celle dei loro delta: celle cambiate, differenza di ore per dipendente e copertura dei giorni toccati.
+
+from collections import Counter
+
+import numpy as np
+
+from orari import SIGLE, CODICI
+from statistiche import DURATA_MINUTI
+
+_VUOTO_INDICI = np.zeros(0, dtype=np.int64)
+_VUOTO_CODICI = np.zeros(0, dtype=np.int8)
+
+class Versione:
+    def __init__(self, storico, nome, indici, codici, fabbisogno=None, genitore=None):
+        self.storico = storico
+        self.nome = nome
+        # Delta rispetto alla base: indici piatti (g * num_dipendenti + e) ordinati e codici;
+        # gli array possono essere condivisi con altre versioni e non vanno mai modificati sul posto
+        self._indici = indici
+        self._codici = codici
+        # Celle cambiate dopo l'ultima fusione: indice piatto -> codice
+        self._pendenti = {}
+        self.fabbisogno = fabbisogno
+        self.genitore = genitore
+
+    def _indice(self, giorno, nome):
+        base = self.storico.base
+        return base.indice_giorno(giorno) * len(base.nomi) + base.posizioni[nome]
+
+    def turno(self, giorno, nome):
+        i = self._indice(giorno, nome)
+        if i in self._pendenti:
+            return SIGLE[self._pendenti[i]]
+        k = np.searchsorted(self._indici, i)
+        if k < len(self._indici) and self._indici[k] == i:
+            return SIGLE[self._codici[k]]
+        return SIGLE[self.storico.base.celle.flat[i]]
+
+    def imposta(self, giorno, nome, turno):
+        self._pendenti[self._indice(giorno, nome)] = CODICI[turno or '']
+
+    def modifiche(self):
+        # (indici, codici) del delta completo; le celle riportate al valore della base escono dal delta
+        if self._pendenti:
+            nuovi = np.fromiter(self._pendenti, dtype=np.int64, count=len(self._pendenti))
+            codici_nuovi = np.fromiter(self._pendenti.values(), dtype=np.int8, count=len(self._pendenti))
+            restano = ~np.isin(self._indici, nuovi)
+            indici = np.concatenate([self._indici[restano], nuovi])
+            codici = np.concatenate([self._codici[restano], codici_nuovi])
+            diversi = codici != self.storico.base.celle.ravel()[indici]
+            ordine = np.argsort(indici[diversi], kind='stable')
+            self._indici = indici[diversi][ordine]
+            self._codici = codici[diversi][ordine]
+            self._pendenti = {}
+        return self._indici, self._codici
+
+    def __len__(self):
+        return len(self.modifiche()[0])
+
+    def matrice(self):
+        # Matrice completa della versione (una copia della base con il delta applicato)
+        indici, codici = self.modifiche()
+        matrice = self.storico.base.copia()
+        matrice.celle.ravel()[indici] = codici
+        matrice.fabbisogno = self.fabbisogno
+        return matrice
+
+    def deriva(self, nome):
+        return self.storico.deriva(nome, self.nome)
+
+class StoricoVersioni:
+    NOME_BASE = "base"
+
+    def __init__(self, base, nome_base=NOME_BASE):
+        # La base viene copiata una volta sola: le versioni restano valide anche se la matrice
+        # passata viene poi modificata
+        self.base = base.copia()
+        self.versioni = {}
+        self.versioni[nome_base] = Versione(self, nome_base, _VUOTO_INDICI, _VUOTO_CODICI, base.fabbisogno)
+
+    def __getitem__(self, nome):
+        return self.versioni[nome]
+
+    def __contains__(self, nome):
+        return nome in self.versioni
+
+    def nomi(self):
+        return list(self.versioni)
+
+    def _nome_libero(self, nome):
+        if nome in self.versioni:
+            raise ValueError(f"Versione già presente: {nome}")
+
+    def _allinea(self, matrice):
+        # Celle della matrice nell'ordine dei dipendenti della base
+        base = self.base
+        if matrice.inizio != base.inizio or matrice.fine != base.fine:
+            raise ValueError(f"La versione copre {matrice.inizio} - {matrice.fine}, "
+                             f"la base {base.inizio} - {base.fine}.")
+        if matrice.nomi == base.nomi:
+            return matrice.celle
+        estranei = [n for n in matrice.nomi if n not in base.posizioni]
+        if estranei:
+            raise ValueError(f"Dipendenti non presenti nella base: {', '.join(estranei)}")
+        celle = np.zeros_like(base.celle)
+        colonne = [base.posizioni[n] for n in matrice.nomi]
+        celle[:, colonne] = matrice.celle
+        return celle
+
+    def salva(self, nome, matrice, genitore=None):
+        # Nuova versione da una matrice completa dello stesso periodo: se ne conserva solo il delta
+        self._nome_libero(nome)
+        celle = self._allinea(matrice)
+        indici = np.flatnonzero(celle != self.base.celle)
+        versione = Versione(self, nome, indici, celle.ravel()[indici].copy(), matrice.fabbisogno, genitore)
+        self.versioni[nome] = versione
+        return versione
+
+    def deriva(self, nome, da=NOME_BASE):
+        # Nuova versione uguale a "da", che ne condivide il delta fino alla prima modifica
+        self._nome_libero(nome)
+        origine = self.versioni[da]
+        indici, codici = origine.modifiche()
+        versione = Versione(self, nome, indici, codici, origine.fabbisogno, da)
+        self.versioni[nome] = versione
+        return versione
+
+    def rimuovi(self, nome):
+        del self.versioni[nome]
+
+    def memoria(self):
+        # Byte occupati dai delta (la base è contata una volta a parte)
+        return sum(v._indici.nbytes + v._codici.nbytes for v in self.versioni.values())
+
+    def differenze(self, da, a):
+        # Confronto tra due versioni guardando solo le celle presenti in almeno uno dei due delta
+        prima, dopo = self.versioni[da], self.versioni[a]
+        indici_da, codici_da = prima.modifiche()
+        indici_a, codici_a = dopo.modifiche()
+        indici = np.union1d(indici_da, indici_a)
+        return _differenze(self.base, indici, _valori(self.base, indici, indici_da, codici_da),
+                           _valori(self.base, indici, indici_a, codici_a), prima.fabbisogno, dopo.fabbisogno,
+                           (indici_da, codici_da), (indici_a, codici_a))
+
+def _valori(base, indici, indici_delta, codici_delta):
+    # Codici della versione nelle celle "indici": dal delta se presente, altrimenti dalla base
+    valori = base.celle.ravel()[indici].copy()
+    presenti = np.isin(indici, indici_delta)
+    valori[presenti] = codici_delta[np.searchsorted(indici_delta, indici[presenti])]
+    return valori
+
+# Risultato di un confronto: celle cambiate (giorno, nome, prima, dopo), differenza di ore per
+# dipendente (solo quelli con differenze) e copertura dei giorni in cui cambia:
+# {giorno: {'turni': {turno: (prima, dopo)}, 'scoperti': (prima, dopo)}}
+class DiffTurni:
+    def __init__(self, celle, ore, copertura):
+        self.celle = celle
+        self.ore = ore
+        self.copertura = copertura
+
+    def __bool__(self):
+        return bool(self.celle or self.copertura)
+
+    def riepilogo(self, massimo=10):
+        righe = [f"Celle cambiate: {len(self.celle)}, dipendenti con ore diverse: {len(self.ore)}, "
+                 f"giorni con copertura diversa: {len(self.copertura)}"]
+        for nome, ore in sorted(self.ore.items(), key=lambda voce: -abs(voce[1]))[:massimo]:
+            righe.append(f"  {nome}: {ore:+.1f} h")
+        for giorno, voce in list(self.copertura.items())[:massimo]:
+            scoperti_prima, scoperti_dopo = voce['scoperti']
+            righe.append(f"  {giorno.strftime('%d/%m')}: scoperti {scoperti_prima} -> {scoperti_dopo}")
+        return "\n".join(righe)
+
+def differenze_matrici(prima, dopo):
+    # Confronto tra due matrici complete dello stesso periodo e con gli stessi dipendenti
+    storico = StoricoVersioni(prima)
+    storico.salva("dopo", dopo)
+    return storico.differenze(StoricoVersioni.NOME_BASE, "dopo")
+
+def _righe_versione(base, giorni, delta):
+    # Righe della versione per i giorni indicati (indici ordinati), applicando il suo delta
+    righe = base.celle[giorni].copy()
+    indici, codici = delta
+    num_dipendenti = len(base.nomi)
+    giorno_delta = indici // num_dipendenti
+    dentro = np.isin(giorno_delta, giorni)
+    righe[np.searchsorted(giorni, giorno_delta[dentro]), indici[dentro] % num_dipendenti] = codici[dentro]
+    return righe
+
+def _conteggi(righe):
+    conteggi = np.zeros((len(righe), len(SIGLE)), dtype=np.int32)
+    np.add.at(conteggi, (np.repeat(np.arange(len(righe)), righe.shape[1]), righe.ravel()), 1)
+    return conteggi
+
+def _scoperti(conteggi, richiesti):
+    return sum(max(0, n - int(conteggi[CODICI[t]])) for t, n in Counter(richiesti).items())
+
+def _differenze(base, indici, valori_da, valori_a, fabbisogno_da, fabbisogno_a, delta_da, delta_a):
+    cambiate = valori_da != valori_a
+    indici, valori_da, valori_a = indici[cambiate], valori_da[cambiate], valori_a[cambiate]
+    num_dipendenti = len(base.nomi)
+    g, e = np.divmod(indici, num_dipendenti)
+    giorni = base.giorni()
+    celle = [(giorni[gi], base.nomi[ei], SIGLE[p], SIGLE[d])
+             for gi, ei, p, d in zip(g.tolist(), e.tolist(), valori_da.tolist(), valori_a.tolist())]
+    minuti = np.bincount(e, weights=DURATA_MINUTI[valori_a] - DURATA_MINUTI[valori_da], minlength=num_dipendenti)
+    ore = {base.nomi[i]: float(minuti[i]) / 60 for i in np.flatnonzero(minuti)}
+
+    # Copertura: giorni con celle cambiate o con un fabbisogno diverso
+    toccati = set(np.unique(g).tolist())
+    if fabbisogno_da is not fabbisogno_a:
+        vuoto = {}
+        for i, giorno in enumerate(giorni):
+            if (fabbisogno_da or vuoto).get(giorno) != (fabbisogno_a or vuoto).get(giorno):
+                toccati.add(i)
+    toccati = np.array(sorted(toccati), dtype=np.int64)
+    copertura = {}
+    if len(toccati):
+        conteggi_da = _conteggi(_righe_versione(base, toccati, delta_da))
+        conteggi_a = _conteggi(_righe_versione(base, toccati, delta_a))
+        for r, gi in enumerate(toccati.tolist()):
+            giorno = giorni[gi]
+            richiesti_da = (fabbisogno_da or {}).get(giorno, ())
+            richiesti_a = (fabbisogno_a or {}).get(giorno, ())
+            turni = {SIGLE[c]: (int(conteggi_da[r, c]), int(conteggi_a[r, c]))
+                     for c in np.flatnonzero(conteggi_da[r, 1:] != conteggi_a[r, 1:]) + 1}
+            scoperti = (_scoperti(conteggi_da[r], richiesti_da), _scoperti(conteggi_a[r], richiesti_a))
+            if turni or scoperti[0] != scoperti[1]:
+                copertura[giorno] = {'turni': turni, 'scoperti': scoperti}
+    return DiffTurni(celle, ore, copertura)